@@ -0,0 +1,128 @@
+"""Tüm arayüz animasyonları için tek zamanlayıcı.
+
+Bileşenler kendi after() zincirlerini kurmak yerine saate periyodik görev
+kaydeder; saat hepsini tek bir after() callback'inden, en yakın görev
+zamanı geldiğinde çalıştırır. Görevler anahtarla kaydedilir:
+aynı anahtarla yeniden kayıt öncekinin yerine geçer, cancel(key) durdurur.
+
+Kayıtlı görev yoksa ya da pencere simge durumuna küçültüldüyse hiç
+zamanlayıcı kurulmaz; saat tamamen uyur.
+"""
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Task:
+    """Periyodik görev: fn(now) her interval_ms'de çağrılır, False dönerse biter"""
+
+    __slots__ = ('key', 'fn', 'interval_ms', 'due')
+
+    def __init__(self, key, fn, interval_ms, due):
+        self.key = key
+        self.fn = fn
+        self.interval_ms = interval_ms
+        self.due = due
+
+
+class AnimationClock:
+    """Tek after() ile çalışan animasyon zaman çizelgesi.
+
+    Aynı kareye (frame_ms) düşen görevler tek uyanışta birlikte çalışır.
+    widget pencerenin kökü olmalıdır; <Unmap>/<Map> olaylarıyla
+    küçültülünce durur, geri açılınca kaldığı yerden devam eder.
+    """
+
+    def __init__(self, widget, frame_ms=16):
+        self.widget = widget
+        self.frame_ms = frame_ms
+        self.tasks = {}
+        self.ticks = 0
+        self.suspended = False
+        self._after_id = None
+        self._due = None
+        widget.bind('<Unmap>', self._on_unmap, add='+')
+        widget.bind('<Map>', self._on_map, add='+')
+
+    def every(self, key, interval_ms, fn, delay_ms=0):
+        """fn(now)'u interval_ms'de bir çağırır; ilk çağrı delay_ms sonra"""
+        task = Task(key, fn, interval_ms, time.perf_counter() + delay_ms / 1000)
+        self.tasks[key] = task
+        self._schedule()
+        return task
+
+    def cancel(self, key):
+        if self.tasks.pop(key, None) is not None and not self.tasks:
+            self._unschedule()
+
+    def active(self, key):
+        return key in self.tasks
+
+    def stop(self):
+        self.tasks.clear()
+        self._unschedule()
+
+    # --- Zamanlama -------------------------------------------------------------
+
+    def _schedule(self):
+        if self.suspended or not self.tasks:
+            self._unschedule()
+            return
+        due = min(task.due for task in self.tasks.values())
+        if self._after_id is not None:
+            if due >= self._due:
+                return
+            self.widget.after_cancel(self._after_id)
+        delay = max(0, int((due - time.perf_counter()) * 1000))
+        self._due = due
+        self._after_id = self.widget.after(delay, self._tick)
+
+    def _unschedule(self):
+        if self._after_id is not None:
+            self.widget.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _tick(self):
+        self._after_id = None
+        self.ticks += 1
+        now = time.perf_counter()
+        # Yarım kare içinde zamanı gelecek görevler de bu uyanışta çalışır
+        horizon = now + self.frame_ms / 2000
+        for task in list(self.tasks.values()):
+            if task.due > horizon or self.tasks.get(task.key) is not task:
+                continue
+            try:
+                keep = task.fn(now)
+            except Exception as e:
+                logger.exception(f"Animasyon görevi hata verdi ({task.key}): {e}")
+                keep = False
+            if self.tasks.get(task.key) is not task:
+                # Görev çalışırken iptal edildi ya da yenisiyle değiştirildi
+                continue
+            if keep is False:
+                del self.tasks[task.key]
+            else:
+                # Gecikme birikmesin: geç kalındıysa bir sonraki periyottan devam
+                task.due = max(task.due + task.interval_ms / 1000, now)
+        self._schedule()
+
+    # --- Pencere durumu ---------------------------------------------------------
+
+    def _on_unmap(self, event):
+        if event.widget is self.widget:
+            self.suspended = True
+            self._unschedule()
+
+    def _on_map(self, event):
+        if event.widget is self.widget and self.suspended:
+            self.suspended = False
+            now = time.perf_counter()
+            for task in self.tasks.values():
+                task.due = min(task.due, now)
+            self._schedule()
+
+    def stats(self):
+        """Kayıtlı görev ve uyanış sayısı, saatin uyku durumu (F12 katmanı)"""
+        return {'tasks': len(self.tasks), 'ticks': self.ticks, 'suspended': self.suspended,
+                'idle': self._after_id is None}
@@ -0,0 +1,434 @@
+"""Arayüzsüz istemci çekirdeği için benchmark.
+
+Yerel stand-in server'lar (gecikme, jitter, yanıt boyutu, hata oranı
+ayarlanabilir) başlatılır ve PhantomClient üzerinden ölçülür:
+
+- discovery: UDP yayın sorgusuyla ve 127.0.0.0/24 HTTP taramasıyla keşif süresi
+- latency: gönderimden yanıta p50/p95/p99 (tek istek, sırayla)
+- stream: akışlı yanıtta ilk parça ve tamamlanma süresi
+- throughput: N eşzamanlı gönderici için mesaj/sn
+- memory: uzun oturumda (transcript modeli dahil) bellek büyümesi
+- session: konuşma uzadıkça tur başına istek boyutu ve server bağlamı
+- transfer: düz JSON ile müzakere edilen kodlamada istek başına byte ve
+  çözme süresi
+- outbox: giden kutusuna kalıcı yazma süresi ve bağlantı gelince toplu
+  gönderimin hızı
+
+Sonuçlar JSON olarak yazılır; --baseline ile önceki bir sonuçla karşılaştırılır.
+
+    python benchmark.py --delay 0.05 --jitter 0.01 --output results.json
+    python benchmark.py --baseline results.json
+"""
+import json
+import logging
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from client_core import PhantomClient
+from standin import StandinServer
+from transcript import TranscriptModel
+
+logger = logging.getLogger(__name__)
+
+# Karşılaştırmada gösterilen metrikler: (bölüm yolu, daha yüksek daha mı iyi)
+KEY_METRICS = [
+    (('discovery', 'udp', 'median_ms'), False),
+    (('discovery', 'sweep', 'median_ms'), False),
+    (('latency', 'p50_ms'), False),
+    (('latency', 'p95_ms'), False),
+    (('latency', 'p99_ms'), False),
+    (('stream', 'first_chunk_p50_ms'), False),
+    (('stream', 'total_p50_ms'), False),
+    (('memory', 'growth_kb_per_1k'), False),
+    (('session', 'last_turn_bytes_sent'), False),
+    (('transfer', 'negotiated', 'received_per_request'), False),
+    (('transfer', 'negotiated', 'decode_ms_per_request'), False),
+    (('outbox', 'put_p50_ms'), False),
+    (('outbox', 'flush_per_s'), True),
+]
+
+
+def percentile(samples, p):
+    """En yakın sıra yöntemiyle yüzdelik; boş listede None"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples_ms, errors=0):
+    return {
+        'count': len(samples_ms),
+        'errors': errors,
+        'mean_ms': round(statistics.fmean(samples_ms), 2) if samples_ms else None,
+        'p50_ms': _round(percentile(samples_ms, 50)),
+        'p95_ms': _round(percentile(samples_ms, 95)),
+        'p99_ms': _round(percentile(samples_ms, 99)),
+        'max_ms': _round(max(samples_ms) if samples_ms else None),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def _client(server, max_in_flight=4, compression=True):
+    client = PhantomClient(server.url, max_in_flight=max_in_flight, discovery_cache=None,
+                           compression=compression)
+    client.connect(server.url).result()
+    return client
+
+
+def _timed_send(client, message):
+    started = time.perf_counter()
+    client.send(message).result()
+    return (time.perf_counter() - started) * 1000
+
+
+# --- Bölümler ------------------------------------------------------------------
+
+def bench_discovery(port, servers=3, rounds=5):
+    """Aynı lab'da UDP yayını (tek paket) ve yedek HTTP taraması"""
+    udp_port = port + 1
+    lab = [StandinServer(f"127.0.0.{50 + i}", port).start().announce(udp_port) for i in range(servers)]
+    client = PhantomClient(max_in_flight=1, discovery_cache=None)
+    results = {}
+    try:
+        for mode, mode_udp_port in (('udp', udp_port), ('sweep', None)):
+            samples, found, hosts = [], 0, 0
+            for _ in range(rounds):
+                started = time.perf_counter()
+                result = client.discover(networks=['127.0.0.0/24'], ports=(port,), local_candidates=(),
+                                         udp_port=mode_udp_port)
+                samples.append((time.perf_counter() - started) * 1000)
+                found, hosts = len(result.servers), result.hosts_probed
+            results[mode] = {'rounds': rounds, 'servers_found': found, 'servers_expected': servers,
+                             'hosts_probed': hosts, 'min_ms': _round(min(samples)),
+                             'median_ms': _round(statistics.median(samples))}
+    finally:
+        client.close()
+        for server in lab:
+            server.stop()
+    return results
+
+
+def bench_latency(server, requests):
+    client = _client(server)
+    samples, errors = [], 0
+    try:
+        for i in range(requests):
+            try:
+                samples.append(_timed_send(client, f"gecikme {i}"))
+            except Exception:
+                errors += 1
+    finally:
+        client.close()
+    return summarize(samples, errors)
+
+
+def bench_stream(server, requests):
+    client = _client(server)
+    first_chunk, total, errors = [], [], 0
+    try:
+        for i in range(requests):
+            started = time.perf_counter()
+            first = []
+
+            def on_chunk(text, first=first):
+                if not first:
+                    first.append((time.perf_counter() - started) * 1000)
+
+            try:
+                client.stream(f"akış {i}", on_chunk).result()
+            except Exception:
+                errors += 1
+                continue
+            total.append((time.perf_counter() - started) * 1000)
+            first_chunk += first
+    finally:
+        client.close()
+    summary = summarize(total, errors)
+    return {'errors': errors,
+            'first_chunk_p50_ms': _round(percentile(first_chunk, 50)),
+            'first_chunk_p95_ms': _round(percentile(first_chunk, 95)),
+            'total_p50_ms': summary['p50_ms'],
+            'total_p95_ms': summary['p95_ms']}
+
+
+def bench_throughput(server, concurrency, requests):
+    """concurrency gönderici thread'i toplam `requests` mesajı paylaşır"""
+    client = _client(server, max_in_flight=concurrency)
+    samples, errors = [], [0]
+    lock = threading.Lock()
+    remaining = [requests]
+
+    def sender():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+                i = remaining[0]
+            try:
+                elapsed = _timed_send(client, f"yük {i}")
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                continue
+            with lock:
+                samples.append(elapsed)
+
+    threads = [threading.Thread(target=sender, daemon=True) for _ in range(concurrency)]
+    started = time.perf_counter()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        client.close()
+    duration = time.perf_counter() - started
+    result = summarize(samples, errors[0])
+    result.update(concurrency=concurrency, duration_s=round(duration, 3),
+                  messages_per_s=round(len(samples) / duration, 1))
+    return result
+
+
+def bench_memory(server, messages, checkpoints=10):
+    """Uzun oturum: her mesaj ve yanıtı transcript modeline eklenir.
+
+    Büyüme yalnızca halka dolduktan (mesaj atılmaya başladıktan) sonraki
+    noktalardan hesaplanır; halka hiç dolmazsa None döner.
+    """
+    client = _client(server)
+    model = TranscriptModel()
+    step = max(1, messages // checkpoints)
+    points = []
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        for i in range(1, messages + 1):
+            message = f"oturum {i}"
+            model.append("Siz", message)
+            try:
+                model.append("PhantomAI", client.send(message).result())
+            except Exception:
+                pass
+            if i % step == 0:
+                points.append({'messages': i,
+                               'traced_kb': round((tracemalloc.get_traced_memory()[0] - baseline) / 1024, 1),
+                               'ring_full': len(model) >= model.max_messages})
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        client.close()
+
+    # Halka dolduktan sonraki büyüme, sızıntıyı gösterir
+    growth = None
+    full = [point for point in points if point['ring_full']]
+    if len(full) >= 2:
+        first, last = full[0], full[-1]
+        growth = round((last['traced_kb'] - first['traced_kb'])
+                       / (last['messages'] - first['messages']) * 1000, 1)
+    return {'messages': messages, 'ring_size': model.max_messages, 'checkpoints': points,
+            'peak_kb': round((peak - baseline) / 1024, 1), 'growth_kb_per_1k': growth,
+            'max_rss_kb': _max_rss_kb()}
+
+
+def bench_session(server, turns):
+    """Tek konuşmada art arda turlar; ilk ve son turların boyutu/süresi sabit kalmalı"""
+    client = _client(server)
+    sent, samples = [], []
+    try:
+        for i in range(turns):
+            before = client.chat_client.transfer.bytes_sent
+            samples.append(_timed_send(client, f"tur {i}: önceki yanıta göre devam et"))
+            sent.append(client.chat_client.transfer.bytes_sent - before)
+        conversation = client.conversation.stats()
+    finally:
+        client.close()
+    window = max(1, turns // 10)
+    first, last = samples[:window], samples[-window:]
+    stored = server.conversations.context_size(conversation['id'])
+    return {'turns': turns, 'first_turn_bytes_sent': sent[0], 'last_turn_bytes_sent': sent[-1],
+            'max_turn_bytes_sent': max(sent), 'first_turns_p50_ms': _round(percentile(first, 50)),
+            'last_turns_p50_ms': _round(percentile(last, 50)), 'resyncs': conversation['resyncs'],
+            'server_context_turns': stored}
+
+
+def bench_transfer(server, requests):
+    """Aynı mesajlar düz JSON ve müzakere edilen kodlamayla (gönderim + akış)"""
+    results = {}
+    message = "aktarım " + "bağlam " * 200
+    for name, compression in (('plain', False), ('negotiated', True)):
+        client = _client(server, compression=compression)
+        try:
+            for i in range(requests):
+                client.send(f"{message}{i}").result()
+                client.stream(f"{message}{i}", lambda text: None).result()
+            results[name] = client.chat_client.transfer.snapshot()
+            results[name]['codec'] = repr(client.chat_client.codec(server.url))
+        finally:
+            client.close()
+    plain, negotiated = results['plain'], results['negotiated']
+    if negotiated['bytes_received']:
+        results['received_saving'] = round(1 - negotiated['bytes_received'] / plain['bytes_received'], 3)
+    return results
+
+
+def bench_outbox(server, messages):
+    """Server erişilemezken kuyruğa alınan mesajlar, bağlantı gelince toplu gönderilir"""
+    client = _client(server)
+    available = threading.Event()
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = client.enable_outbox(path=os.path.join(directory, 'outbox.db'))
+        outbox.is_available = available.is_set
+        try:
+            samples = []
+            for i in range(messages):
+                started = time.perf_counter()
+                outbox.put(f"kuyruk {i}")
+                samples.append((time.perf_counter() - started) * 1000)
+            started = time.perf_counter()
+            available.set()
+            outbox.kick(flush_all=True)
+            while outbox.depth and time.perf_counter() - started < 60:
+                time.sleep(0.005)
+            elapsed = time.perf_counter() - started
+            stats = outbox.stats()
+        finally:
+            client.close()
+    return {'messages': messages, 'put_p50_ms': _round(percentile(samples, 50)),
+            'put_p95_ms': _round(percentile(samples, 95)), 'delivered': stats['delivered'],
+            'flush_ms': _round(elapsed * 1000), 'flush_per_s': _round(stats['delivered'] / elapsed)}
+
+
+def _max_rss_kb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+# --- Sonuçlar ------------------------------------------------------------------
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ''
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'), 'commit': commit or None,
+            'python': platform.python_version(), 'platform': platform.platform()}
+
+
+def run(args):
+    params = {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    results = {'meta': metadata(), 'params': params}
+    server = StandinServer('127.0.0.1', 0, delay=args.delay, jitter=args.jitter,
+                           payload_size=args.payload_size, error_rate=args.error_rate,
+                           stream_chunks=args.stream_chunks).start()
+    try:
+        if not args.skip_discovery:
+            logger.info("Keşif ölçülüyor...")
+            results['discovery'] = bench_discovery(args.discovery_port)
+        logger.info("Gecikme ölçülüyor...")
+        results['latency'] = bench_latency(server, args.requests)
+        results['stream'] = bench_stream(server, args.requests)
+        results['throughput'] = []
+        for concurrency in args.concurrency:
+            logger.info(f"Verim ölçülüyor: {concurrency} gönderici...")
+            results['throughput'].append(bench_throughput(server, concurrency, max(args.requests, concurrency * 10)))
+        logger.info("Konuşma oturumu ölçülüyor...")
+        results['session'] = bench_session(server, args.requests)
+        logger.info("Aktarım boyutu ölçülüyor...")
+        results['transfer'] = bench_transfer(server, min(args.requests, 50))
+        logger.info("Giden kutusu ölçülüyor...")
+        results['outbox'] = bench_outbox(server, args.requests)
+        logger.info("Bellek ölçülüyor...")
+        results['memory'] = bench_memory(server, args.session_messages)
+    finally:
+        server.stop()
+    return results
+
+
+def _lookup(results, path):
+    for key in path:
+        if not isinstance(results, dict) or key not in results:
+            return None
+        results = results[key]
+    return results
+
+
+def compare(baseline, results):
+    """Ana metriklerin değişimini satır satır döndürür"""
+    rows = []
+    metrics = list(KEY_METRICS)
+    for entry in results.get('throughput', []):
+        metrics.append((('throughput', entry['concurrency'], 'messages_per_s'), True))
+
+    def value(data, path):
+        if path[0] == 'throughput':
+            entries = {entry['concurrency']: entry for entry in data.get('throughput', [])}
+            return entries.get(path[1], {}).get(path[2])
+        return _lookup(data, path)
+
+    for path, higher_is_better in metrics:
+        old, new = value(baseline, path), value(results, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = change >= 0 if higher_is_better else change <= 0
+        rows.append(f"{'.'.join(map(str, path)):<40} {old:>10} -> {new:>10}  "
+                    f"{change:+6.1f}% {'✓' if better else '✗'}")
+    return rows
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    for noisy in ('server_pool', 'health_monitor', 'discovery', 'chat_client'):
+        logging.getLogger(noisy).setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(description='PhantomAI istemci benchmark\'ı')
+    parser.add_argument('--delay', type=float, default=0.02, help='Stand-in yanıt gecikmesi (sn)')
+    parser.add_argument('--jitter', type=float, default=0.005, help='Gecikme sapması (sn)')
+    parser.add_argument('--payload-size', type=int, default=1024, help='Yanıt uzunluğu (karakter)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='HTTP 500 oranı (0-1)')
+    parser.add_argument('--stream-chunks', type=int, default=8, help='Akışlı yanıttaki parça sayısı')
+    parser.add_argument('--requests', type=int, default=200, help='Ölçüm başına istek sayısı')
+    parser.add_argument('--concurrency', type=lambda s: [int(n) for n in s.split(',')], default=[1, 4, 16],
+                        help='Eşzamanlı gönderici sayıları (virgülle)')
+    parser.add_argument('--session-messages', type=int, default=2000, help='Bellek ölçümündeki mesaj sayısı')
+    parser.add_argument('--discovery-port', type=int, default=18001)
+    parser.add_argument('--skip-discovery', action='store_true')
+    parser.add_argument('--output', help='Sonuç JSON dosyası (varsayılan: stdout)')
+    parser.add_argument('--baseline', help='Karşılaştırılacak önceki sonuç dosyası')
+    args = parser.parse_args()
+
+    results = run(args)
+    data = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(data)
+        logger.info(f"Sonuçlar yazıldı: {args.output}")
+    else:
+        print(data)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\nKarşılaştırma: {args.baseline} ({_lookup(baseline, ('meta', 'commit'))})")
+        for row in compare(baseline, results):
+            print(row)
@@ -0,0 +1,589 @@
+"""PhantomAI server'ına HTTP istemcisi.
+
+/chat istekleri sınırlı bir worker havuzunda, server başına tutulan
+requests oturumlarıyla gönderilir. Yanıtlar düz JSON, SSE, NDJSON ya da
+chunked text olarak akabilir; gövde kodlaması /health'te müzakere edilir
+(bkz. codec), konuşma turları oturum olarak gönderilir (bkz. conversation).
+Hatalar ChatError'dır; retryable olanlar giden kutusunda tekrar denenir.
+"""
+import threading
+import queue
+import json
+import time
+import logging
+import codecs
+
+from codec import PLAIN, BodyReader, Codec
+
+# requests ve concurrent.futures ilk ağ kullanımında yüklenir: requests
+# (urllib3, certifi...) tek başına açılışa ~80 ms ekliyor
+
+logger = logging.getLogger(__name__)
+
+
+class ChatError(Exception):
+    """Server'ın anlamlı bir hata döndürdüğü durumlar.
+
+    retryable: aynı istek daha sonra tekrar denenirse başarılı olabilir
+    (5xx, 408/429, erişilebilir server yok).
+    """
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def http_error(status_code):
+    return ChatError(f"HTTP {status_code}", retryable=status_code >= 500 or status_code in (408, 429))
+
+
+def is_retryable(error):
+    """Ağ hataları (requests'inkiler dahil OSError) ve geçici server hataları tekrar denenebilir"""
+    if isinstance(error, ChatError):
+        return error.retryable
+    return isinstance(error, OSError)
+
+
+def error_text(error):
+    """Kullanıcıya gösterilen hata metni"""
+    return str(error) if isinstance(error, ChatError) else f"Hata: {str(error)}"
+
+
+class WorkerPool:
+    """Kuyruk beslemeli, sınırlı sayıda daemon thread'den oluşan havuz.
+
+    Thread'ler ihtiyaç oldukça max_workers'a kadar açılır ve kapanmaz;
+    yoğun kullanımda thread sayısı sabit kalır.
+    """
+
+    def __init__(self, max_workers=4, name='phantom-net'):
+        self.max_workers = max_workers
+        self.name = name
+        self._queue = queue.SimpleQueue()
+        self._threads = []
+        # _pending: henüz bir thread'in almadığı işler, _idle: iş bekleyen
+        # (ya da açılmakta olan) thread'ler. İkisi de işi alan thread'de
+        # birlikte azaltılır; aradaki fark hiçbir anda kaymaz.
+        self._pending = 0
+        self._idle = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, fn, *args):
+        if self._closed:
+            raise RuntimeError("Havuz kapatıldı")
+        from concurrent.futures import Future
+
+        future = Future()
+        with self._lock:
+            self._pending += 1
+            if self._pending > self._idle and len(self._threads) < self.max_workers:
+                self._idle += 1
+                thread = threading.Thread(target=self._work, daemon=True,
+                                          name=f"{self.name}-{len(self._threads)}")
+                self._threads.append(thread)
+                thread.start()
+            self._queue.put((future, fn, args))
+        return future
+
+    def _work(self):
+        while True:
+            item = self._queue.get()
+            with self._lock:
+                self._idle -= 1
+                if item is not None:
+                    self._pending -= 1
+            if item is None:
+                return
+            future, fn, args = item
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._idle += 1
+                continue
+            try:
+                result = fn(*args)
+            except BaseException as e:
+                error = e
+            else:
+                error = None
+            # Sonuç bildirilmeden boşa çık: sonucu bekleyen çağıranın hemen
+            # gönderdiği iş yeni thread açmadan bu thread'e düşer
+            with self._lock:
+                self._idle += 1
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+                del error
+
+    def shutdown(self):
+        self._closed = True
+        # Bekleyen işleri iptal et, thread'leri uyandırıp kapat
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[0].cancel()
+        for _ in self._threads:
+            self._queue.put(None)
+
+
+class TransferStats:
+    """Tüm istekler için tel byte'ları ve gövde çözme süresi toplamları"""
+
+    def __init__(self):
+        self.requests = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bytes_decoded = 0
+        self.decode_ms = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, sent, received, decoded, decode_ms):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += sent
+            self.bytes_received += received
+            self.bytes_decoded += decoded
+            self.decode_ms += decode_ms
+
+    def snapshot(self):
+        with self._lock:
+            n = self.requests or 1
+            return {
+                'requests': self.requests,
+                'bytes_sent': self.bytes_sent,
+                'bytes_received': self.bytes_received,
+                'bytes_decoded': self.bytes_decoded,
+                'received_per_request': round(self.bytes_received / n, 1),
+                'compression_ratio': round(self.bytes_decoded / self.bytes_received, 2)
+                if self.bytes_received else None,
+                'decode_ms_per_request': round(self.decode_ms / n, 3),
+            }
+
+
+class ChatClient:
+    """PhantomAI server'ı ile konuşan tek HTTP alt sistemi.
+
+    Tüm istekler sabit boyutlu bir worker havuzunun kuyruğuna gönderilir,
+    her server URL'si için keep-alive bağlantı havuzlu bir Session tutulur.
+    Böylece her mesaj için yeni thread ve yeni TCP/TLS el sıkışması olmaz.
+
+    compression açıksa her server için gövde formatı ve sıkıştırma /health
+    yanıtından müzakere edilir (bkz. codec); aksi halde düz JSON gider.
+    """
+
+    # Bu süre içinde kullanılmış bağlantı hâlâ açık sayılır
+    WARM_SECONDS = 30
+
+    def __init__(self, max_workers=4, pool_size=8, compression=True):
+        self.pool_size = pool_size
+        self.compression = compression
+        self.transfer = TransferStats()
+        self._pool = WorkerPool(max_workers)
+        self._sessions = {}
+        self._last_used = {}
+        self._codecs = {}
+        # /health'te bildirilen özellikler (ör. 'batch'), server başına
+        self._features = {}
+        self._lock = threading.Lock()
+
+    def session(self, server_url):
+        """server_url için paylaşılan Session'ı döndürür (yoksa oluşturur)"""
+        with self._lock:
+            session = self._sessions.get(server_url)
+            if session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[server_url] = session
+            return session
+
+    def _touch(self, server_url):
+        self._last_used[server_url] = time.monotonic()
+
+    def codec(self, server_url):
+        """server_url için müzakere edilmiş Codec (henüz /health yoksa düz JSON)"""
+        return self._codecs.get(server_url, PLAIN)
+
+    def _request(self, server_url, payload, accept=None, conversation=None, idempotency_key=None, path='/chat',
+                 **kwargs):
+        """/chat'e payload'ı seçili codec'le gönderir; (yanıt, gönderilen byte).
+
+        accept: codec'in kabul ettiği gövde türlerinden önce tercih edilen
+        türler (akış formatları).
+
+        Server sıkıştırılmış/ikili gövdeyi 415 ile reddederse düz JSON'a
+        düşülür ve istek bir kez tekrarlanır. conversation verilirse
+        mesaja oturum alanları eklenir; server 409 ile durumunun eksik ya
+        da eski olduğunu bildirirse istek bir kez resync farkıyla tekrarlanır.
+        idempotency_key verilirse Idempotency-Key başlığıyla gönderilir;
+        aynı anahtarlı tekrar, server'da ikinci kez işlenmez.
+        """
+        codec = self.codec(server_url)
+        if conversation is not None:
+            payload = dict(payload, **conversation.fields())
+        resynced = False
+        sent = 0
+        while True:
+            body, headers = codec.encode(payload)
+            headers.update(codec.accept_headers())
+            if not self.compression:
+                headers['Accept-Encoding'] = 'identity'
+            if accept:
+                headers['Accept'] = f"{accept}, {headers['Accept']}"
+            if idempotency_key is not None:
+                headers['Idempotency-Key'] = idempotency_key
+            response = self.session(server_url).post(f"{server_url}{path}", data=body, headers=headers,
+                                                     stream=True, **kwargs)
+            sent += len(body)
+            if response.status_code == 415 and codec.compact:
+                response.close()
+                logger.info(f"{server_url} {codec} kabul etmedi, düz JSON'a geçiliyor")
+                codec = self._codecs[server_url] = PLAIN
+            elif response.status_code == 409 and conversation is not None and not resynced:
+                try:
+                    known = BodyReader(response).json()
+                except ValueError:
+                    known = {}
+                finally:
+                    response.close()
+                if not isinstance(known, dict):
+                    known = {}
+                logger.info(f"{server_url} konuşma durumu eksik/eski (server seq {known.get('seq')}), "
+                            f"resync yapılıyor")
+                payload = dict(payload, **conversation.resync_fields(known.get('seq'), known.get('state')))
+                resynced = True
+            else:
+                return response, sent
+
+    def _record_transfer(self, reader, sent, trace):
+        decode_ms = reader.decode_s * 1000
+        self.transfer.add(sent, reader.wire_bytes, reader.body_bytes, decode_ms)
+        if trace is not None:
+            trace.record_transfer(sent, reader.wire_bytes, reader.body_bytes, decode_ms)
+
+    def submit(self, fn, *args, callback=None, error_callback=None):
+        """fn'i havuzda çalıştırır; Future döndürür, sonuç callback'lere iletilir"""
+        future = self._pool.submit(fn, *args)
+
+        if callback or error_callback:
+            def done(f):
+                try:
+                    result = f.result()
+                except Exception as e:
+                    if error_callback:
+                        error_callback(error_text(e))
+                    return
+                if callback:
+                    callback(result)
+
+            future.add_done_callback(done)
+        return future
+
+    def supports(self, server_url, feature):
+        return feature in self._features.get(server_url, ())
+
+    def _post_chat(self, server_url, message, trace=None, conversation=None, idempotency_key=None):
+        if trace is not None:
+            trace.mark('request_start')
+        started = time.perf_counter()
+        response, sent = self._request(server_url, {"message": message}, conversation=conversation,
+                                       idempotency_key=idempotency_key, timeout=30)
+        try:
+            self._touch(server_url)
+            if trace is not None:
+                # elapsed: istek gönderiminden yanıt başlıklarının okunmasına kadar
+                trace.mark('first_byte', started + response.elapsed.total_seconds())
+
+            if response.status_code != 200:
+                raise http_error(response.status_code)
+            reader = BodyReader(response)
+            try:
+                data = reader.json()
+            except ValueError:
+                raise ChatError("Server'dan geçersiz yanıt")
+            self._record_transfer(reader, sent, trace)
+            if not isinstance(data, dict) or 'reply' not in data:
+                raise ChatError("Server'dan geçersiz yanıt")
+            if trace is not None:
+                trace.mark('decoded')
+            if conversation is not None:
+                conversation.commit(message, data['reply'])
+            return data['reply']
+        finally:
+            response.close()
+
+    def _stream_chat(self, server_url, message, on_chunk, trace=None, conversation=None, idempotency_key=None):
+        """/chat yanıtını geldikçe on_chunk'a iletir, tam metni döndürür.
+
+        SSE (text/event-stream), NDJSON ve düz chunked text desteklenir;
+        server akış yapmıyorsa tek parça {"reply": ...} JSON'una düşülür.
+        """
+        if trace is not None:
+            trace.mark('request_start')
+        response, sent = self._request(
+            server_url, {"message": message, "stream": True},
+            'text/event-stream, application/x-ndjson',
+            conversation, idempotency_key, timeout=(5, 30)
+        )
+        if trace is not None:
+            trace.mark('first_byte')
+        try:
+            if response.status_code != 200:
+                raise http_error(response.status_code)
+
+            content_type = response.headers.get('Content-Type', '')
+            mime = content_type.split(';')[0].strip().lower()
+            encoding = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+            reader = BodyReader(response)
+
+            parts = []
+
+            def emit(text):
+                if text:
+                    parts.append(text)
+                    on_chunk(text)
+
+            if mime == 'text/event-stream':
+                for data in iter_sse(iter_text_lines(reader.chunks(), encoding)):
+                    if data == '[DONE]':
+                        break
+                    emit(reader.timed(parse_token, data))
+            elif mime == 'application/x-ndjson':
+                for line in iter_text_lines(reader.chunks(), encoding):
+                    if line:
+                        emit(reader.timed(parse_token, line))
+            elif mime.startswith('text/'):
+                decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+                for chunk in reader.chunks():
+                    emit(decoder.decode(chunk))
+                emit(decoder.decode(b'', final=True))
+            else:
+                try:
+                    data = reader.json()
+                except ValueError:
+                    raise ChatError("Server'dan geçersiz yanıt")
+                if not isinstance(data, dict) or 'reply' not in data:
+                    raise ChatError("Server'dan geçersiz yanıt")
+                emit(data['reply'])
+
+            self._record_transfer(reader, sent, trace)
+            self._touch(server_url)
+            if trace is not None:
+                trace.mark('decoded')
+            reply = ''.join(parts)
+            if conversation is not None:
+                conversation.commit(message, reply)
+            return reply
+        finally:
+            response.close()
+
+    def _post_batch(self, server_url, items, conversation=None):
+        """[(anahtar, mesaj)] listesini tek istekte gönderir.
+
+        [{'key', 'reply'} ya da {'key', 'error', 'retryable'}] döndürür; sıra
+        korunur. Server /chat/batch bildirmiyorsa mesajlar sırayla tek tek
+        gönderilir ve ilk geçici hatada durulur.
+        """
+        if not self.supports(server_url, 'batch'):
+            return self._post_each(server_url, items, conversation)
+
+        payload = {'messages': [{'key': key, 'message': message} for key, message in items]}
+        response, sent = self._request(server_url, payload, conversation=conversation, path='/chat/batch',
+                                       timeout=30 + 5 * len(items))
+        try:
+            self._touch(server_url)
+            if response.status_code != 200:
+                raise http_error(response.status_code)
+            reader = BodyReader(response)
+            try:
+                data = reader.json()
+            except ValueError:
+                raise ChatError("Server'dan geçersiz yanıt")
+            self._record_transfer(reader, sent, None)
+        finally:
+            response.close()
+
+        results = data.get('results') if isinstance(data, dict) else None
+        if not isinstance(results, list):
+            raise ChatError("Server'dan geçersiz yanıt")
+        messages = dict(items)
+        for result in results:
+            if conversation is not None and 'reply' in result and result.get('key') in messages:
+                conversation.commit(messages[result['key']], result['reply'])
+        return results
+
+    def _post_each(self, server_url, items, conversation):
+        results = []
+        for key, message in items:
+            try:
+                reply = self._post_chat(server_url, message, None, conversation, key)
+            except Exception as e:
+                results.append({'key': key, 'error': error_text(e), 'retryable': is_retryable(e)})
+                if is_retryable(e):
+                    break
+                continue
+            results.append({'key': key, 'reply': reply})
+        return results
+
+    def _get_health(self, server_url, timeout):
+        response = self.session(server_url).get(f"{server_url}/health", timeout=timeout)
+        self._touch(server_url)
+        if response.status_code != 200:
+            return False
+        # /health desteklenen kodlama ve özellikleri de bildirebilir
+        try:
+            capabilities = response.json()
+        except ValueError:
+            capabilities = None
+        features = capabilities.get('features') if isinstance(capabilities, dict) else None
+        self._features[server_url] = frozenset(features) if isinstance(features, list) else frozenset()
+        if self.compression:
+            # Kodlama bildirmeyen server düz JSON alır
+            codec = Codec.negotiate(capabilities)
+            previous = self.codec(server_url)
+            if (previous.format, previous.encoding) != (codec.format, codec.encoding):
+                logger.info(f"{server_url} gövde kodlaması: {codec}")
+            self._codecs[server_url] = codec
+        return True
+
+    @staticmethod
+    def _served(fn, on_served):
+        """fn'in başarılı yanıtını, yanıtı veren server'la on_served'e de bildirir"""
+        if on_served is None:
+            return fn
+
+        def served(server_url, *args):
+            reply = fn(server_url, *args)
+            on_served(server_url, reply)
+            return reply
+        return served
+
+    def _stream_pooled(self, pool, message, on_chunk, trace=None, conversation=None, idempotency_key=None,
+                       on_served=None):
+        started = False
+
+        def chunk(text):
+            nonlocal started
+            started = True
+            on_chunk(text)
+
+        # Kullanıcı yanıtın bir kısmını gördüyse başka server'da yeniden deneme
+        return pool.call(self._served(self._stream_chat, on_served), message, chunk, trace, conversation, idempotency_key,
+                         idempotent=lambda: not started)
+
+    def send_chat_pooled(self, pool, message, callback, error_callback, trace=None, conversation=None,
+                         idempotency_key=None, on_served=None):
+        """/chat isteğini kuyruğa ekler; istek ServerPool'un seçtiği server'a
+        gider, yanıt metni callback'e gelir.
+
+        trace (metrics.Trace) verilirse istek aşamaları üzerine işaretlenir.
+        conversation (conversation.Conversation) verilirse yalnızca yeni tur
+        gönderilir, başarılı yanıt geçmişe eklenir. on_served(server_url,
+        yanıt) verilirse yanıtı veren üyeyle worker thread'inde çağrılır.
+        """
+        return self.submit(pool.call, self._served(self._post_chat, on_served), message, trace, conversation, idempotency_key,
+                           callback=callback, error_callback=error_callback)
+
+    def stream_chat_pooled(self, pool, message, on_chunk, callback, error_callback, trace=None,
+                           conversation=None, idempotency_key=None, on_served=None):
+        """Akışlı /chat; parçalar worker thread'inde on_chunk'a, tam yanıt callback'e gelir"""
+        return self.submit(self._stream_pooled, pool, message, on_chunk, trace, conversation, idempotency_key,
+                           on_served, callback=callback, error_callback=error_callback)
+
+    def send_batch_pooled(self, pool, items, conversation=None):
+        """_post_batch'i havuzun seçtiği server'da çalıştırır; Future döndürür.
+
+        Mesajlar idempotency anahtarı taşıdığı için başka server'da
+        tekrarlanmaları güvenlidir.
+        """
+        return self.submit(pool.call, self._post_batch, items, conversation)
+
+    def health(self, server_url, timeout=5):
+        """Senkron /health kontrolü (sağlık izleyicisi kendi thread'inden çağırır)"""
+        return self._get_health(server_url, timeout)
+
+    def check_health(self, server_url, timeout=5):
+        """/health kontrolü; Future sonucu True/False"""
+        return self._pool.submit(self._get_health, server_url, timeout)
+
+    def prewarm(self, server_url):
+        """Kullanıcı yazmaya başlarken bağlantıyı önceden açar"""
+        if not server_url:
+            return
+        last = self._last_used.get(server_url)
+        if last is not None and time.monotonic() - last < self.WARM_SECONDS:
+            return
+        # Aynı anda birden fazla ısıtma isteği gitmesin
+        self._touch(server_url)
+
+        def warm():
+            try:
+                self._get_health(server_url, 2)
+            except Exception as e:
+                logger.debug(f"Bağlantı ısıtma başarısız: {e}")
+                self._last_used.pop(server_url, None)
+
+        self._pool.submit(warm)
+
+    def close(self):
+        self._pool.shutdown()
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+def iter_text_lines(chunks, encoding='utf-8'):
+    """Byte parçalarından satırlar (sonlarındaki \r\n olmadan)"""
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    pending = ''
+    for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            yield line.rstrip('\r')
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield pending.rstrip('\r')
+
+
+def iter_sse(lines):
+    """SSE satırlarından her olayın data alanını döndürür"""
+    data_lines = []
+    for line in lines:
+        if not line:
+            if data_lines:
+                yield '\n'.join(data_lines)
+                data_lines = []
+            continue
+        if line.startswith('data:'):
+            value = line[5:]
+            data_lines.append(value[1:] if value.startswith(' ') else value)
+    if data_lines:
+        yield '\n'.join(data_lines)
+
+
+def parse_token(data):
+    """Akış parçasından metni çıkarır: JSON ({"token"|"delta"|"reply"}) ya da düz metin"""
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return data
+    if isinstance(payload, str):
+        return payload
+    if not isinstance(payload, dict):
+        return data
+    if 'error' in payload:
+        raise ChatError(f"Server hatası: {payload['error']}")
+    for key in ('token', 'delta', 'reply'):
+        if key in payload:
+            return payload[key]
+    return ''
@@ -0,0 +1,305 @@
+"""PhantomAI istemcisinin arayüzden bağımsız çekirdeği.
+
+Keşif, bağlantı, gönderim ve akış burada yapılır; Tk arayüzü (main.py),
+benchmark ve testler aynı API'yi kullanır. Callback'ler worker ya da
+monitor thread'lerinden çağrılır; arayüz kendi thread'ine aktarmalıdır.
+
+    client = PhantomClient(discovery_cache=None)
+    client.discover(networks=['192.168.1.0/24'])
+    print(client.send("merhaba").result())
+    client.close()
+"""
+import logging
+import threading
+import time
+
+from chat_client import ChatClient, ChatError, error_text, is_retryable
+from conversation import Conversation
+from health_monitor import DOWN
+from server_pool import ServerPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_URL = 'http://localhost:8001'
+
+# Varsayılanı kullanmak için verilmeyen argümanları ayırt eder
+_DEFAULT = object()
+
+
+class PhantomClient:
+    """Server havuzu, HTTP istemcisi ve önbelleklerin sahibi.
+
+    discovery_cache: DiscoveryCache ya da None (verilmezse kullanıcının
+    önbelleği kullanılır). on_health_change(state, stats): havuzun genel
+    sağlık durumu değişince çağrılır. compression: server /health'te
+    bildiriyorsa gzip/zstd ve MessagePack kullanılır. sessions: mesajlar
+    bir konuşma oturumunun turları olarak gönderilir (bkz. conversation);
+    server önceki turları kendisi tutar. enable_outbox() sonrası mesajlar
+    önce diskteki giden kutusuna yazılır; server'a ulaşılamazsa kaybolmaz,
+    bağlantı gelince toplu gönderilir (bkz. outbox).
+
+    Keşif (asyncio, socket), HTTP (requests) ve önbellek modülleri ilk
+    kullanımda yüklenir; nesneyi oluşturmak açılışı yavaşlatmaz.
+    """
+
+    def __init__(self, server_url=DEFAULT_SERVER_URL, max_in_flight=4, on_health_change=None,
+                 discovery_cache=_DEFAULT, streaming=True, compression=True, sessions=True):
+        self.server_url = server_url
+        self.streaming = streaming
+        self.chat_client = ChatClient(max_workers=max_in_flight + 2, compression=compression)
+        self._discovery_cache = discovery_cache
+        self._on_health_change = on_health_change or (lambda state, stats: None)
+        self.server_pool = ServerPool(self.chat_client.health, self._health_changed)
+        self.reply_cache = None
+        self.outbox = None
+        self.conversation = Conversation() if sessions else None
+
+    # --- Keşif ve bağlantı ---------------------------------------------------
+
+    @property
+    def discovery_cache(self):
+        if self._discovery_cache is _DEFAULT:
+            from discovery import DiscoveryCache
+
+            self._discovery_cache = DiscoveryCache()
+        return self._discovery_cache
+
+    def discover(self, **kwargs):
+        """Tüm sağlıklı server'ları bulup havuza koyar; DiscoveryResult döndürür"""
+        from discovery import discover_sync
+
+        kwargs.setdefault('cache', self.discovery_cache)
+        kwargs.setdefault('all_servers', True)
+        result = discover_sync(**kwargs)
+        if result.servers:
+            self.server_url = result.url
+            self.server_pool.set_members(result.servers)
+        else:
+            # Varsayılan adres izlenmeye devam eder; server açılınca durum düzelir
+            self.server_pool.set_members([(self.server_url, None)])
+        return result
+
+    def discover_async(self, callback, error_callback=None, **kwargs):
+        """discover()'u ayrı thread'de çalıştırır; sonuç callback'e gelir"""
+        def run():
+            try:
+                result = self.discover(**kwargs)
+            except Exception as e:
+                logger.error(f"Otomatik algılama hatası: {e}")
+                if error_callback:
+                    error_callback(str(e))
+                return
+            callback(result)
+
+        threading.Thread(target=run, daemon=True, name='discovery').start()
+
+    def connect(self, server_url, callback=None, error_callback=None):
+        """Elle verilen server'ı /health ile doğrular ve havuzun tek üyesi yapar"""
+        self.server_url = server_url
+        self.server_pool.set_members([(server_url, None)])
+        started = time.perf_counter()
+
+        def done(future):
+            try:
+                healthy = future.result()
+            except Exception:
+                healthy, error = False, "Bağlantı hatası"
+            else:
+                error = "Server yanıt vermiyor"
+            if healthy:
+                latency = (time.perf_counter() - started) * 1000
+                if self.discovery_cache is not None:
+                    self.discovery_cache.record_success(server_url, latency)
+                if callback:
+                    callback(latency)
+            elif error_callback:
+                error_callback(error)
+
+        future = self.chat_client.check_health(server_url)
+        future.add_done_callback(done)
+        return future
+
+    def _health_changed(self, state, stats):
+        if self.outbox is not None and state != DOWN:
+            # Bağlantı geri geldi: geri çekilmede bekleyenler dahil hepsi gönderilsin
+            self.outbox.kick(flush_all=True)
+        self._on_health_change(state, stats)
+
+    def prewarm(self):
+        self.chat_client.prewarm(self.server_url)
+
+    def is_down(self):
+        return self.server_pool.is_down()
+
+    # --- Yanıt önbelleği -----------------------------------------------------
+
+    def enable_reply_cache(self, disk_path=_DEFAULT, **kwargs):
+        if self.reply_cache is None:
+            from reply_cache import REPLY_CACHE_PATH, ReplyCache
+
+            if disk_path is _DEFAULT:
+                disk_path = REPLY_CACHE_PATH
+            self.reply_cache = ReplyCache(disk_path=disk_path, **kwargs)
+        return self.reply_cache
+
+    def cached_reply(self, message, bypass=False):
+        """Önbellekteki yanıt ya da None; bypass ise kayıt silinir.
+
+        Kayıt, isteğin gideceği server'a ve konuşmanın o anki durumuna
+        göre aranır. İsabet konuşmaya tur olarak eklenir: kullanıcının
+        gördüğü yanıt sonraki turların bağlamında yer alır.
+        """
+        if self.reply_cache is None:
+            return None
+        server_url, state = self._preferred_url(), self._conversation_state()
+        if bypass:
+            self.reply_cache.invalidate(server_url, message, state)
+            return None
+        reply = self.reply_cache.get(server_url, message, state)
+        if reply is not None and self.conversation is not None:
+            self.conversation.commit(message, reply)
+        return reply
+
+    def _preferred_url(self):
+        urls = self.server_pool.urls()
+        return urls[0] if urls else self.server_url
+
+    def _conversation_state(self):
+        return self.conversation.fields()['state'] if self.conversation is not None else None
+
+    # --- Giden kutusu -----------------------------------------------------------
+
+    def enable_outbox(self, path=_DEFAULT, **kwargs):
+        """Kalıcı giden kutusunu açar ve teslim thread'ini başlatır.
+
+        kwargs Outbox'a gider (on_delivered, on_failed, on_change, ...);
+        önceki oturumdan kalan mesajlar bağlantı gelince gönderilir.
+        """
+        if self.outbox is None:
+            from outbox import OUTBOX_PATH, Outbox
+
+            if path is _DEFAULT:
+                path = OUTBOX_PATH
+            self.outbox = Outbox(self._send_batch, lambda: not self.is_down(), path=path, **kwargs).start()
+        return self.outbox
+
+    def _send_batch(self, items):
+        if not self.server_pool.members:
+            self.server_pool.set_members([(self.server_url, None)])
+        return self.chat_client.send_batch_pooled(self.server_pool, items, self.conversation).result()
+
+    # --- Gönderim --------------------------------------------------------------
+
+    def new_conversation(self):
+        """Sonraki mesajlar önceki turlardan bağımsız yeni bir konuşma başlatır"""
+        if self.conversation is not None:
+            self.conversation = Conversation(context_turns=self.conversation.context_turns)
+        return self.conversation
+
+    def send(self, message, callback=None, error_callback=None, on_chunk=None, use_cache=False, trace=None,
+             on_queued=None):
+        """Mesajı havuzdaki en uygun server'a gönderir; Future döndürür.
+
+        on_chunk verilirse ve streaming açıksa yanıt parçaları geldikçe ona
+        iletilir. use_cache ise yanıt önbelleğe yazılır. trace (metrics.Trace)
+        verilirse istek aşamaları üzerine işaretlenir.
+
+        Giden kutusu açıksa mesaj önce diske yazılır ve idempotency
+        anahtarıyla gönderilir. Geçici hatada error_callback yerine
+        on_queued(anahtar, hata) çağrılır; yanıt daha sonra giden kutusunun
+        on_delivered callback'ine gelir. Havuz zaten erişilemezse istek hiç
+        gönderilmez, on_queued hemen çağrılır.
+        """
+        if not self.server_pool.members:
+            # Henüz keşif/bağlantı yapılmadı: varsayılan adres kullanılır
+            self.server_pool.set_members([(self.server_url, None)])
+
+        on_served = None
+        if use_cache and self.reply_cache is not None:
+            cache, state = self.reply_cache, self._conversation_state()
+
+            def on_served(server_url, reply):
+                # Yanıtı veren üye ve isteğin gönderildiği andaki konuşma durumu
+                cache.put(server_url, message, reply, state)
+
+        def on_reply(reply):
+            if callback:
+                callback(reply)
+
+        on_error = error_callback or (lambda error: None)
+        outbox = self.outbox
+        key = None
+        if outbox is not None and self.is_down():
+            # Ağa hiç çıkmadan kuyruğa al; bağlantı gelince teslim thread'i gönderir
+            return self._queue_offline(outbox, message, on_error, on_queued)
+        if outbox is not None:
+            key = outbox.put(message, claimed=True)
+            on_reply = self._acked(outbox, key, on_reply)
+            # Hatayı _settle sınıflandırır; metin yerine istisna gerekiyor
+            settle, on_error = self._settle(outbox, key, on_error, on_queued), None
+
+        if on_chunk is not None and self.streaming:
+            future = self.chat_client.stream_chat_pooled(self.server_pool, message, on_chunk, on_reply, on_error,
+                                                         trace, self.conversation, key, on_served)
+        else:
+            future = self.chat_client.send_chat_pooled(self.server_pool, message, on_reply, on_error, trace,
+                                                       self.conversation, key, on_served)
+        if key is not None:
+            future.add_done_callback(settle)
+        return future
+
+    @staticmethod
+    def _queue_offline(outbox, message, on_error, on_queued):
+        from concurrent.futures import Future
+
+        key = outbox.put(message)
+        error = ChatError("Server erişilemez, mesaj kuyrukta", retryable=True)
+        if on_queued is not None:
+            on_queued(key, str(error))
+        else:
+            on_error(str(error))
+        future = Future()
+        future.set_exception(error)
+        return future
+
+    @staticmethod
+    def _acked(outbox, key, on_reply):
+        def acked(reply):
+            outbox.ack(key)
+            on_reply(reply)
+        return acked
+
+    @staticmethod
+    def _settle(outbox, key, on_error, on_queued):
+        def settle(future):
+            if future.cancelled():
+                # Kapanışta iptal: mesaj kutuda kalır, sonraki açılışta gider
+                outbox.release(key)
+                return
+            error = future.exception()
+            if error is None:
+                return
+            if is_retryable(error):
+                # Mesaj kutuda kalır; teslim thread'i geri çekilmeyle tekrar dener
+                outbox.defer(key, error_text(error))
+                (on_queued or (lambda key, error: on_error(error)))(key, error_text(error))
+            else:
+                outbox.ack(key)
+                on_error(error_text(error))
+        return settle
+
+    def stream(self, message, on_chunk, callback=None, error_callback=None, use_cache=False, trace=None,
+               on_queued=None):
+        return self.send(message, callback, error_callback, on_chunk=on_chunk, use_cache=use_cache, trace=trace,
+                         on_queued=on_queued)
+
+    def probe_now(self):
+        self.server_pool.probe_now()
+
+    def close(self):
+        self.server_pool.stop()
+        if self.outbox is not None:
+            self.outbox.close()
+        self.chat_client.close()
+        if self.reply_cache is not None:
+            self.reply_cache.close()
@@ -0,0 +1,188 @@
+"""İstek ve yanıt gövdeleri için sıkıştırma ve kodlama müzakeresi.
+
+Server desteklediklerini /health yanıtında bildirir:
+
+    {"status": "ok", "encodings": ["zstd", "gzip"], "formats": ["msgpack", "json"]}
+
+İstemci bunu kendi desteğiyle kesiştirip bir Codec seçer. Bildirim
+yapmayan (ya da JSON dönmeyen) server'lara düz JSON gönderilir. zstd
+(zstandard) ve MessagePack (msgpack) paketleri isteğe bağlıdır; yoksa
+gzip ve JSON kullanılır.
+
+Yanıtlar ham (sıkıştırılmış) haliyle okunur; böylece tel üzerindeki byte
+sayısı ve açma/çözme süresi ölçülebilir.
+"""
+import json
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+# Bundan küçük istek gövdeleri sıkıştırılmaz; kazanç başlık maliyetini karşılamıyor
+COMPRESS_MIN_BYTES = 1024
+
+
+def supported_encodings():
+    """Bu kurulumda açılabilen içerik kodlamaları, tercih sırasıyla"""
+    encodings = ['gzip', 'deflate']
+    if zstandard is not None:
+        encodings.insert(0, 'zstd')
+    return encodings
+
+
+def supported_formats():
+    return ['msgpack', 'json'] if msgpack is not None else ['json']
+
+
+def parse_accept(header):
+    """"gzip;q=0.5, zstd" -> ['gzip', 'zstd'] (q=0 olanlar hariç)"""
+    values = []
+    for part in (header or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if name and params.replace(' ', '') not in ('q=0', 'q=0.0'):
+            values.append(name)
+    return values
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        # mtime=0 ile aynı gövde aynı byte'lara sıkışır
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        return compressor.compress(data) + compressor.flush()
+    if encoding == 'deflate':
+        return zlib.compress(data, 6)
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return data
+
+
+def decompressor(encoding):
+    """Parça parça açıcı; kodlama yoksa None. Bilinmeyen kodlamada ValueError"""
+    if encoding in ('', 'identity'):
+        return None
+    if encoding in ('gzip', 'x-gzip'):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate':
+        return zlib.decompressobj()
+    if encoding == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Desteklenmeyen içerik kodlaması: {encoding}")
+
+
+def loads(body, content_type=JSON):
+    mime = content_type.split(';')[0].strip().lower()
+    if mime == MSGPACK:
+        if msgpack is None:
+            raise ValueError("msgpack yüklü değil")
+        return msgpack.unpackb(body, raw=False)
+    return json.loads(body)
+
+
+def dumps(payload, fmt='json'):
+    if fmt == 'msgpack':
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK
+    return json.dumps(payload).encode(), JSON
+
+
+class Codec:
+    """Bir server için seçilmiş gövde formatı ve istek sıkıştırması"""
+
+    __slots__ = ('format', 'encoding')
+
+    def __init__(self, fmt='json', encoding=None):
+        self.format = fmt
+        self.encoding = encoding
+
+    @classmethod
+    def negotiate(cls, capabilities):
+        """/health yanıtındaki bildirimden en iyi ortak seçenekleri seçer"""
+        if not isinstance(capabilities, dict):
+            return PLAIN
+        encodings = capabilities.get('encodings') or []
+        formats = capabilities.get('formats') or []
+        encoding = next((e for e in supported_encodings() if e in encodings and e != 'deflate'), None)
+        fmt = next((f for f in supported_formats() if f in formats), 'json')
+        return cls(fmt, encoding)
+
+    @property
+    def compact(self):
+        return self.format != 'json' or self.encoding is not None
+
+    def accept_headers(self):
+        accept = f"{MSGPACK}, {JSON};q=0.9" if self.format == 'msgpack' else JSON
+        return {'Accept': accept, 'Accept-Encoding': ', '.join(supported_encodings())}
+
+    def encode(self, payload):
+        """(gövde, başlıklar); büyük gövdeler sıkıştırılır"""
+        body, content_type = dumps(payload, self.format)
+        headers = {'Content-Type': content_type}
+        if self.encoding is not None and len(body) >= COMPRESS_MIN_BYTES:
+            body = compress(body, self.encoding)
+            headers['Content-Encoding'] = self.encoding
+        return body, headers
+
+    def __repr__(self):
+        return f"Codec({self.format}, {self.encoding or 'identity'})"
+
+
+PLAIN = Codec()
+
+
+class BodyReader:
+    """Yanıt gövdesini ham okur, açar; tel byte'larını ve çözme süresini sayar.
+
+    response: stream=True ile alınmış requests.Response.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.content_encoding = response.headers.get('Content-Encoding', '').strip().lower()
+        self.wire_bytes = 0
+        self.body_bytes = 0
+        self.decode_s = 0.0
+
+    def chunks(self):
+        """Açılmış gövde parçaları, geldikçe"""
+        inflater = decompressor(self.content_encoding)
+        for chunk in self.response.raw.stream(None, decode_content=False):
+            self.wire_bytes += len(chunk)
+            if inflater is not None:
+                started = time.perf_counter()
+                chunk = inflater.decompress(chunk)
+                self.decode_s += time.perf_counter() - started
+            if chunk:
+                self.body_bytes += len(chunk)
+                yield chunk
+        if inflater is not None and hasattr(inflater, 'flush'):
+            tail = inflater.flush()
+            if tail:
+                self.body_bytes += len(tail)
+                yield tail
+
+    def read(self):
+        return b''.join(self.chunks())
+
+    def timed(self, fn, *args):
+        """fn(*args)'ın süresini çözme süresine ekler"""
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.decode_s += time.perf_counter() - started
+
+    def json(self):
+        """Tüm gövdeyi Content-Type'a göre (JSON ya da MessagePack) çözer"""
+        body = self.read()
+        return self.timed(loads, body, self.response.headers.get('Content-Type', JSON))
@@ -0,0 +1,156 @@
+"""Konuşma oturumu protokolü: her turda yalnızca yeni mesaj gider.
+
+İstemci bir konuşma kimliği, onaylanmış tur sayısı (seq) ve onaylanmış
+geçmişin zincirleme özetini (state) tutar; server aynısını tutar:
+
+    state_n = chain_state(state_{n-1}, kullanıcı_mesajı, yanıt)
+
+Normal tur:
+
+    {"message": ..., "conversation_id": ..., "seq": n, "state": ...}
+
+Server'da konuşma yoksa ya da seq/state uyuşmuyorsa 409 döner:
+
+    {"detail": "resync", "seq": <server seq ya da null>, "state": ...}
+
+İstemci isteği bir kez, sıkıştırılmış bir farkla tekrarlar: server'ın
+bildiği durum istemcinin geçmişinde varsa yalnızca sonraki turlar, yoksa
+son context_turns tur (uzun metinler kırpılmış) gönderilir:
+
+    {..., "resync": {"since": <seq ya da null>, "turns": [[mesaj, yanıt], ...]}}
+
+Server bağlam olarak en fazla context_turns tur saklar; böylece istek
+boyutu ve tur başına server işi konuşma uzadıkça büyümez.
+"""
+import hashlib
+import threading
+import uuid
+from collections import deque
+
+INITIAL_STATE = '0' * 16
+
+# Resync'te gönderilen tek metnin azami uzunluğu
+COMPACT_CHARS = 2000
+
+
+def chain_state(state, message, reply):
+    digest = hashlib.sha256()
+    for part in (state, message, reply):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def compact(text, limit=COMPACT_CHARS):
+    """Uzun metnin başı ve sonu kalır"""
+    if len(text) <= limit:
+        return text
+    half = limit // 2
+    return f"{text[:half]} […] {text[-half:]}"
+
+
+class Conversation:
+    """İstemci tarafı oturum durumu; thread-safe.
+
+    Aynı anda birden fazla tur gönderilirse server'a önce ulaşan turdan
+    sonra diğerleri 409 alıp resync yapar; durum kendiliğinden düzelir.
+    """
+
+    def __init__(self, conversation_id=None, context_turns=16):
+        self.id = conversation_id or uuid.uuid4().hex
+        self.context_turns = context_turns
+        self.seq = 0
+        self.state = INITIAL_STATE
+        self.resyncs = 0
+        # Son turlar ve her turdan sonraki (seq, state); resync farkı için
+        self.turns = deque(maxlen=context_turns)
+        self.states = deque([(0, INITIAL_STATE)], maxlen=context_turns + 1)
+        self._lock = threading.Lock()
+
+    def fields(self):
+        """Normal turda mesaja eklenen alanlar"""
+        with self._lock:
+            return {'conversation_id': self.id, 'seq': self.seq, 'state': self.state}
+
+    def resync_fields(self, server_seq=None, server_state=None):
+        """409 sonrası: server'ın bildiği durumdan bu yana olan turlar"""
+        with self._lock:
+            fields = {'conversation_id': self.id, 'seq': self.seq, 'state': self.state}
+            since = None
+            if server_seq is not None and (server_seq, server_state) in self.states:
+                since = server_seq
+            turns = list(self.turns)
+            if since is not None:
+                turns = turns[len(turns) - (self.seq - since):] if self.seq > since else []
+            fields['resync'] = {'since': since,
+                                'turns': [[compact(message), compact(reply)] for message, reply in turns]}
+            self.resyncs += 1
+            return fields
+
+    def commit(self, message, reply):
+        """Tamamlanan turu onaylanmış geçmişe ekler (server aynı özeti hesaplar)"""
+        with self._lock:
+            self.seq += 1
+            self.state = chain_state(self.state, message, reply)
+            self.turns.append((message, reply))
+            self.states.append((self.seq, self.state))
+
+    def stats(self):
+        with self._lock:
+            return {'id': self.id, 'seq': self.seq, 'resyncs': self.resyncs}
+
+
+class ConversationStore:
+    """Server tarafı (stand-in): konuşma başına son turlar, seq ve state.
+
+    begin() ve finish() tur başına sabit iş yapar; en eski konuşmalar max_conversations
+    aşılınca atılır (istemci resync ile geri yükler).
+    """
+
+    def __init__(self, context_turns=16, max_conversations=1000):
+        self.context_turns = context_turns
+        self.max_conversations = max_conversations
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def begin(self, request):
+        """İsteğin bağlamı (turlar listesi) ya da resync gerekiyorsa 409 gövdesi"""
+        conversation_id = request['conversation_id']
+        seq, state = request.get('seq', 0), request.get('state', INITIAL_STATE)
+        with self._lock:
+            session = self._sessions.pop(conversation_id, None)
+            resync = request.get('resync')
+            if resync is not None:
+                turns = [tuple(turn) for turn in resync.get('turns', [])]
+                if session is not None and resync.get('since') == session['seq']:
+                    session['turns'].extend(turns)
+                else:
+                    session = {'turns': deque(turns, maxlen=self.context_turns)}
+                session['seq'], session['state'] = seq, state
+            elif session is None:
+                if seq != 0:
+                    return None, {'detail': 'resync', 'seq': None, 'state': None}
+                session = {'turns': deque(maxlen=self.context_turns), 'seq': 0, 'state': INITIAL_STATE}
+            elif (session['seq'], session['state']) != (seq, state):
+                self._sessions[conversation_id] = session
+                return None, {'detail': 'resync', 'seq': session['seq'], 'state': session['state']}
+
+            # En son kullanılan sona (dict ekleme sırası = LRU sırası)
+            self._sessions[conversation_id] = session
+            while len(self._sessions) > self.max_conversations:
+                self._sessions.pop(next(iter(self._sessions)))
+            return list(session['turns']), None
+
+    def context_size(self, conversation_id):
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            return len(session['turns']) if session is not None else None
+
+    def finish(self, conversation_id, message, reply):
+        with self._lock:
+            session = self._sessions.get(conversation_id)
+            if session is None:
+                return
+            session['turns'].append((message, reply))
+            session['seq'] += 1
+            session['state'] = chain_state(session['state'], message, reply)
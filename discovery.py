@@ -0,0 +1,485 @@
+"""PhantomAI server'larının yerel ağda bulunması.
+
+Aşamalar sırayla denenir, biri server bulunca sonrakilere geçilmez:
+önbellekteki (daha önce çalışmış) adaylar paralel doğrulanır, yerel
+adaylar denenir, tek bir UDP yayın sorgusu gönderilir ve ancak hiçbiri
+yanıt vermezse yerel /24 ağı asyncio ile sınırlı eşzamanlılıkta taranır.
+Bulunan server'lar DiscoveryCache'e (JSON dosyası) yazılır; sonraki
+açılış doğrudan onları dener.
+"""
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = (8001,)
+LOCAL_CANDIDATES = ('localhost',)
+CACHE_PATH = os.path.join(os.path.expanduser('~'), '.phantomai', 'servers.json')
+
+# UDP keşif protokolü: istemci tek bir sorgu yayınlar, server'lar adresleriyle yanıt verir
+#   sorgu: {"type": "phantomai.discover", "v": 1, "nonce": "..."}
+#   yanıt: {"type": "phantomai.announce", "v": 1, "nonce": "...", "url": "http://...:8001",
+#           "load": <işlenen istek sayısı>, "version": "..."}
+DISCOVERY_PORT = 48001
+DISCOVER_TYPE = 'phantomai.discover'
+ANNOUNCE_TYPE = 'phantomai.announce'
+PROTOCOL_VERSION = 1
+BROADCAST_TARGETS = ('255.255.255.255',)
+
+
+class DiscoveryResult:
+    """Keşif sonucu ve faz süreleri (ms)"""
+
+    def __init__(self):
+        self.url = None
+        self.source = None
+        # Bulunan tüm sağlıklı server'lar: [(url, gecikme_ms)], en hızlısı önce
+        self.servers = []
+        self.timings = {}
+        self.hosts_probed = 0
+        self.open_ports = 0
+        # UDP yanıtlarındaki ek bilgiler: {url: {'load', 'version'}}
+        self.announcements = {}
+
+    def __repr__(self):
+        return (f"DiscoveryResult(url={self.url!r}, source={self.source!r}, servers={len(self.servers)}, "
+                f"timings={self.timings}, hosts={self.hosts_probed}, open={self.open_ports}, "
+                f"announced={len(self.announcements)})")
+
+
+class DiscoveryCache:
+    """Daha önce çalışan server URL'lerinin disk önbelleği.
+
+    Her URL için son görülme zamanı, başarı sayısı ve ölçülen gecikme
+    tutulur. max_age'den eski kayıtlar yüklenirken atılır.
+    """
+
+    def __init__(self, path=CACHE_PATH, max_age=14 * 24 * 3600, max_entries=16):
+        self.path = path
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.entries = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Keşif önbelleği okunamadı: {e}")
+            entries = {}
+        with self._lock:
+            self.entries = entries if isinstance(entries, dict) else {}
+            self._evict_stale()
+
+    def save(self):
+        with self._lock:
+            data = json.dumps(self.entries, indent=2)
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Keşif önbelleği yazılamadı: {e}")
+
+    def _evict_stale(self):
+        cutoff = time.time() - self.max_age
+        for url in [url for url, entry in self.entries.items() if entry.get('last_seen', 0) < cutoff]:
+            del self.entries[url]
+
+    def record_success(self, url, latency_ms=None):
+        with self._lock:
+            entry = self.entries.setdefault(url, {'successes': 0, 'latency_ms': None})
+            entry['last_seen'] = time.time()
+            entry['successes'] += 1
+            if latency_ms is not None:
+                entry['latency_ms'] = round(latency_ms, 1)
+            self._evict_stale()
+            # En eski kayıtları at
+            for stale_url in self.ranked()[self.max_entries:]:
+                del self.entries[stale_url]
+        self.save()
+
+    def ranked(self):
+        """Önce yakın zamanda görülen (saat dilimi), sonra düşük gecikmeli, sonra sık başarılı"""
+        def key(url):
+            entry = self.entries[url]
+            latency = entry.get('latency_ms')
+            return (-int(entry.get('last_seen', 0) // 3600),
+                    latency if latency is not None else float('inf'),
+                    -entry.get('successes', 0))
+        return sorted(self.entries, key=key)
+
+
+def local_ipv4():
+    """Varsayılan rotadaki yerel IPv4 adresi (paket gönderilmez)"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("8.8.8.8", 80))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+
+def default_networks():
+    """Yerel IP'nin /24 ağı"""
+    local_ip = local_ipv4()
+    return [ipaddress.ip_network(f"{local_ip}/24", strict=False)], {local_ip}
+
+
+def iter_hosts(networks, exclude=()):
+    for network in networks:
+        network = ipaddress.ip_network(network, strict=False)
+        hosts = network.hosts() if network.num_addresses > 1 else [network.network_address]
+        for host in hosts:
+            host = str(host)
+            if host not in exclude:
+                yield host
+
+
+async def tcp_open(host, port, timeout):
+    """Ucuz ön kontrol: porta TCP bağlantısı kurulabiliyor mu"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    writer.close()
+    return True
+
+
+async def check_health(host, port, timeout):
+    """/health'e ham HTTP isteği atar, 200 dönerse True"""
+    writer = None
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+        writer.write(f"GET /health HTTP/1.0\r\nHost: {host}:{port}\r\n\r\n".encode())
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    finally:
+        if writer is not None:
+            writer.close()
+    parts = status_line.split()
+    return len(parts) >= 2 and parts[1] == b'200'
+
+
+async def _timed_health(url, timeout):
+    """URL'nin /health'ini kontrol eder, sağlıklıysa gecikmeyi (ms) döndürür"""
+    parsed = urlsplit(url)
+    started = time.perf_counter()
+    if await check_health(parsed.hostname, parsed.port or 80, timeout):
+        return (time.perf_counter() - started) * 1000
+    return None
+
+
+async def _first_cached(urls, timeout, grace=0.05):
+    """Önbellekteki adayları paralel doğrular ve en üst sıradaki sağlıklı olanı döndürür.
+
+    Sağlıklı bir aday yanıt verdikten sonra, daha üst sıradakiler için en
+    fazla grace saniye beklenir; yavaş ya da ölü bir aday açılışı geciktirmez.
+    """
+    healthy = await _healthy_cached(urls, timeout, grace, first_only=True)
+    if not healthy:
+        return None, None
+    best = min(healthy)
+    return urls[best], healthy[best]
+
+
+async def _all_cached(urls, timeout, window):
+    """Önbellekteki tüm sağlıklı adaylar: ilk sağlıklı yanıttan sonra window
+    saniye içinde yanıt verenler toplanır. [(url, gecikme)], en hızlısı önce"""
+    healthy = await _healthy_cached(urls, timeout, window, first_only=False)
+    return sorted(((urls[rank], latency) for rank, latency in healthy.items()), key=lambda s: s[1])
+
+
+async def _healthy_cached(urls, timeout, grace, first_only):
+    """{sıra: gecikme}; first_only ise en üst sıradaki sağlıklı aday belli olunca biter"""
+    loop = asyncio.get_running_loop()
+    ranks = {asyncio.ensure_future(_timed_health(url, timeout)): rank for rank, url in enumerate(urls)}
+    pending = set(ranks)
+    healthy = {}
+    deadline = None
+    try:
+        while pending:
+            wait_timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, pending = await asyncio.wait(pending, timeout=wait_timeout,
+                                               return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.result() is not None:
+                    healthy[ranks[task]] = task.result()
+            if healthy:
+                best = min(healthy)
+                if first_only and all(ranks[task] > best for task in pending):
+                    break
+                if deadline is None:
+                    deadline = loop.time() + grace
+                elif loop.time() >= deadline:
+                    break
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return healthy
+
+
+def discovery_query(nonce):
+    return json.dumps({'type': DISCOVER_TYPE, 'v': PROTOCOL_VERSION, 'nonce': nonce}).encode()
+
+
+def parse_announcement(data, addr, nonce):
+    """Geçerli yanıtsa (url, bilgi), değilse None"""
+    try:
+        message = json.loads(data)
+    except ValueError:
+        return None
+    if (not isinstance(message, dict) or message.get('type') != ANNOUNCE_TYPE
+            or message.get('nonce') != nonce or not isinstance(message.get('url'), str)):
+        return None
+    parsed = urlsplit(message['url'])
+    url = message['url'].rstrip('/')
+    if parsed.hostname in (None, '', '0.0.0.0'):
+        # Tüm arayüzleri dinleyen server kendi adresini bilmeyebilir
+        url = f"{parsed.scheme or 'http'}://{addr[0]}:{parsed.port or DEFAULT_PORTS[0]}"
+    return url, {'load': message.get('load'), 'version': message.get('version')}
+
+
+class _AnnouncementCollector(asyncio.DatagramProtocol):
+    def __init__(self, nonce, sent_at):
+        self.nonce = nonce
+        self.sent_at = sent_at
+        self.answers = {}
+        self.first = asyncio.Event()
+
+    def datagram_received(self, data, addr):
+        parsed = parse_announcement(data, addr, self.nonce)
+        if parsed is None:
+            return
+        url, info = parsed
+        if url not in self.answers:
+            self.answers[url] = ((time.perf_counter() - self.sent_at()) * 1000, info)
+            self.first.set()
+
+    def error_received(self, exc):
+        logger.debug(f"UDP keşif hatası: {exc}")
+
+
+async def udp_discover(port=DISCOVERY_PORT, targets=BROADCAST_TARGETS, timeout=0.3, window=0.05):
+    """Tek bir sorgu paketi yayınlar ve yanıtları toplar.
+
+    İlk yanıttan sonra window saniye daha beklenir; hiç yanıt gelmezse
+    timeout saniyede vazgeçilir. [(url, gecikme_ms, bilgi)] döndürür; yükü
+    düşük ve yakın olan önce (havuzdaki skorla aynı: gecikme * (1 + yük)).
+    """
+    loop = asyncio.get_running_loop()
+    nonce = uuid.uuid4().hex
+    sent = []
+    try:
+        transport, collector = await loop.create_datagram_endpoint(
+            lambda: _AnnouncementCollector(nonce, lambda: sent[0]),
+            local_addr=('0.0.0.0', 0), allow_broadcast=True)
+    except OSError as e:
+        logger.warning(f"UDP keşif soketi açılamadı: {e}")
+        return []
+    try:
+        query = discovery_query(nonce)
+        sent.append(time.perf_counter())
+        for target in targets:
+            try:
+                transport.sendto(query, (target, port))
+            except OSError as e:
+                logger.debug(f"UDP sorgusu gönderilemedi ({target}): {e}")
+        try:
+            await asyncio.wait_for(collector.first.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        await asyncio.sleep(window)
+    finally:
+        transport.close()
+
+    def score(item):
+        latency, info = item[1]
+        load = info['load'] if isinstance(info['load'], (int, float)) else 0
+        return latency * (1 + load)
+
+    return [(url, latency, info) for url, (latency, info) in sorted(collector.answers.items(), key=score)]
+
+
+async def _first_healthy(hosts, ports, concurrency, connect_timeout, health_timeout, result,
+                         collect_window=None):
+    """Tüm host/port'ları tarar, ilk sağlıklı server'da kalan her şeyi iptal eder.
+
+    collect_window verilirse ilk server'dan sonra o kadar saniye daha
+    taranır ve bulunan tüm server'lar döndürülür: [(url, gecikme)].
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    first_open = None
+    started = time.perf_counter()
+
+    async def probe(host, port):
+        nonlocal first_open
+        async with semaphore:
+            result.hosts_probed += 1
+            if not await tcp_open(host, port, connect_timeout):
+                return None
+            result.open_ports += 1
+            if first_open is None:
+                first_open = time.perf_counter()
+            url = f"http://{host}:{port}"
+            latency = await _timed_health(url, health_timeout)
+            if latency is not None:
+                return url, latency
+        return None
+
+    loop = asyncio.get_running_loop()
+    tasks = {asyncio.ensure_future(probe(host, port)) for host in hosts for port in ports}
+    found = []
+    deadline = None
+    try:
+        while tasks:
+            wait_timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, tasks = await asyncio.wait(tasks, timeout=wait_timeout,
+                                             return_when=asyncio.FIRST_COMPLETED)
+            found += [task.result() for task in done if task.result()]
+            if found:
+                if collect_window is None:
+                    break
+                if deadline is None:
+                    deadline = loop.time() + collect_window
+                elif loop.time() >= deadline:
+                    break
+    finally:
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    if first_open is not None:
+        result.timings['first_open'] = round((first_open - started) * 1000, 1)
+    found.sort(key=lambda server: server[1])
+    return found if collect_window is not None else found[:1]
+
+
+async def discover(networks=None, ports=DEFAULT_PORTS, local_candidates=LOCAL_CANDIDATES,
+                   concurrency=256, connect_timeout=0.3, health_timeout=1.0, cache=None,
+                   all_servers=False, collect_window=0.5, udp_port=DISCOVERY_PORT, udp_timeout=0.3,
+                   udp_window=0.1):
+    """Önce önbellekteki ve yerel adayları dener, sonra tek bir UDP yayın
+    sorgusu gönderir. Verilen ağlar (varsayılan: yerel /24) yalnızca hiçbir
+    aşamada server bulunamazsa HTTP ile taranır.
+
+    networks: CIDR listesi ("192.168.1.0/24") ya da ipaddress ağları.
+    cache: DiscoveryCache; bulunan server'lar oraya kaydedilir.
+    all_servers: ilk server'da durma; o fazda ilk sağlıklı yanıttan sonra
+    collect_window saniye içinde bulunan tüm server'ları result.servers'a topla.
+    udp_port: UDP keşif portu (None: UDP aşaması atlanır). Yanıt gelmezse
+    udp_timeout saniyede taramaya geçilir; all_servers ise ilk yanıttan sonra
+    udp_window saniye daha yanıt toplanır (LAN'da yanıtlar birkaç ms'de gelir).
+    Dönen DiscoveryResult.timings: cache, local, udp, sweep, first_open, total (ms).
+    """
+    result = DiscoveryResult()
+    started = time.perf_counter()
+
+    # 0. Önbellekteki adaylar (paralel doğrulama)
+    if cache is not None and cache.entries:
+        phase = time.perf_counter()
+        if all_servers:
+            result.servers = await _all_cached(cache.ranked(), health_timeout, collect_window)
+        else:
+            url, latency = await _first_cached(cache.ranked(), health_timeout)
+            result.servers = [(url, latency)] if url else []
+        result.timings['cache'] = round((time.perf_counter() - phase) * 1000, 1)
+        if result.servers:
+            result.source = 'ÖNBELLEK'
+
+    # 1. Yerel adaylar
+    if not result.servers:
+        phase = time.perf_counter()
+        for url in [f"http://{host}:{port}" for host in local_candidates for port in ports]:
+            latency = await _timed_health(url, health_timeout)
+            if latency is not None:
+                result.servers.append((url, latency))
+                result.source = 'YEREL'
+                if not all_servers:
+                    break
+        result.timings['local'] = round((time.perf_counter() - phase) * 1000, 1)
+
+    # 2. UDP yayını: tek paket, server'lar kendi adresleriyle yanıt verir
+    if not result.servers and udp_port:
+        phase = time.perf_counter()
+        answers = await udp_discover(udp_port, timeout=udp_timeout,
+                                     window=min(collect_window, udp_window) if all_servers else 0.02)
+        result.timings['udp'] = round((time.perf_counter() - phase) * 1000, 1)
+        if answers and not all_servers:
+            answers = answers[:1]
+        for url, latency, info in answers:
+            result.servers.append((url, latency))
+            result.announcements[url] = info
+        if result.servers:
+            result.source = 'UDP'
+
+    # 3. Ağ taraması (yedek): TCP ön kontrol + açık portlarda /health doğrulaması
+    if not result.servers:
+        exclude = set()
+        if networks is None:
+            try:
+                networks, exclude = default_networks()
+            except OSError as e:
+                logger.error(f"Yerel IP alınamadı: {e}")
+                networks = []
+
+        phase = time.perf_counter()
+        result.servers = await _first_healthy(list(iter_hosts(networks, exclude)), ports, concurrency,
+                                              connect_timeout, health_timeout, result,
+                                              collect_window if all_servers else None)
+        result.timings['sweep'] = round((time.perf_counter() - phase) * 1000, 1)
+        if result.servers:
+            result.source = 'AĞ'
+
+    result.timings['total'] = round((time.perf_counter() - started) * 1000, 1)
+    if result.servers:
+        result.url = result.servers[0][0]
+    if cache is not None:
+        for url, latency in result.servers:
+            cache.record_success(url, latency)
+    logger.info(f"Server keşfi: {result}")
+    return result
+
+
+def discover_sync(**kwargs):
+    """Thread içinden çağırmak için: kendi event loop'unda discover() çalıştırır"""
+    return asyncio.run(discover(**kwargs))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='PhantomAI server keşfi')
+    parser.add_argument('--cidr', action='append', help='Taranacak ağ (tekrarlanabilir)')
+    parser.add_argument('--port', type=int, action='append', help='Port (tekrarlanabilir)')
+    parser.add_argument('--concurrency', type=int, default=256)
+    parser.add_argument('--all', action='store_true', help='Tüm sağlıklı server\'ları bul')
+    parser.add_argument('--udp-port', type=int, default=DISCOVERY_PORT, help='UDP keşif portu')
+    parser.add_argument('--no-udp', action='store_true', help='UDP yayınını atla, doğrudan tara')
+    args = parser.parse_args()
+
+    result = discover_sync(networks=args.cidr, ports=tuple(args.port or DEFAULT_PORTS),
+                           concurrency=args.concurrency, all_servers=args.all,
+                           udp_port=None if args.no_udp else args.udp_port)
+    print(result)
+    for url, latency in result.servers:
+        print(f"  {url}  {latency:.1f} ms")
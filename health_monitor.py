@@ -0,0 +1,166 @@
+"""Aktif server için arka plan sağlık izleyicisi.
+
+Server'ın /health'i uyarlamalı aralıklarla yoklanır: sağlıklıyken seyrek,
+bozulmuşken sık, erişilemezken üstel geri çekilmeyle. Gecikmenin EWMA ve
+p95 değerleri tutulur; durum değişiklikleri tek bir callback'e bildirilir.
+"""
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+UNKNOWN = 'unknown'
+HEALTHY = 'healthy'
+DEGRADED = 'degraded'
+DOWN = 'down'
+
+
+class HealthMonitor:
+    """probe(url, timeout) -> bool çağrısıyla server'ı yoklar.
+
+    on_change(state, stats) monitor thread'inden çağrılır; UI tarafı kendi
+    thread'ine aktarmalıdır.
+    """
+
+    def __init__(self, probe, on_change, healthy_interval=30.0, degraded_interval=2.0,
+                 down_min_interval=1.0, down_max_interval=60.0, slow_ms=1000.0,
+                 timeout=3.0, down_after=2, samples=100):
+        self.probe = probe
+        self.on_change = on_change
+        self.healthy_interval = healthy_interval
+        self.degraded_interval = degraded_interval
+        self.down_min_interval = down_min_interval
+        self.down_max_interval = down_max_interval
+        self.slow_ms = slow_ms
+        self.timeout = timeout
+        self.down_after = down_after
+
+        self.url = None
+        self.state = UNKNOWN
+        self.ewma_ms = None
+        self.failures = 0
+        self.last_error = None
+        self._samples = deque(maxlen=samples)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    # --- Dış API ----------------------------------------------------------
+
+    def set_target(self, url):
+        """İzlenen server'ı değiştirir, istatistikleri sıfırlar ve hemen yoklar"""
+        with self._lock:
+            self.url = url
+            self.ewma_ms = None
+            self.failures = 0
+            self._samples.clear()
+        self._set_state(UNKNOWN)
+        if self._thread is None:
+            self.start()
+        else:
+            self.probe_now()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name='health-monitor')
+            self._thread.start()
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def probe_now(self):
+        """Bir sonraki yoklamayı beklemeden yap (ör. bir istek hata verdiğinde)"""
+        self._wake.set()
+
+    def is_down(self):
+        return self.state == DOWN
+
+    def p95_ms(self):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+
+    def stats(self):
+        p95 = self.p95_ms()
+        return {
+            'url': self.url,
+            'state': self.state,
+            'ewma_ms': None if self.ewma_ms is None else round(self.ewma_ms, 1),
+            'p95_ms': None if p95 is None else round(p95, 1),
+            'failures': self.failures,
+            'interval': round(self.interval(), 1),
+            'error': self.last_error,
+        }
+
+    def interval(self):
+        """Duruma göre bir sonraki yoklamaya kadar beklenecek süre (s)"""
+        if self.state == HEALTHY:
+            return self.healthy_interval
+        if self.state == DOWN:
+            backoff = self.down_min_interval * 2 ** max(0, self.failures - self.down_after)
+            return min(self.down_max_interval, backoff)
+        return self.degraded_interval
+
+    # --- Yoklama döngüsü ---------------------------------------------------
+
+    def _run(self):
+        while not self._stopped:
+            url = self.url
+            if url is not None:
+                self._probe_once(url)
+
+            interval = self.interval()
+            if self.state == DOWN:
+                # Birçok istemci aynı anda yeniden denemesin
+                interval *= random.uniform(0.8, 1.2)
+            # probe_now() ya da set_target() beklemeyi erken bitirir
+            self._wake.wait(interval if url is not None else None)
+            self._wake.clear()
+
+    def _probe_once(self, url):
+        started = time.perf_counter()
+        try:
+            healthy = self.probe(url, self.timeout)
+            error = None if healthy else "Server sağlıksız yanıt verdi"
+        except Exception as e:
+            healthy = False
+            error = str(e)
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        with self._lock:
+            if url != self.url:
+                return
+            if healthy:
+                self.failures = 0
+                self.last_error = None
+                self._samples.append(latency_ms)
+                self.ewma_ms = latency_ms if self.ewma_ms is None else 0.8 * self.ewma_ms + 0.2 * latency_ms
+            else:
+                self.failures += 1
+                self.last_error = error
+
+        if healthy:
+            state = DEGRADED if latency_ms > self.slow_ms else HEALTHY
+        elif self.failures >= self.down_after or self.state in (UNKNOWN, DOWN):
+            state = DOWN
+        else:
+            state = DEGRADED
+        self._set_state(state)
+
+    def _set_state(self, state):
+        if state == self.state:
+            return
+        self.state = state
+        stats = self.stats()
+        logger.info(f"Server durumu: {state} {stats}")
+        try:
+            self.on_change(state, stats)
+        except Exception as e:
+            logger.error(f"Sağlık durumu bildirilemedi: {e}")
@@ -0,0 +1,291 @@
+"""Sohbet geçmişinin SQLite deposu.
+
+Her mesaj (gönderen, metin, zaman, gecikme) sadece eklenen bir tabloya
+yazılır; yazmalar arka plan thread'inde toplu transaction'larla yapılır.
+Anahtar kelime araması için FTS5 tablosu tutulur (yoksa LIKE'a düşülür).
+Okumalar ayrı, memory-mapped bir bağlantıdan sayfa sayfa yapılır.
+
+Mesaj id'leri çağrı anında verilmeli (transcript hemen kullanır), bu
+yüzden her açılış veritabanından ID_BLOCK'luk bir id bloğu ayırır; aynı
+dosyayı kullanan ikinci bir uygulama başka bir blok alır ve çakışmaz.
+Blok yarılanınca writer thread'i bir sonrakini önceden ayırır; UI
+thread'i veritabanı kilidi beklemez. Kullanılmayan blok sonları id
+boşluğu olarak kalır.
+"""
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+HISTORY_PATH = os.path.join(os.path.expanduser('~'), '.phantomai', 'history.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    started REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    sender TEXT NOT NULL,
+    text TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    latency_ms REAL
+);
+CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS id_blocks (
+    next_id INTEGER NOT NULL
+);
+"""
+
+# Bir seferde ayrılan mesaj id'si sayısı
+ID_BLOCK = 1000
+
+# Yedek blok gelmeden blok biterse append() en fazla bu kadar bekler (s)
+RESERVE_TIMEOUT = 5.0
+
+# SQLite INTEGER PRIMARY KEY üst sınırı
+MAX_ID = 2 ** 63 - 1
+
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+    text, content='messages', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS messages_ai AFTER INSERT ON messages BEGIN
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_au AFTER UPDATE OF text ON messages BEGIN
+    INSERT INTO messages_fts (messages_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    INSERT INTO messages_fts (rowid, text) VALUES (new.id, new.text);
+END;
+"""
+
+
+class HistoryStore:
+    """Mesajları diske yazar, arar ve geri okur.
+
+    append()/update() çağıran thread'i bekletmez: işlemler kuyruğa girer,
+    writer thread'i flush_interval'da bir (ya da batch_size dolunca) tek
+    transaction'da yazar. Mesaj id'leri çağrı anında verilir ve artandır;
+    boşluk içerebilir. Okuma metotları (get, search, before, after) ve
+    append() aynı thread'den çağrılmalıdır.
+    """
+
+    def __init__(self, path=HISTORY_PATH, batch_size=64, flush_interval=0.5):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._writer_db = sqlite3.connect(path, check_same_thread=False)
+        self._writer_db.execute('PRAGMA journal_mode=WAL')
+        self._writer_db.execute('PRAGMA synchronous=NORMAL')
+        self._writer_db.executescript(SCHEMA)
+        try:
+            self._writer_db.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError as e:
+            logger.warning(f"FTS5 yok, arama LIKE ile yapılacak: {e}")
+            self.has_fts = False
+
+        cursor = self._writer_db.execute('INSERT INTO sessions (started) VALUES (?)', (time.time(),))
+        self.session_id = cursor.lastrowid
+        self._writer_db.commit()
+        self.first_id, self.last_id = self._writer_db.execute(
+            'SELECT MIN(id), MAX(id) FROM messages').fetchone()
+        self.next_id, self._block_end = self._reserve_ids(self._writer_db)
+        self._block_start = self.next_id
+        if self.first_id is None:
+            self.first_id = self.next_id
+        # Sonraki blok: writer thread'inde ayrılır, append() sırası gelince geçer
+        self._spare = None
+        self._reserving = False
+        self._block_ready = threading.Condition()
+
+        # Okuma bağlantısı hiç yazmaz
+        self._db = sqlite3.connect(path)
+        self._db.execute('PRAGMA mmap_size=268435456')
+        self._db.execute('PRAGMA synchronous=NORMAL')
+
+        self._queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name='history-writer')
+        self._writer.start()
+
+    # --- Yazma ------------------------------------------------------------
+
+    @staticmethod
+    def _reserve_ids(db):
+        """Başka yazarlarla çakışmayan [başlangıç, son) id aralığı ayırır"""
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT next_id FROM id_blocks').fetchone()
+            # id_blocks'tan önce yazılmış (ya da başka yoldan eklenmiş) satırlar da atlanır
+            max_id = db.execute('SELECT MAX(id) FROM messages').fetchone()[0] or 0
+            start = max(row[0] if row is not None else 1, max_id + 1)
+            if row is None:
+                db.execute('INSERT INTO id_blocks (next_id) VALUES (?)', (start + ID_BLOCK,))
+            else:
+                db.execute('UPDATE id_blocks SET next_id = ?', (start + ID_BLOCK,))
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            db.execute('ROLLBACK')
+            raise
+        return start, start + ID_BLOCK
+
+    def append(self, sender, text, timestamp=None, latency_ms=None):
+        """Mesajı yazma kuyruğuna ekler, id'sini hemen döndürür"""
+        if self.next_id >= self._block_end:
+            self._next_block()
+        message_id = self.next_id
+        self.next_id += 1
+        self.last_id = message_id
+        self._queue.put(('insert', (message_id, self.session_id, sender, text,
+                                    time.time() if timestamp is None else timestamp, latency_ms)))
+        if self.next_id - self._block_start >= ID_BLOCK // 2:
+            self._request_block()
+        return message_id
+
+    def _request_block(self):
+        """Yedek blok yoksa writer thread'inden ister"""
+        with self._block_ready:
+            if self._spare is not None or self._reserving:
+                return
+            self._reserving = True
+        self._queue.put(('reserve', None))
+
+    def _next_block(self):
+        """Yedek bloğa geçer; writer henüz ayırmadıysa onu bekler"""
+        self._request_block()
+        with self._block_ready:
+            if not self._block_ready.wait_for(lambda: not self._reserving, timeout=RESERVE_TIMEOUT):
+                raise sqlite3.OperationalError("Mesaj id bloğu ayrılamadı: zaman aşımı")
+            if self._spare is None:
+                raise sqlite3.OperationalError("Mesaj id bloğu ayrılamadı")
+            (self.next_id, self._block_end), self._spare = self._spare, None
+        self._block_start = self.next_id
+
+    def update(self, message_id, text, latency_ms=None):
+        """Akışla tamamlanan mesajın son metnini ve gecikmesini yazar"""
+        self._queue.put(('update', (text, latency_ms, message_id)))
+
+    def _write_loop(self):
+        db = self._writer_db
+        while True:
+            # Blok isteği kuyrukta yazmaların arkasında kalsa da önce karşılanır
+            self._serve_reserve(db)
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while True:
+                if item[0] == 'reserve':
+                    self._serve_reserve(db)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+            if not batch:
+                if stop:
+                    return
+                continue
+
+            try:
+                with db:
+                    for op, params in batch:
+                        self._apply(db, op, params)
+            except sqlite3.Error as e:
+                # Tek bozuk işlem partinin geri kalanını kaybettirmesin
+                logger.warning(f"Geçmiş partisi yazılamadı ({len(batch)} işlem), tek tek deneniyor: {e}")
+                for op, params in batch:
+                    try:
+                        with db:
+                            self._apply(db, op, params)
+                    except sqlite3.Error as e:
+                        logger.error(f"Geçmiş yazılamadı ({op} #{params[0] if op == 'insert' else params[-1]}): {e}")
+            if stop:
+                return
+
+    def _serve_reserve(self, db):
+        with self._block_ready:
+            if not self._reserving:
+                return
+        try:
+            block = self._reserve_ids(db)
+        except sqlite3.Error as e:
+            logger.warning(f"Mesaj id bloğu ayrılamadı: {e}")
+            block = None
+        with self._block_ready:
+            self._spare = block
+            self._reserving = False
+            self._block_ready.notify_all()
+
+    @staticmethod
+    def _apply(db, op, params):
+        if op == 'insert':
+            db.execute('INSERT INTO messages (id, session_id, sender, text, timestamp, latency_ms) '
+                       'VALUES (?, ?, ?, ?, ?, ?)', params)
+        else:
+            db.execute('UPDATE messages SET text = ?, latency_ms = COALESCE(?, latency_ms) '
+                       'WHERE id = ?', params)
+
+    def close(self):
+        """Kuyruktaki her şeyi yazıp bağlantıları kapatır"""
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        self._writer_db.close()
+        self._db.close()
+
+    # --- Okuma ------------------------------------------------------------
+
+    def get(self, message_id):
+        """(id, sender, text, timestamp, latency_ms) ya da None"""
+        return self._db.execute(
+            'SELECT id, sender, text, timestamp, latency_ms FROM messages WHERE id = ?',
+            (message_id,)).fetchone()
+
+    def search(self, query, limit=50):
+        """Anahtar kelimelerin hepsini içeren mesajlar, en yeniden eskiye"""
+        words = query.split()
+        if not words:
+            return []
+        if self.has_fts:
+            match = ' '.join('"{}"'.format(word.replace('"', '""')) for word in words)
+            return self._db.execute(
+                'SELECT m.id, m.sender, m.text, m.timestamp, m.latency_ms '
+                'FROM messages_fts JOIN messages m ON m.id = messages_fts.rowid '
+                'WHERE messages_fts MATCH ? ORDER BY m.id DESC LIMIT ?',
+                (match, limit)).fetchall()
+        where = ' AND '.join(['text LIKE ?'] * len(words))
+        return self._db.execute(
+            f'SELECT id, sender, text, timestamp, latency_ms FROM messages WHERE {where} '
+            'ORDER BY id DESC LIMIT ?',
+            [f'%{word}%' for word in words] + [limit]).fetchall()
+
+    def before(self, message_id, limit):
+        """message_id'den önceki en fazla limit mesaj, eskiden yeniye"""
+        rows = self._db.execute(
+            'SELECT id, sender, text, timestamp, latency_ms FROM messages '
+            'WHERE id < ? ORDER BY id DESC LIMIT ?', (message_id, limit)).fetchall()
+        rows.reverse()
+        return rows
+
+    def after(self, message_id, limit, until=None):
+        """message_id'den sonraki (until'den önceki) en fazla limit mesaj"""
+        return self._db.execute(
+            'SELECT id, sender, text, timestamp, latency_ms FROM messages '
+            'WHERE id > ? AND id < ? ORDER BY id LIMIT ?',
+            (message_id, until if until is not None else MAX_ID, limit)).fetchall()
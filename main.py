@@ -1,109 +1,515 @@
+import time
+
+# --profile-startup: modül yükleme süresi buradan ölçülür
+_IMPORT_STARTED = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox
-import threading
-import requests
 import json
 import os
 import logging
 import random
-import time
+import sqlite3
+import sys
+from array import array
+
+from client_core import PhantomClient
+from transcript import TranscriptModel, TranscriptView
+from history_store import HistoryStore
+from health_monitor import DEGRADED, DOWN, HEALTHY
+from metrics import METRICS_PATH, LoopLagMeter, Metrics, MetricsExporter
+from ui_dispatch import UIDispatcher
+from animation import AnimationClock
+from markup import TAG_OPTIONS, Formatter
+
+_IMPORTS_DONE = time.perf_counter()
+
+# numpy ilk ParticleSystem oluşturulurken yüklenir (açılışa ~60-90 ms ekliyor);
+# yoksa array tabanlı yola düşülür
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            return None
+        np = numpy
+    return np
 
 # Logging ayarı
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Kalite seviyeleri: en yüksekten en düşüğe.
+# max_particles: aynı anda yaşayabilecek partikül oranı (kapasiteye göre)
+# interval: kareler arası süre (ms), shrink: küçülme animasyonu
+QUALITY_LEVELS = [
+    {'name': 'YÜKSEK', 'max_particles': 1.0, 'interval': 16, 'shrink': True},
+    {'name': 'ORTA', 'max_particles': 0.5, 'interval': 33, 'shrink': True},
+    {'name': 'DÜŞÜK', 'max_particles': 0.2, 'interval': 50, 'shrink': False},
+]
+
+
 class ParticleSystem:
-    def __init__(self, canvas):
+    """Sabit kapasiteli, dizi tabanlı partikül motoru.
+
+    Konum, hız, ömür ve boyut ayrı dizilerde tutulur (structure-of-arrays).
+    Canvas oval'ları baştan bir kez oluşturulur; ölen partikülün oval'ı
+    silinmez, gizlenip havuza geri döner.
+
+    Render döngüsü animasyon saatinde (clock) bir görevdir ve uyarlamalıdır:
+    yaşayan partikül yoksa görev biter, bir sonraki spawn'da yeniden kaydolur. Kare maliyeti frame_budget_ms'i aşarsa
+    kalite seviyesi düşürülür; UPGRADE_FRAMES kare boyunca pay kalınca
+    tekrar yükseltilir (boşta geçen süre sayılmaz).
+    """
+
+    # Seviye değiştirmeden önce art arda kaç kare gözlenecek
+    DOWNGRADE_FRAMES = 10
+    UPGRADE_FRAMES = 60
+
+    def __init__(self, canvas, clock, capacity=256, frame_budget_ms=8.0):
         self.canvas = canvas
-        self.particles = []
+        self.clock = clock
+        self.capacity = capacity
+        self.frame_budget_ms = frame_budget_ms
         self.colors = ['#ff0080', '#00ffff', '#ff8000', '#8000ff', '#00ff80']
-
-    def create_particle(self, x, y):
-        particle = {
-            'x': x,
-            'y': y,
-            'vx': random.uniform(-2, 2),
-            'vy': random.uniform(-2, 2),
-            'life': 100,
-            'color': random.choice(self.colors),
-            'size': random.randint(2, 6)
+        _load_numpy()
+
+        self.quality = 0
+        self.frame_cost_ms = 0.0
+        self.fps = 0.0
+        self._over_budget = 0
+        self._under_budget = 0
+        self._last_frame = None
+        self._task = None
+
+        if np is not None:
+            self.x = np.zeros(capacity)
+            self.y = np.zeros(capacity)
+            self.vx = np.zeros(capacity)
+            self.vy = np.zeros(capacity)
+            self.life = np.zeros(capacity)
+            self.size = np.zeros(capacity)
+            self.alive = np.zeros(capacity, dtype=bool)
+            # Tk'ya en son gönderilen (yuvarlanmış) geometri
+            self.drawn = np.full((capacity, 4), -1, dtype=np.int64)
+        else:
+            self.x = array('d', bytes(8 * capacity))
+            self.y = array('d', bytes(8 * capacity))
+            self.vx = array('d', bytes(8 * capacity))
+            self.vy = array('d', bytes(8 * capacity))
+            self.life = array('d', bytes(8 * capacity))
+            self.size = array('d', bytes(8 * capacity))
+            self.alive = bytearray(capacity)
+            self.drawn = [None] * capacity
+
+        # Oval havuzu: hepsi gizli başlar
+        self.item_ids = [
+            canvas.create_oval(0, 0, 0, 0, fill=self.colors[0], outline='', state='hidden')
+            for _ in range(capacity)
+        ]
+        self.item_colors = [self.colors[0]] * capacity
+        self.free_slots = list(range(capacity - 1, -1, -1))
+        self.active_count = 0
+
+    @property
+    def level(self):
+        return QUALITY_LEVELS[self.quality]
+
+    def max_active(self):
+        return max(1, int(self.capacity * self.level['max_particles']))
+
+    def stats(self):
+        """Anlık FPS, kalite seviyesi ve kare maliyeti"""
+        return {
+            'fps': round(self.fps, 1),
+            'quality': self.level['name'],
+            'frame_ms': round(self.frame_cost_ms, 2),
+            'active': self.active_count,
+            'idle': self._task is None,
         }
-        self.particles.append(particle)
-        return self.canvas.create_oval(
-            x - particle['size'], y - particle['size'],
-            x + particle['size'], y + particle['size'],
-            fill=particle['color'], outline=''
-        )
 
-    def update_particles(self):
-        to_remove = []
-        for i, particle in enumerate(self.particles):
-            particle['x'] += particle['vx']
-            particle['y'] += particle['vy']
-            particle['life'] -= 1
-            particle['size'] *= 0.98
+    def spawn(self, x, y):
+        """Tek partikül üretir, slot numarasını döndürür"""
+        if self.free_slots and self.active_count < self.max_active():
+            slot = self.free_slots.pop()
+        else:
+            # Havuz (ya da seviye limiti) dolu: ömrü en az kalanı geri dönüştür
+            slot = min((i for i in range(self.capacity) if self.alive[i]),
+                       key=self.life.__getitem__)
+            self.active_count -= 1
+
+        self.x[slot] = x
+        self.y[slot] = y
+        self.vx[slot] = random.uniform(-2, 2)
+        self.vy[slot] = random.uniform(-2, 2)
+        self.life[slot] = 100
+        self.size[slot] = random.randint(2, 6)
+        self.alive[slot] = True
+        self.active_count += 1
+
+        # Renk sadece değiştiyse Tk'ya gönderilir
+        color = random.choice(self.colors)
+        item = self.item_ids[slot]
+        if self.item_colors[slot] != color:
+            self.canvas.itemconfig(item, fill=color, state='normal')
+            self.item_colors[slot] = color
+        else:
+            self.canvas.itemconfig(item, state='normal')
+        self._draw(slot)
+        self._wake()
+        return slot
+
+    def spawn_burst(self, n, region):
+        """region = (x1, y1, x2, y2) alanında rastgele n partikül üretir"""
+        x1, y1, x2, y2 = region
+        # Düşük kalitede daha az partikül
+        n = max(1, int(n * self.level['max_particles']))
+        for _ in range(n):
+            self.spawn(random.randint(x1, x2), random.randint(y1, y2))
+
+    def _draw(self, slot):
+        s = self.size[slot]
+        box = (int(self.x[slot] - s), int(self.y[slot] - s),
+               int(self.x[slot] + s), int(self.y[slot] + s))
+        self.canvas.coords(self.item_ids[slot], *box)
+        self.drawn[slot] = box
+
+    def _release(self, slot):
+        self.alive[slot] = False
+        self.canvas.itemconfig(self.item_ids[slot], state='hidden')
+        self.free_slots.append(slot)
+        self.active_count -= 1
+
+    def update_particles(self, dt=1.0):
+        """dt: 16 ms'lik referans kareye göre geçen adım sayısı"""
+        if not self.active_count:
+            return
+        shrink = 0.98 ** dt if self.level['shrink'] else 1.0
+        if np is not None:
+            self._update_vectorized(dt, shrink)
+        else:
+            self._update_arrays(dt, shrink)
+
+    def _update_vectorized(self, dt, shrink):
+        alive = self.alive
+        # Tüm popülasyon tek adımda güncellenir
+        self.x[alive] += self.vx[alive] * dt
+        self.y[alive] += self.vy[alive] * dt
+        self.life[alive] -= dt
+        self.size[alive] *= shrink
+
+        dead = alive & ((self.life <= 0) | (self.size < 1))
+        for slot in np.flatnonzero(dead):
+            self._release(int(slot))
+
+        boxes = np.stack((self.x - self.size, self.y - self.size,
+                          self.x + self.size, self.y + self.size), axis=1).astype(np.int64)
+        # Sadece geometrisi değişen item'lar Tk'ya gönderilir
+        changed = self.alive & np.any(boxes != self.drawn, axis=1)
+        coords = self.canvas.coords
+        item_ids = self.item_ids
+        for slot in np.flatnonzero(changed):
+            coords(item_ids[slot], *boxes[slot].tolist())
+        self.drawn[changed] = boxes[changed]
+
+    def _update_arrays(self, dt, shrink):
+        x, y, vx, vy = self.x, self.y, self.vx, self.vy
+        life, size, drawn = self.life, self.size, self.drawn
+        coords = self.canvas.coords
+        for slot in range(self.capacity):
+            if not self.alive[slot]:
+                continue
+            x[slot] += vx[slot] * dt
+            y[slot] += vy[slot] * dt
+            life[slot] -= dt
+            size[slot] *= shrink
 
-            if particle['life'] <= 0 or particle['size'] < 1:
-                to_remove.append(i)
+            if life[slot] <= 0 or size[slot] < 1:
+                self._release(slot)
                 continue
 
-            # Glow effect
-            alpha = particle['life'] / 100
-            color = particle['color']
-            self.canvas.coords(
-                particle['id'],
-                particle['x'] - particle['size'], particle['y'] - particle['size'],
-                particle['x'] + particle['size'], particle['y'] + particle['size']
-            )
-            self.canvas.itemconfig(particle['id'], fill=color)
-
-        # Remove dead particles
-        for i in reversed(to_remove):
-            self.canvas.delete(self.particles[i]['id'])
-            del self.particles[i]
-
-    def animate(self):
-        self.update_particles()
-        self.canvas.after(16, self.animate)  # ~60 FPS
-
-class ChatWorker(threading.Thread):
-    def __init__(self, message, server_url, callback, error_callback):
-        super().__init__()
-        self.message = message
-        self.server_url = server_url
-        self.callback = callback
-        self.error_callback = error_callback
-        self.daemon = True
-
-    def run(self):
-        try:
-            response = requests.post(
-                f"{self.server_url}/chat",
-                json={"message": self.message},
-                timeout=30
-            )
+            s = size[slot]
+            box = (int(x[slot] - s), int(y[slot] - s), int(x[slot] + s), int(y[slot] + s))
+            if box != drawn[slot]:
+                coords(self.item_ids[slot], *box)
+                drawn[slot] = box
+
+    def _wake(self):
+        if self._task is None:
+            self._last_frame = None
+            # Kalite uyanışta değişmez; sayaçlar korunur, seviye ancak
+            # UPGRADE_FRAMES hızlı kareden sonra yükselir
+            interval = self.level['interval']
+            self._task = self.clock.every('particles', interval, self.animate, delay_ms=interval)
+
+    def _adapt_quality(self):
+        if self.frame_cost_ms > self.frame_budget_ms:
+            self._over_budget += 1
+            self._under_budget = 0
+        elif self.frame_cost_ms < self.frame_budget_ms / 2:
+            self._under_budget += 1
+            self._over_budget = 0
+        else:
+            self._over_budget = self._under_budget = 0
+
+        if self._over_budget >= self.DOWNGRADE_FRAMES and self.quality < len(QUALITY_LEVELS) - 1:
+            self._set_quality(self.quality + 1)
+        elif self._under_budget >= self.UPGRADE_FRAMES and self.quality > 0:
+            self._set_quality(self.quality - 1)
+
+    def _set_quality(self, quality):
+        self.quality = quality
+        self._over_budget = self._under_budget = 0
+        logger.info(f"Partikül kalitesi: {self.level['name']} "
+                    f"(kare {self.frame_cost_ms:.1f} ms, {self.fps:.0f} FPS)")
+
+        # Yeni limitin üstünde kalan partikülleri bırak
+        excess = self.active_count - self.max_active()
+        for slot in range(self.capacity):
+            if excess <= 0:
+                break
+            if self.alive[slot]:
+                self._release(slot)
+                excess -= 1
+
+    def animate(self, now):
+        started = time.perf_counter()
+        if self._last_frame is None:
+            dt = 1.0
+        else:
+            elapsed = now - self._last_frame
+            # Aynı zaman damgalı iki kare (saat çözünürlüğü) FPS'i bozmasın
+            if elapsed > 0:
+                self.fps = 0.9 * self.fps + 0.1 * (1.0 / elapsed) if self.fps else 1.0 / elapsed
+            dt = min(elapsed * 1000 / 16, 4.0)
+        self._last_frame = now
+
+        self.update_particles(dt)
+
+        cost = (time.perf_counter() - started) * 1000
+        self.frame_cost_ms = 0.8 * self.frame_cost_ms + 0.2 * cost
+        self._adapt_quality()
+
+        # Yaşayan partikül kalmadıysa görev biter, spawn uyandırır
+        if self.active_count:
+            self._task.interval_ms = self.level['interval']
+            return True
+        self.fps = 0.0
+        self._task = None
+        return False
+
+# Aynı anda gönderilebilecek (yanıtı beklenen) mesaj sayısı
+MAX_IN_FLIGHT = 4
+
+# Metrik dosyası; .prom uzantısı Prometheus metni yazar, "off" kapatır
+METRICS_EXPORT = os.environ.get('PHANTOMAI_METRICS', METRICS_PATH)
+
+# İstatistik katmanında gösterilen histogramlar
+OVERLAY_HISTOGRAMS = ('queue', 'network', 'body', 'decode', 'dispatch', 'render', 'first_paint', 'total',
+                      'loop_lag', 'discovery')
+
+
+class StreamRenderer:
+    """Tek bir isteğin yanıtını transcript'teki kendi mesajına yazar.
+
+    feed() worker thread'inden çağrılır; parçalar UI kuyruğuna konur ve aynı
+    karede gelenler tek text güncellemesinde yazılır. Yanıt mesajı açılana
+    kadar yerinde "bekleniyor" yazısı, hata olursa hata durumu görünür.
+    """
+
+    PENDING_TEXT = "⏳ yanıt bekleniyor..."
+    QUEUED_TEXT = "📮 kuyrukta: bağlantı gelince gönderilecek"
+
+    def __init__(self, app, request_id, sender="PhantomAI"):
+        self.app = app
+        self.request_id = request_id
+        self.sender = sender
+        self.seq = None
+        self.state = 'pending'
+        self.started = time.perf_counter()
+        self.first_token_ms = None
+        # Aşama zamanları: kuyruğa alınma anı şimdi işaretlenir
+        self.trace = app.metrics.trace()
+        self._placeholder = False
+
+    def place(self):
+        """Yanıt mesajını "bekleniyor" durumuyla açar"""
+        self.seq = self.app.begin_message(self.sender, self.PENDING_TEXT)
+        self._placeholder = True
+
+    def feed(self, text):
+        self.app.ui.post_text(self, text, self.write_chunk)
+
+    def write_chunk(self, text):
+        """Bir karede biriken parçalar (Tk thread'i)"""
+        if not text:
+            return
+
+        if self.first_token_ms is None:
+            self.first_token_ms = (time.perf_counter() - self.started) * 1000
+            logger.info(f"#{self.request_id} ilk token: {self.first_token_ms:.0f} ms")
+            self.state = 'streaming'
+            self.app.stop_typing(self.request_id)
+        self._write(text)
+        self.trace.mark('first_insert')
+
+    def _write(self, text):
+        if self.seq is None:
+            self.app.pipeline.place_until(self)
+        if self._placeholder:
+            self.app.transcript.replace(self.seq, text)
+            self._placeholder = False
+        else:
+            self.app.append_to_message(self.seq, text)
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def finish(self, reply):
+        """Hiç parça gelmediyse yanıtın tamamını yazar.
+
+        Parçalar bitişten önce kuyruğa konduğu için bu noktada yazılmıştır.
+        """
+        self.trace.mark('dispatch')
+        if self.first_token_ms is None:
+            self._write(reply)
+        self.state = 'done'
+        self.app.transcript.finish(self.seq, self.elapsed_ms())
+        self.trace.mark('inserted')
+        self.trace.finish()
+
+    def queue(self):
+        """Mesaj giden kutusunda bekliyor; yanıt gelince deliver() yazar"""
+        self._write(self.QUEUED_TEXT if self.first_token_ms is None else f"\n{self.QUEUED_TEXT}")
+        self.state = 'queued'
+
+    def deliver(self, reply):
+        """Giden kutusundan gelen yanıt; akıştan kalan kısmi metnin yerine geçer"""
+        self.app.transcript.replace(self.seq, reply)
+        self.state = 'done'
+        self.app.transcript.finish(self.seq, self.elapsed_ms())
+        self.trace.finish()
+
+    def fail(self, error_msg):
+        """Yarıda kalan akışın gelen kısmı kalır, sonuna hata eklenir"""
+        self._write(f"❌ {error_msg}" if self.first_token_ms is None else f"\n❌ {error_msg}")
+        self.state = 'error'
+        self.app.transcript.finish(self.seq, self.elapsed_ms())
+        self.trace.finish(ok=False)
+
+
+class SendPipeline:
+    """Aynı anda max_in_flight isteğe kadar gönderim ve yanıt yerleşimi.
+
+    placement='adjacent': yanıtın yeri soru gönderilir gönderilmez sorunun
+    hemen altında açılır. placement='ordered': yanıtlar transcript sonuna,
+    soruların gönderilme sırasıyla eklenir; hangi sırayla bittikleri önemsizdir.
+    """
+
+    def __init__(self, app, max_in_flight=4, placement='adjacent'):
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.placement = placement
+        self.in_flight = []
+        self._next_id = 1
+
+    def can_send(self):
+        return len(self.in_flight) < self.max_in_flight
+
+    def start(self):
+        renderer = StreamRenderer(self.app, self._next_id)
+        self._next_id += 1
+        self.in_flight.append(renderer)
+        self.app.start_typing(renderer.request_id)
+        if self.placement == 'adjacent':
+            renderer.place()
+        return renderer
+
+    def place_until(self, renderer):
+        """renderer'a kadar henüz yeri açılmamış yanıtları sırayla açar"""
+        for pending in self.in_flight:
+            if pending.seq is None:
+                pending.place()
+            if pending is renderer:
+                break
+
+    def done(self, renderer):
+        # Sıralı modda önceki yanıtların yeri, sonrakilerden önce açılmış olmalı
+        self.place_until(renderer)
+        self.in_flight.remove(renderer)
+        self.app.stop_typing(renderer.request_id)
+
+
+class StartupProfile:
+    """--profile-startup: açılış fazlarının süreleri (ms)"""
+
+    def __init__(self, started=_IMPORT_STARTED):
+        self.started = started
+        self.last = started
+        self.phases = []
+
+    def mark(self, phase, at=None):
+        now = time.perf_counter() if at is None else at
+        self.phases.append((phase, round((now - self.last) * 1000, 1)))
+        self.last = now
+
+    def report(self):
+        return {
+            'phases': dict(self.phases),
+            'total_ms': round((self.last - self.started) * 1000, 1),
+            # Açılışta yüklenmemesi gereken ağır modüller
+            'deferred_imports': {name: name not in sys.modules
+                                 for name in ('requests', 'numpy', 'asyncio', 'socket', 'concurrent.futures')},
+        }
 
-            if response.status_code == 200:
-                data = response.json()
-                if 'reply' in data:
-                    self.callback(data['reply'])
-                else:
-                    self.error_callback("Server'dan geçersiz yanıt")
-            else:
-                self.error_callback(f"HTTP {response.status_code}")
-        except Exception as e:
-            self.error_callback(f"Hata: {str(e)}")
 
 class NeonChatApp:
-    def __init__(self, root):
+    """Ana pencere önce çizilir; partiküller, stiller, metrikler ve keşif
+    ilk kareden sonra finish_startup() ile kurulur."""
+
+    def __init__(self, root, profile=None):
         self.root = root
+        self.profile = profile
         self.root.title('PhantomAI - Neon Edition')
         self.root.geometry('900x700')
         self.root.configure(bg='#0a0a0a')
         self.root.resizable(True, True)
 
-        # Server URL - otomatik algılanacak
-        self.server_url = 'http://localhost:8001'
+        # Mesaj aşamaları, event loop gecikmesi ve animasyon maliyeti ölçülür
+        self.metrics = Metrics()
+        self.stats_overlay = None
+
+        # Diğer thread'lerden gelen sonuçlar Tk'ya yalnızca bu kuyrukla geçer;
+        # aynı karedeki parçalar ve durum güncellemeleri birleştirilir
+        self.ui = UIDispatcher(self.root, metrics=self.metrics)
+        self.ui.start()
+
+        # Durum noktası, "yazıyor" göstergesi ve partiküller tek saatten
+        # çalışır; animasyon yokken ya da pencere küçültülmüşken uyur
+        self.clock = AnimationClock(self.root)
+        # "Yazıyor" göstergesi, ilk parçası gelmemiş isteklerin id'leri
+        self.typing_requests = set()
+
+        # Keşif, server havuzu ve gönderim arayüzden bağımsız çekirdekte;
+        # sağlık durumu değişince UI güncellenir (yalnızca son durum önemli)
+        self.client = PhantomClient(
+            max_in_flight=MAX_IN_FLIGHT,
+            on_health_change=lambda state, stats: self.ui.post_latest('health', self.on_health_change, state, stats)
+        )
+
+        # Aynı anda yanıt bekleyebilecek mesaj sayısı ve yanıtların yerleşimi
+        self.pipeline = SendPipeline(self, max_in_flight=MAX_IN_FLIGHT, placement='adjacent')
+
+        # Yanıt önbelleği isteğe bağlı; ilk açıldığında oluşturulur
+        self.reply_cache_enabled = tk.BooleanVar(value=False)
+
+        # Giden kutusunda bekleyen mesajların yanıt yerleri (anahtar -> renderer)
+        self.queued = {}
+        self.outbox_stats = None
 
         # Neon renk paleti
         self.neon_colors = {
@@ -118,81 +524,79 @@ class NeonChatApp:
             'text_secondary': '#cccccc'
         }
 
-        self.create_styles()
+        self.particle_system = None
+        self.lag_meter = None
+        self.metrics_exporter = None
+
         self.create_widgets()
+        self.root.protocol('WM_DELETE_WINDOW', self.on_close)
+        self._mark('widgets')
+
+        # İlk idle turunda pencere çizilir; ikincil parçalar ondan sonraki
+        # ilk olayda kurulur
+        self.root.after_idle(lambda: self.root.after(0, self.finish_startup))
+
+    def _mark(self, phase):
+        if self.profile is not None:
+            self.profile.mark(phase)
+
+    def finish_startup(self):
+        """İlk kareden sonra: stiller, partiküller, animasyonlar, metrikler ve keşif"""
+        self._mark('first_frame')
+        self.create_styles()
+        self.particle_system = ParticleSystem(self.particle_canvas, self.clock)
+        self._mark('particles')
         self.setup_animations()
+        self.setup_metrics()
+        self._mark('animations_metrics')
+
+        # Gönderilemeyen mesajlar diskte bekler; önceki oturumdan kalanlar
+        # bağlantı gelince gönderilir
+        ui = self.ui
+        try:
+            self.client.enable_outbox(
+                on_delivered=lambda key, message, reply: ui.post(self.on_outbox_delivered, key, message, reply),
+                on_failed=lambda key, message, error: ui.post(self.on_outbox_failed, key, message, error),
+                on_change=lambda stats: ui.post_latest('outbox', self.update_outbox_stats, stats)
+            )
+        except (OSError, sqlite3.Error) as e:
+            # Kutu yoksa mesajlar doğrudan gönderilir; açılış yarıda kalmasın
+            logger.warning(f"Giden kutusu açılamadı, mesajlar doğrudan gönderilecek: {e}")
+        self._mark('outbox')
 
-        # Otomatik server algılama
+        # Otomatik server algılama (ağ modülleri keşif thread'inde yüklenir)
         self.auto_detect_server()
+        self._mark('discovery_started')
+
+        if self.profile is not None:
+            self.root.after(0, self.report_startup)
+
+    def report_startup(self):
+        """--profile-startup: raporu yazıp çıkar"""
+        print(json.dumps(self.profile.report(), indent=2))
+        self.on_close()
+
+    def spawn_burst(self, n, region):
+        """Partikül sistemi henüz kurulmadıysa efekt atlanır"""
+        if self.particle_system is not None:
+            self.particle_system.spawn_burst(n, region)
 
     def auto_detect_server(self):
         """Otomatik olarak server IP'sini algılar"""
         self.status_label.config(text="🔍 SERVER ARANIYOR...", fg=self.neon_colors['orange'])
 
-        def detect():
-            try:
-                # 1. Önce localhost'u dene
-                response = requests.get('http://localhost:8001/health', timeout=2)
-                if response.status_code == 200:
-                    self.root.after(0, lambda: self.on_server_found('http://localhost:8001', 'YEREL'))
-                    return
-            except:
-                pass
-
-            try:
-                # 2. Yerel IP'yi al ve aynı ağdaki IP'leri dene
-                import socket
-                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-                s.connect(("8.8.8.8", 80))
-                local_ip = s.getsockname()[0]
-                s.close()
-
-                # Aynı subnet'teki IP'leri test et
-                ip_parts = local_ip.split('.')
-                base_ip = f"{ip_parts[0]}.{ip_parts[1]}.{ip_parts[2]}."
-
-                # Paralel olarak IP'leri test et
-                import concurrent.futures
-                import threading
-
-                found_server = None
-                found_lock = threading.Lock()
-
-                def test_ip(ip):
-                    nonlocal found_server
-                    try:
-                        response = requests.get(f'http://{ip}:8001/health', timeout=1)
-                        if response.status_code == 200:
-                            with found_lock:
-                                if not found_server:
-                                    found_server = f'http://{ip}:8001'
-                    except:
-                        pass
-
-                # 1-254 arası IP'leri test et (ama kendi IP'mizi atla)
-                test_ips = [f"{base_ip}{i}" for i in range(1, 255) if f"{base_ip}{i}" != local_ip]
-
-                # Thread pool ile paralel test
-                with concurrent.futures.ThreadPoolExecutor(max_workers=20) as executor:
-                    futures = [executor.submit(test_ip, ip) for ip in test_ips[:50]]  # İlk 50'yi test et
-                    for future in concurrent.futures.as_completed(futures):
-                        if found_server:
-                            break
-
-                if found_server:
-                    self.root.after(0, lambda: self.on_server_found(found_server, 'AĞ'))
-                else:
-                    self.root.after(0, lambda: self.on_server_not_found())
-
-            except Exception as e:
-                logger.error(f"Otomatik algılama hatası: {e}")
-                self.root.after(0, lambda: self.on_server_not_found())
-
-        threading.Thread(target=detect, daemon=True).start()
-
-    def on_server_found(self, url, source):
-        """Server bulunduğunda çağrılır"""
-        self.server_url = url
+        def found(result):
+            self.metrics.observe('discovery', result.timings['total'])
+            if result.servers:
+                self.ui.post(self.on_server_found, result.servers, result.source)
+            else:
+                self.ui.post(self.on_server_not_found)
+
+        self.client.discover_async(found, lambda error: self.ui.post(self.on_server_not_found))
+
+    def on_server_found(self, servers, source):
+        """Server(lar) bulunduğunda çağrılır; servers: [(url, gecikme_ms)], en hızlısı önce"""
+        url = servers[0][0]
         self.url_entry.delete(0, tk.END)
         self.url_entry.insert(0, url)
 
@@ -200,13 +604,13 @@ class NeonChatApp:
         self.connect_btn.config(text="🎉 BAĞLI")
 
         # Başarı partikülleri
-        for _ in range(30):
-            x = random.randint(100, 800)
-            y = random.randint(100, 600)
-            particle_id = self.particle_system.create_particle(x, y)
-            self.particle_system.particles[-1]['id'] = particle_id
+        self.spawn_burst(30, (100, 100, 800, 600))
 
-        self.add_message(f"🎉 Server otomatik olarak bulundu: {url} ({source})", "SYSTEM")
+        if len(servers) > 1:
+            others = ', '.join(other for other, _ in servers[1:])
+            self.add_message(f"🎉 {len(servers)} server bulundu ({source}): {url} + {others}", "SYSTEM")
+        else:
+            self.add_message(f"🎉 Server otomatik olarak bulundu: {url} ({source})", "SYSTEM")
 
     def on_server_not_found(self):
         """Server bulunamadığında çağrılır"""
@@ -288,7 +692,7 @@ class NeonChatApp:
                  background=self.neon_colors['surface']).pack(side=tk.LEFT, padx=(20, 10), pady=10)
 
         self.url_entry = ttk.Entry(connection_frame, style='Neon.TEntry', width=40)
-        self.url_entry.insert(0, self.server_url)
+        self.url_entry.insert(0, self.client.server_url)
         self.url_entry.pack(side=tk.LEFT, padx=(0, 10), pady=10, fill=tk.X, expand=True)
 
         self.connect_btn = ttk.Button(connection_frame, text="🔗 BAĞLAN",
@@ -337,6 +741,23 @@ class NeonChatApp:
         self.chat_text.pack(fill=tk.BOTH, expand=True)
         self.chat_text.config(state=tk.DISABLED)
 
+        # Mesaj geçmişi diske yazılır; widget'ta yalnızca görünen bölge çevresi tutulur
+        try:
+            self.history = HistoryStore()
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Sohbet geçmişi açılamadı: {e}")
+            self.history = None
+        # Büyük yanıtlar karelere bölünerek yazılır; kod blokları arka planda
+        # bulunur, Tk thread'i yalnızca hazır tag aralıklarını uygular
+        self.formatter = Formatter(self.ui.post)
+        self.transcript = TranscriptView(self.chat_text, {
+            "Siz": ("👤 [SİZ]", self.neon_colors['cyan']),
+            "SYSTEM": ("⚙️ [SYSTEM]", self.neon_colors['orange']),
+            "PhantomAI": ("🤖 [PHANTOM AI]", self.neon_colors['pink']),
+        }, model=TranscriptModel(store=self.history), clock=self.clock, formatter=self.formatter,
+            code_styles=dict(TAG_OPTIONS, code_inline={'background': self.neon_colors['surface'],
+                                                       'foreground': self.neon_colors['green']}))
+
         # Typing indicator
         self.typing_frame = tk.Frame(chat_container, bg=self.neon_colors['bg'])
         self.typing_frame.pack(fill=tk.X, pady=(0, 10))
@@ -365,6 +786,11 @@ class NeonChatApp:
         )
         self.message_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=20, pady=15, ipady=8)
         self.message_entry.bind('<Return>', self.send_message)
+        self.root.bind('<Control-f>', self.open_search)
+        self.root.bind('<F12>', self.toggle_stats_overlay)
+        self.root.bind('<Control-n>', self.new_conversation)
+        # Kullanıcı yazmaya başlayınca bağlantıyı önceden aç
+        self.message_entry.bind('<Key>', lambda e: self.client.prewarm(), add='+')
 
         self.send_btn = tk.Button(
             input_frame,
@@ -382,12 +808,36 @@ class NeonChatApp:
         )
         self.send_btn.pack(side=tk.RIGHT, padx=(0, 20))
 
+        # Yanıt önbelleği anahtarı (Shift+Enter: önbelleği atla ve yenile)
+        self.cache_toggle = tk.Checkbutton(
+            input_frame,
+            text='⚡ ÖNBELLEK',
+            variable=self.reply_cache_enabled,
+            command=self.toggle_reply_cache,
+            font=('Segoe UI', 9),
+            bg=self.neon_colors['surface'],
+            fg=self.neon_colors['text_secondary'],
+            activebackground=self.neon_colors['surface'],
+            activeforeground=self.neon_colors['cyan'],
+            selectcolor=self.neon_colors['bg'],
+            borderwidth=0
+        )
+        self.cache_toggle.pack(side=tk.RIGHT, padx=(0, 10))
+
+        # Giden kutusu: bekleyen mesaj sayısı ve son toplu gönderimin hızı
+        self.outbox_label = tk.Label(
+            input_frame,
+            text='',
+            font=('Segoe UI', 9),
+            fg=self.neon_colors['orange'],
+            bg=self.neon_colors['surface']
+        )
+        self.outbox_label.pack(side=tk.RIGHT, padx=(0, 10))
+        self.message_entry.bind('<Shift-Return>', lambda e: self.send_message(bypass_cache=True) or 'break')
+
         # Hoş geldin mesajı
         self.add_message("🌟 PhantomAI Neon Edition'a hoş geldiniz!\n💫 Server'a bağlanın ve büyüleyici sohbet deneyimine başlayın.", "SYSTEM")
 
-        # Particle system başlat
-        self.particle_system = ParticleSystem(self.particle_canvas)
-
     def setup_animations(self):
         # Button hover efektleri
         def on_enter(e):
@@ -400,19 +850,85 @@ class NeonChatApp:
         self.send_btn.bind('<Leave>', on_leave)
 
         # Pulsing effect for status dot
-        self.pulse_status()
-
-    def pulse_status(self):
+        self.clock.every('status_pulse', 1000, self.pulse_status)
+
+    def setup_metrics(self):
+        metrics = self.metrics
+        # Tk durumu yalnızca UI thread'inde okunur; exporter son örneği yazar
+        metrics.gauge('in_flight', lambda: len(self.pipeline.in_flight), sampled=True)
+        metrics.gauge('loop_lag_last_ms', lambda: round(self.lag_meter.last_lag_ms, 2), sampled=True)
+        metrics.gauge('particle_fps', lambda: self.particle_system.stats()['fps'], sampled=True)
+        metrics.gauge('particle_frame_ms', lambda: self.particle_system.stats()['frame_ms'], sampled=True)
+        metrics.gauge('particles_active', lambda: self.particle_system.active_count, sampled=True)
+        metrics.gauge('ui_queue_depth', self.ui.depth)
+        metrics.gauge('animation_tasks', lambda: self.clock.stats()['tasks'], sampled=True)
+        metrics.gauge('animation_ticks', lambda: self.clock.stats()['ticks'], sampled=True)
+        metrics.gauge('render_pending_chars', self.transcript.pending_chars, sampled=True)
+        metrics.gauge('render_slices', lambda: self.transcript.slices, sampled=True)
+        metrics.gauge('outbox_depth', lambda: self.outbox_stats['depth'] if self.outbox_stats else 0,
+                      sampled=True)
+        self.clock.every('metrics_sample', 1000, metrics.sample)
+
+        self.lag_meter = LoopLagMeter(self.clock, metrics)
+        self.lag_meter.start()
+        if METRICS_EXPORT != 'off':
+            self.metrics_exporter = MetricsExporter(metrics, METRICS_EXPORT).start()
+
+    def toggle_stats_overlay(self, event=None):
+        """F12: mesaj aşamaları, event loop gecikmesi ve animasyon istatistikleri"""
+        if self.stats_overlay is not None:
+            self.clock.cancel('stats_overlay')
+            self.stats_overlay.destroy()
+            self.stats_overlay = None
+            return
+        self.stats_overlay = tk.Label(self.root, font=('Consolas', 9), justify=tk.LEFT,
+                                      fg=self.neon_colors['green'], bg=self.neon_colors['surface'],
+                                      padx=10, pady=8)
+        self.stats_overlay.place(relx=1.0, x=-10, y=10, anchor='ne')
+        self.clock.every('stats_overlay', 500, self.update_stats_overlay)
+
+    def update_stats_overlay(self, now=None):
+        self.metrics.sample()
+        snapshot = self.metrics.snapshot()
+        lines = [f"{'aşama':<12}{'p50':>9}{'p95':>9}{'n':>6}"]
+        for name in OVERLAY_HISTOGRAMS:
+            h = snapshot['histograms'].get(name)
+            if h is not None:
+                lines.append(f"{name:<12}{h['p50_ms']:>9.1f}{h['p95_ms']:>9.1f}{h['count']:>6}")
+        gauges = snapshot['gauges']
+        counters = snapshot['counters']
+        lines.append("")
+        lines.append(f"loop lag    {gauges.get('loop_lag_last_ms', 0):.1f} ms")
+        lines.append(f"UI kuyruğu  {gauges.get('ui_queue_depth', 0)} olay, "
+                     f"{counters.get('ui_coalesced', 0)} birleştirildi")
+        lines.append(f"partikül    {gauges.get('particle_fps', 0):.0f} FPS, "
+                     f"kare {gauges.get('particle_frame_ms', 0):.2f} ms")
+        lines.append(f"mesaj       {counters.get('messages_ok', 0)} ok, "
+                     f"{counters.get('messages_failed', 0)} hata, {gauges.get('in_flight', 0)} bekleyen")
+        received, decoded = counters.get('bytes_received', 0), counters.get('bytes_decoded', 0)
+        ratio = f", {decoded / received:.1f}x" if received else ""
+        lines.append(f"aktarım     {counters.get('bytes_sent', 0) / 1024:.1f} KB giden, "
+                     f"{received / 1024:.1f} KB gelen{ratio}")
+        lines.append(f"animasyon   {gauges.get('animation_tasks', 0)} görev, "
+                     f"{gauges.get('animation_ticks', 0)} uyanış")
+        lines.append(f"yazım       {gauges.get('render_pending_chars', 0) / 1024:.0f} KB bekleyen, "
+                     f"{gauges.get('render_slices', 0)} dilim")
+        flush = self.outbox_stats['last_flush'] if self.outbox_stats else None
+        rate = f", son boşaltma {flush['messages']} mesaj {flush['ms']:.0f} ms" if flush else ""
+        lines.append(f"giden kutusu {gauges.get('outbox_depth', 0)} bekleyen, "
+                     f"{counters.get('outbox_delivered', 0)} teslim{rate}")
+        self.stats_overlay.config(text='\n'.join(lines))
+
+    def pulse_status(self, now=None):
         current_color = self.status_indicator.itemcget(self.status_dot, 'fill')
         if current_color == '#666666':
             self.status_indicator.itemconfig(self.status_dot, fill='#cccccc')
         else:
             self.status_indicator.itemconfig(self.status_dot, fill='#666666')
-        self.root.after(1000, self.pulse_status)
 
     def connect_server(self):
-        self.server_url = self.url_entry.get().strip()
-        if not self.server_url:
+        server_url = self.url_entry.get().strip()
+        if not server_url:
             self.show_error("Server URL boş olamaz!")
             return
 
@@ -421,33 +937,21 @@ class NeonChatApp:
         self.status_indicator.itemconfig(self.status_dot, fill=self.neon_colors['orange'])
         self.status_label.config(text="BAĞLANIYOR...", fg=self.neon_colors['orange'])
 
-        self.check_connection()
-
-    def check_connection(self):
-        def check():
-            try:
-                response = requests.get(f"{self.server_url}/health", timeout=5)
-                if response.status_code == 200:
-                    self.root.after(0, lambda: self.on_connection_success())
-                else:
-                    self.root.after(0, lambda: self.on_connection_error("Server yanıt vermiyor"))
-            except:
-                self.root.after(0, lambda: self.on_connection_error("Bağlantı hatası"))
-
-        threading.Thread(target=check, daemon=True).start()
+        # Elle girilen server havuzun tek üyesi olur
+        self.client.connect(
+            server_url,
+            lambda latency: self.ui.post(self.on_connection_success),
+            lambda error: self.ui.post(self.on_connection_error, error)
+        )
 
     def on_connection_success(self):
         self.connect_btn.config(text="✅ BAĞLI")
         self.status_indicator.itemconfig(self.status_dot, fill=self.neon_colors['green'])
         self.status_label.config(text="BAĞLI", fg=self.neon_colors['green'])
-        self.add_message(f"🎉 Server'a başarıyla bağlandı: {self.server_url}", "SYSTEM")
+        self.add_message(f"🎉 Server'a başarıyla bağlandı: {self.client.server_url}", "SYSTEM")
 
         # Success particles
-        for _ in range(20):
-            x = random.randint(100, 800)
-            y = random.randint(100, 600)
-            particle_id = self.particle_system.create_particle(x, y)
-            self.particle_system.particles[-1]['id'] = particle_id
+        self.spawn_burst(20, (100, 100, 800, 600))
 
     def on_connection_error(self, error):
         self.connect_btn.config(text="❌ BAĞLAN")
@@ -455,6 +959,136 @@ class NeonChatApp:
         self.status_label.config(text="BAĞLANTI HATASI", fg=self.neon_colors['pink'])
         self.show_error(f"Bağlantı hatası: {error}")
 
+    def new_conversation(self, event=None):
+        """Ctrl+N: server sonraki mesajlarda önceki turları bağlam olarak kullanmaz"""
+        self.client.new_conversation()
+        self.add_message("🆕 Yeni konuşma başlatıldı; önceki mesajlar bağlama dahil edilmeyecek.", "SYSTEM")
+
+    def open_search(self, event=None):
+        """Geçmişte anahtar kelime araması; çift tıklanan mesaja gider"""
+        if self.history is None:
+            self.show_error("Sohbet geçmişi kullanılamıyor")
+            return
+
+        window = tk.Toplevel(self.root)
+        window.title("Geçmişte Ara")
+        window.geometry("600x400")
+        window.configure(bg=self.neon_colors['bg'])
+
+        query_entry = tk.Entry(window, font=('Segoe UI', 12),
+                               bg=self.neon_colors['surface'], fg=self.neon_colors['text'],
+                               insertbackground=self.neon_colors['cyan'], relief='flat')
+        query_entry.pack(fill=tk.X, padx=15, pady=15, ipady=6)
+        query_entry.focus_set()
+
+        results = tk.Listbox(window, font=('Consolas', 10),
+                             bg=self.neon_colors['bg'], fg=self.neon_colors['text'],
+                             selectbackground=self.neon_colors['purple'],
+                             borderwidth=0, highlightthickness=0)
+        results.pack(fill=tk.BOTH, expand=True, padx=15, pady=(0, 15))
+        found_ids = []
+
+        def search(event=None):
+            started = time.perf_counter()
+            rows = self.history.search(query_entry.get())
+            elapsed = (time.perf_counter() - started) * 1000
+            results.delete(0, tk.END)
+            found_ids.clear()
+            for message_id, sender, text, timestamp, _ in rows:
+                when = time.strftime('%d.%m.%Y %H:%M', time.localtime(timestamp))
+                snippet = ' '.join(text.split())[:80]
+                results.insert(tk.END, f"{when}  [{sender}]  {snippet}")
+                found_ids.append(message_id)
+            window.title(f"Geçmişte Ara - {len(rows)} sonuç ({elapsed:.1f} ms)")
+
+        def open_selected(event=None):
+            selection = results.curselection()
+            if selection:
+                self.transcript.jump_to(found_ids[selection[0]])
+
+        query_entry.bind('<Return>', search)
+        results.bind('<Double-Button-1>', open_selected)
+
+    def toggle_reply_cache(self):
+        if self.reply_cache_enabled.get():
+            self.client.enable_reply_cache()
+
+    def update_cache_stats(self):
+        stats = self.client.reply_cache.stats()
+        hits = stats['hits'] + stats['disk_hits']
+        self.cache_toggle.config(text=f"⚡ ÖNBELLEK {hits}/{hits + stats['misses']}")
+
+    def update_outbox_stats(self, stats):
+        self.outbox_stats = stats
+        flush = stats['last_flush']
+        if stats['depth']:
+            text = f"📮 {stats['depth']} kuyrukta"
+        elif flush is not None and flush['per_s']:
+            text = f"📮 {flush['messages']} mesaj gönderildi · {flush['per_s']:.0f}/sn"
+        else:
+            text = ''
+        self.outbox_label.config(text=text)
+
+    def queue_send(self, key, error_msg, renderer):
+        """Geçici hata: mesaj giden kutusunda, yanıt gelince yerine yazılır"""
+        logger.info(f"#{renderer.request_id} kuyruğa alındı: {error_msg}")
+        self.client.probe_now()
+        self.pipeline.done(renderer)
+        renderer.queue()
+        self.queued[key] = renderer
+        self.update_send_button()
+
+    def on_outbox_delivered(self, key, message, reply):
+        self.metrics.inc('outbox_delivered')
+        renderer = self.queued.pop(key, None)
+        if renderer is not None:
+            renderer.deliver(reply)
+        else:
+            # Önceki oturumda kuyruğa alınmış mesaj
+            self.add_message(f"📮 {message}", "Siz")
+            self.add_message(reply, "PhantomAI")
+
+    def on_outbox_failed(self, key, message, error_msg):
+        renderer = self.queued.pop(key, None)
+        if renderer is not None:
+            renderer.fail(error_msg)
+        else:
+            self.add_message(f"❌ Gönderilemedi: {message}\n{error_msg}", "SYSTEM")
+
+    def on_close(self):
+        self.ui.stop()
+        self.clock.stop()
+        if self.lag_meter is not None:
+            self.lag_meter.stop()
+        if self.metrics_exporter is not None:
+            # Son yazımda güncel değerler olsun; widget'lar henüz yok edilmedi
+            self.metrics.sample()
+            self.metrics_exporter.stop()
+        self.client.close()
+        self.formatter.close()
+        if self.history is not None:
+            self.history.close()
+        self.root.destroy()
+
+    def on_health_change(self, state, stats):
+        """Sağlık izleyicisinden gelen durum değişikliklerini gösterir"""
+        if state == HEALTHY:
+            color = self.neon_colors['green']
+            text = f"BAĞLI · {stats['ewma_ms']:.0f} ms"
+            if stats['size'] > 1:
+                text += f" · {stats['available']}/{stats['size']} server"
+        elif state == DEGRADED:
+            color = self.neon_colors['orange']
+            latency = stats['p95_ms'] if stats['p95_ms'] is not None else stats['ewma_ms']
+            text = f"⚠️ YAVAŞ · p95 {latency:.0f} ms" if latency is not None else "⚠️ KARARSIZ"
+        elif state == DOWN:
+            color = self.neon_colors['pink']
+            text = "❌ SERVER ERİŞİLEMEZ"
+        else:
+            return
+        self.status_indicator.itemconfig(self.status_dot, fill=color)
+        self.status_label.config(text=text, fg=color)
+
     def show_error(self, message):
         error_window = tk.Toplevel(self.root)
         error_window.title("Hata")
@@ -469,90 +1103,111 @@ class NeonChatApp:
 
         ttk.Button(error_window, text="Tamam", command=error_window.destroy).pack()
 
-    def add_message(self, text, sender="PhantomAI"):
-        self.chat_text.config(state=tk.NORMAL)
-
-        # Neon renkler ile mesaj formatı
-        if sender == "Siz":
-            color = self.neon_colors['cyan']
-            prefix = "👤 [SİZ]"
-        elif sender == "SYSTEM":
-            color = self.neon_colors['orange']
-            prefix = "⚙️ [SYSTEM]"
-        else:
-            color = self.neon_colors['pink']
-            prefix = "🤖 [PHANTOM AI]"
+    def add_message(self, text, sender="PhantomAI", latency_ms=None, badge=None):
+        self.transcript.append(sender, text, latency_ms, badge)
 
-        self.chat_text.insert(tk.END, f"{prefix} {text}\n\n", sender)
-        self.chat_text.tag_configure(sender, foreground=color, font=('Consolas', 11, 'bold'))
-        self.chat_text.config(state=tk.DISABLED)
-        self.chat_text.see(tk.END)
+    def begin_message(self, sender="PhantomAI", text=""):
+        """Yeni bir mesaj başlatır, içine yazmak için seq numarası döndürür"""
+        return self.transcript.append(sender, text).seq
 
-        # Typing animasyonu için
-        if sender != "SYSTEM":
-            self.animate_typing()
+    def append_to_message(self, seq, text):
+        self.transcript.extend(seq, text)
 
-    def animate_typing(self):
-        dots = ["", ".", "..", "..."]
-        self.typing_counter = 0
+    def start_typing(self, request_id):
+        """Yanıtı beklenen her istek için tek gösterge; hepsi tek animasyon görevi"""
+        self.typing_requests.add(request_id)
+        if not self.clock.active('typing'):
+            self._typing_step = 0
+            self.clock.every('typing', 250, self.animate_typing)
 
-        def animate():
-            if self.typing_counter < 12:  # 3 saniye
-                self.typing_label.config(text=f"🤖 PhantomAI yazıyor{dots[self.typing_counter % 4]}")
-                self.typing_counter += 1
-                self.root.after(250, animate)
-            else:
-                self.typing_label.config(text="")
+    def stop_typing(self, request_id):
+        self.typing_requests.discard(request_id)
+        if not self.typing_requests:
+            self.clock.cancel('typing')
+            self.typing_label.config(text="")
 
-        animate()
+    def animate_typing(self, now):
+        dots = ["", ".", "..", "..."]
+        waiting = len(self.typing_requests)
+        suffix = f" ({waiting})" if waiting > 1 else ""
+        self.typing_label.config(text=f"🤖 PhantomAI yazıyor{dots[self._typing_step % 4]}{suffix}")
+        self._typing_step += 1
 
-    def send_message(self, event=None):
+    def send_message(self, event=None, bypass_cache=False):
         message = self.message_entry.get().strip()
         if not message:
             return
 
-        if "❌" in self.status_label.cget("text") or "BAĞLANTI HATASI" in self.status_label.cget("text"):
-            self.show_error("Önce server'a bağlanın!")
+        if not self.pipeline.can_send():
             return
 
+        self.transcript.scroll_to_end()
         self.add_message(message, "Siz")
         self.message_entry.delete(0, tk.END)
 
-        # Send button animasyonu
-        self.send_btn.config(text="⏳ GÖNDERİLİYOR...", state=tk.DISABLED)
-
-        # Worker thread
-        worker = ChatWorker(message, self.server_url, self.on_message_received, self.on_error)
-        worker.start()
+        use_cache = self.reply_cache_enabled.get()
+        if use_cache:
+            cached = self.client.cached_reply(message, bypass=bypass_cache)
+            self.update_cache_stats()
+            if cached is not None:
+                self.add_message(cached, "PhantomAI", latency_ms=0.0, badge="⚡ [ÖNBELLEK]")
+                return
+
+        renderer = self.pipeline.start()
+        self.update_send_button()
+
+        self.client.stream(
+            message, renderer.feed,
+            lambda reply: self.ui.post(self.finish_send, reply, renderer),
+            lambda error: self.ui.post(self.finish_send_with_error, error, renderer),
+            use_cache=use_cache,
+            trace=renderer.trace,
+            # Server erişilemezse mesaj kaybolmaz, giden kutusunda bekler
+            on_queued=lambda key, error: self.ui.post(self.queue_send, key, error, renderer)
+        )
 
-    def on_message_received(self, reply):
-        self.root.after(0, lambda: self.finish_send(reply))
+    def update_send_button(self):
+        in_flight = len(self.pipeline.in_flight)
+        if not self.pipeline.can_send():
+            self.send_btn.config(text=f"⏳ BEKLENİYOR ({in_flight})", state=tk.DISABLED)
+        elif in_flight:
+            self.send_btn.config(text=f"🚀 GÖNDER ({in_flight})", state=tk.NORMAL)
+        else:
+            self.send_btn.config(text="🚀 GÖNDER", state=tk.NORMAL)
 
-    def finish_send(self, reply):
-        self.add_message(reply, "PhantomAI")
-        self.send_btn.config(text="🚀 GÖNDER", state=tk.NORMAL)
+    def finish_send(self, reply, renderer):
+        self.pipeline.done(renderer)
+        renderer.finish(reply)
+        self.update_send_button()
 
         # Success particles
-        for _ in range(10):
-            x = random.randint(200, 700)
-            y = random.randint(300, 500)
-            particle_id = self.particle_system.create_particle(x, y)
-            self.particle_system.particles[-1]['id'] = particle_id
-
-    def on_error(self, error_msg):
-        self.root.after(0, lambda: self.finish_send_with_error(error_msg))
+        self.spawn_burst(10, (200, 300, 700, 500))
 
-    def finish_send_with_error(self, error_msg):
-        self.add_message(f"❌ {error_msg}", "SYSTEM")
-        self.send_btn.config(text="🚀 GÖNDER", state=tk.NORMAL)
+    def finish_send_with_error(self, error_msg, renderer):
+        self.client.probe_now()
+        self.pipeline.done(renderer)
+        renderer.fail(error_msg)
+        self.update_send_button()
 
 def main():
-    root = tk.Tk()
-    app = NeonChatApp(root)
+    import argparse
 
-    # Particle animasyonunu başlat
-    app.particle_system.animate()
+    parser = argparse.ArgumentParser(description='PhantomAI Neon Edition')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='Açılış fazlarının sürelerini JSON olarak yazıp çık')
+    args = parser.parse_args()
+
+    profile = None
+    if args.profile_startup:
+        profile = StartupProfile()
+        profile.mark('imports', _IMPORTS_DONE)
+
+    root = tk.Tk()
+    if profile is not None:
+        profile.mark('tk_init')
+    NeonChatApp(root, profile)
 
+    # Particle animasyonu ilk spawn'da kendiliğinden başlar
     root.mainloop()
 
 if __name__ == '__main__':
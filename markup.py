@@ -0,0 +1,115 @@
+"""Mesaj metnindeki kod blokları için tag aralıkları.
+
+Büyük yanıtlarda (log, kod dökümü) aralık hesabı arka plan thread'inde
+yapılır; Tk thread'i yalnızca hazır aralıklara tag_add uygular. Aralıklar
+mesaj başına önbelleğe alınır: aynı mesaj tekrar yüklendiğinde (sayfalama,
+arama) yeniden hesaplanmaz.
+
+Aralıklar mesaj gövdesinin başına göreli (satır, sütun) çiftleridir;
+Text widget'ının "satır.sütun" indekslerine doğrudan çevrilir.
+"""
+import bisect
+import logging
+import queue
+import re
+import threading
+
+logger = logging.getLogger(__name__)
+
+# ``` satırıyla açılan blok sonraki ``` satırına (ya da metnin sonuna) kadar sürer
+FENCE = re.compile(r'^[ \t]*```[^\n]*$', re.M)
+INLINE_CODE = re.compile(r'`[^`\n]+`')
+
+TAG_OPTIONS = {
+    'code_block': {'background': '#141414', 'foreground': '#e0e0e0', 'font': ('Consolas', 10)},
+    'code_fence': {'foreground': '#666666', 'font': ('Consolas', 9)},
+    'code_inline': {'background': '#1e1e1e', 'foreground': '#00ff80'},
+}
+
+
+def code_ranges(body):
+    """[(tag, (satır, sütun), (satır, sütun))], gövde başına göreli"""
+    if '`' not in body:
+        return []
+    line_starts = [0]
+    line_starts.extend(m.end() for m in re.finditer('\n', body))
+
+    def position(offset):
+        line = bisect.bisect_right(line_starts, offset) - 1
+        return line, offset - line_starts[line]
+
+    ranges = []
+    fence_start = None
+    for line, start in enumerate(line_starts):
+        end = line_starts[line + 1] - 1 if line + 1 < len(line_starts) else len(body)
+        if FENCE.match(body, start, end):
+            ranges.append(('code_fence', (line, 0), (line, end - start)))
+            if fence_start is None:
+                fence_start = end + 1
+            else:
+                if start > fence_start:
+                    ranges.append(('code_block', position(fence_start), (line, 0)))
+                fence_start = None
+        elif fence_start is None and '`' in body[start:end]:
+            for match in INLINE_CODE.finditer(body, start, end):
+                ranges.append(('code_inline', (line, match.start() - start), (line, match.end() - start)))
+    if fence_start is not None and fence_start < len(body):
+        # Kapanmamış blok (akış yarıda kaldı) metnin sonuna kadar
+        ranges.append(('code_block', position(fence_start), position(len(body))))
+    return ranges
+
+
+def signature(body):
+    return len(body), hash(body)
+
+
+class Formatter:
+    """Aralık hesabını arka plan thread'inde yapar, sonucu mesaj başına saklar.
+
+    post(fn, *args): sonucu UI thread'ine aktaran fonksiyon (UIDispatcher.post).
+    Son max_cached mesajın aralıkları tutulur.
+    """
+
+    def __init__(self, post, max_cached=256):
+        self.post = post
+        self.max_cached = max_cached
+        self._cache = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(target=self._work_loop, daemon=True, name='formatter')
+        self._worker.start()
+
+    def ranges(self, seq, body, callback):
+        """Önbellekteki aralıklar; yoksa None döner ve hesap bitince
+        callback(seq, imza, aralıklar) UI thread'inde çağrılır"""
+        sig = signature(body)
+        with self._lock:
+            cached = self._cache.get(seq)
+            if cached is not None and cached[0] == sig:
+                # En son kullanılan sona (dict ekleme sırası = LRU sırası)
+                self._cache[seq] = self._cache.pop(seq)
+                return cached[1]
+        self._queue.put((seq, body, sig, callback))
+        return None
+
+    def _work_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            seq, body, sig, callback = item
+            try:
+                ranges = code_ranges(body)
+            except Exception as e:
+                logger.exception(f"Mesaj #{seq} biçimlendirilemedi: {e}")
+                continue
+            with self._lock:
+                self._cache.pop(seq, None)
+                self._cache[seq] = (sig, ranges)
+                while len(self._cache) > self.max_cached:
+                    self._cache.pop(next(iter(self._cache)))
+            self.post(callback, seq, sig, ranges)
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join(timeout=2)
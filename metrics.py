@@ -0,0 +1,278 @@
+"""Sıcak yol ölçümleri: mesaj aşamaları, event loop gecikmesi, dışa aktarım.
+
+Her mesaj bir Trace taşır; aşamalar (kuyruğa alındı, istek başladı, ilk
+byte, gövde çözüldü, UI'ya aktarıldı, widget'a yazıldı) geldikçe
+işaretlenir, mesaj bitince ardışık aşamalar arası süreler histogramlara
+eklenir. LoopLagMeter, animasyon saatindeki bir görevin ne kadar geç
+çalıştığını ölçer. MetricsExporter anlık görüntüyü periyodik olarak JSON
+ya da Prometheus metin dosyasına yazar.
+
+Tk durumunu okuyan gauge'lar sampled=True ile kaydedilir: yalnızca UI
+thread'inden çağrılan sample() içinde okunur, exporter thread'i son
+örneği kullanır.
+
+İşaretleme bir perf_counter() çağrısı, gözlem kısa bir kilit ve sabit
+boyutlu bir deque eklemesidir; sürekli açık kalabilir.
+"""
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = os.path.join(os.path.expanduser('~'), '.phantomai', 'metrics.json')
+
+# (süre adı, başlangıç aşaması, bitiş aşaması)
+SPANS = (
+    ('queue', 'enqueue', 'request_start'),
+    ('network', 'request_start', 'first_byte'),
+    ('body', 'first_byte', 'decoded'),
+    ('dispatch', 'decoded', 'dispatch'),
+    ('render', 'dispatch', 'inserted'),
+    ('total', 'enqueue', 'inserted'),
+    # Akışlı yanıtta ilk parçanın ekrana yazılması
+    ('first_paint', 'enqueue', 'first_insert'),
+)
+
+# Histogram kova üst sınırları (ms)
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+class Histogram:
+    """Kümülatif kovalar (Prometheus için) + yüzdelikler için son örnekler"""
+
+    def __init__(self, recent=512):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=recent)
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+
+    def snapshot(self):
+        ordered = sorted(self.recent)
+
+        def pct(p):
+            if not ordered:
+                return None
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * p))], 2)
+
+        return {'count': self.count, 'sum_ms': round(self.sum, 2),
+                'p50_ms': pct(0.50), 'p95_ms': pct(0.95), 'p99_ms': pct(0.99),
+                'max_ms': round(ordered[-1], 2) if ordered else None}
+
+
+class Trace:
+    """Tek mesajın aşama zaman damgaları; her aşamanın ilk işareti geçerlidir"""
+
+    __slots__ = ('metrics', 'marks', 'finished')
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.marks = {'enqueue': time.perf_counter()}
+        self.finished = False
+
+    def mark(self, stage, at=None):
+        if stage not in self.marks:
+            self.marks[stage] = time.perf_counter() if at is None else at
+
+    def elapsed_ms(self, stage):
+        at = self.marks.get(stage)
+        return None if at is None else (at - self.marks['enqueue']) * 1000
+
+    def record_transfer(self, sent, received, decoded, decode_ms):
+        """Tel üzerindeki byte'lar (gönderilen/alınan), açılmış gövde ve çözme süresi"""
+        self.metrics.observe('decode', decode_ms)
+        self.metrics.inc('bytes_sent', sent)
+        self.metrics.inc('bytes_received', received)
+        self.metrics.inc('bytes_decoded', decoded)
+
+    def finish(self, ok=True):
+        if self.finished:
+            return
+        self.finished = True
+        self.metrics.record_trace(self, ok)
+
+
+class Metrics:
+    """Histogram, sayaç ve gauge kayıtları; thread-safe"""
+
+    def __init__(self):
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.sampled = {}
+        self.samples = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def trace(self):
+        return Trace(self)
+
+    def observe(self, name, value_ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(value_ms)
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def gauge(self, name, fn, sampled=False):
+        """fn() anlık görüntü alınırken, o anki thread'de çağrılır.
+
+        sampled=True ise fn yalnızca sample() içinde çağrılır; anlık görüntü
+        son örneği okur. Tk widget'larına dokunan gauge'lar için.
+        """
+        if sampled:
+            self.sampled[name] = fn
+        else:
+            self.gauges[name] = fn
+
+    def sample(self, now=None):
+        """sampled gauge'ları okuyup saklar; UI thread'inden çağrılmalıdır"""
+        values = {}
+        for name, fn in list(self.sampled.items()):
+            try:
+                values[name] = fn()
+            except Exception as e:
+                logger.warning(f"Gauge örneklenemedi ({name}): {e}")
+        with self._lock:
+            self.samples.update(values)
+
+    def _gauge_values(self):
+        with self._lock:
+            values = dict(self.samples)
+        for name, fn in list(self.gauges.items()):
+            try:
+                values[name] = fn()
+            except Exception as e:
+                logger.warning(f"Gauge okunamadı ({name}): {e}")
+        return values
+
+    def record_trace(self, trace, ok):
+        marks = trace.marks
+        spans = [(name, (marks[end] - marks[start]) * 1000)
+                 for name, start, end in SPANS if start in marks and end in marks]
+        with self._lock:
+            for name, value in spans:
+                histogram = self.histograms.get(name)
+                if histogram is None:
+                    histogram = self.histograms[name] = Histogram()
+                histogram.observe(value)
+            key = 'messages_ok' if ok else 'messages_failed'
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {name: h.snapshot() for name, h in self.histograms.items()}
+            counters = dict(self.counters)
+        gauges = self._gauge_values()
+        return {'timestamp': time.time(), 'uptime_s': round(time.time() - self.started, 1),
+                'histograms': histograms, 'counters': counters, 'gauges': gauges}
+
+    def to_prometheus(self, prefix='phantomai'):
+        lines = []
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                metric = f"{prefix}_{name}_ms"
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), h.counts):
+                    cumulative += count
+                    lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+                lines.append(f"{metric}_sum {h.sum:.3f}")
+                lines.append(f"{metric}_count {h.count}")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f"# TYPE {prefix}_{name}_total counter")
+                lines.append(f"{prefix}_{name}_total {value}")
+        for name, value in sorted(self._gauge_values().items()):
+            if isinstance(value, (int, float)):
+                lines.append(f"# TYPE {prefix}_{name} gauge")
+                lines.append(f"{prefix}_{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+class LoopLagMeter:
+    """Tk event loop'unun tepkisizliğini ölçer.
+
+    Animasyon saatine interval_ms'lik bir görev kaydedilir; görevin
+    planlanandan ne kadar geç çalıştığı 'loop_lag' histogramına yazılır.
+    Saat uyuduğunda (pencere küçültülmüş) ölçüm de durur.
+    """
+
+    KEY = 'loop_lag'
+
+    def __init__(self, clock, metrics, interval_ms=250):
+        self.clock = clock
+        self.metrics = metrics
+        self.interval_ms = interval_ms
+        self.last_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = self.clock.every(self.KEY, self.interval_ms, self._tick, delay_ms=self.interval_ms)
+
+    def stop(self):
+        if self._task is not None:
+            self.clock.cancel(self.KEY)
+            self._task = None
+
+    def _tick(self, now):
+        # Saat yarım kare erken de çalıştırabilir; erken çalışma gecikme değil
+        self.last_lag_ms = max(0.0, (now - self._task.due) * 1000)
+        self.metrics.observe('loop_lag', self.last_lag_ms)
+
+
+class MetricsExporter:
+    """Anlık görüntüyü interval saniyede bir path'e yazar (.prom ise Prometheus metni)"""
+
+    def __init__(self, metrics, path=METRICS_PATH, interval=15.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name='metrics-exporter')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Son bir kez yazıp durur"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self.flush()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        if self.path.endswith('.prom'):
+            data = self.metrics.to_prometheus()
+        else:
+            data = json.dumps(self.metrics.snapshot(), indent=2)
+        try:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"Metrikler yazılamadı: {e}")
@@ -0,0 +1,275 @@
+"""Gönderilmemiş mesajların diskteki kalıcı giden kutusu.
+
+Her mesaj gönderilmeden önce bir idempotency anahtarıyla SQLite'a (WAL,
+synchronous=NORMAL) yazılır; uygulama kapansa, çökse ya da bağlantı kopsa
+da kaybolmaz. put() UI thread'inden çağrıldığı için commit fsync beklemez;
+yalnızca işletim sistemi çökerse son mesajlar kaybolabilir. Teslim edilen
+mesaj silinir. Geçici hatada mesaj kutuda kalır ve rastgele sapmalı üstel
+geri çekilmeyle (jitter) tekrar denenir.
+Bağlantı geri geldiğinde bekleyen her şey toplu gönderim uç noktasıyla
+(/chat/batch) parti parti gönderilir. Server aynı anahtarı ikinci kez
+işlemez; tekrar denemeler çift yanıt üretmez.
+"""
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+from chat_client import error_text, is_retryable
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_PATH = os.path.join(os.path.expanduser('~'), '.phantomai', 'outbox.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    key TEXT PRIMARY KEY,
+    message TEXT NOT NULL,
+    created REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (next_attempt, created);
+"""
+
+
+class Outbox:
+    """Kalıcı mesaj kuyruğu ve teslim thread'i.
+
+    send_batch([(anahtar, mesaj)]) teslimi yapar ve _post_batch biçiminde
+    sonuç listesi döndürür; is_available() False iken gönderim denenmez.
+    Callback'ler teslim thread'inden çağrılır:
+    on_delivered(anahtar, mesaj, yanıt), on_failed(anahtar, mesaj, hata),
+    on_change(stats).
+
+    put(claimed=True) ile eklenen mesajın ilk denemesini çağıran yapar;
+    ack()/defer() gelene kadar teslim thread'i ona dokunmaz.
+    """
+
+    # Uyanışlar arası en kısa bekleme; zamanı geçmiş satırlar thread'i döndürmesin
+    MIN_WAIT = 0.05
+
+    def __init__(self, send_batch, is_available=lambda: True, path=OUTBOX_PATH, batch_size=32,
+                 base_delay=1.0, max_delay=60.0, max_attempts=20, on_delivered=None, on_failed=None,
+                 on_change=None):
+        self.send_batch = send_batch
+        self.is_available = is_available
+        self.path = path
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.on_delivered = on_delivered or (lambda key, message, reply: None)
+        self.on_failed = on_failed or (lambda key, message, error: None)
+        self.on_change = on_change or (lambda stats: None)
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # WAL + NORMAL: commit uygulama çökmesine dayanıklı, fsync beklemez
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.depth = self._db.execute('SELECT COUNT(*) FROM outbox').fetchone()[0]
+
+        self.delivered = 0
+        self.retries = 0
+        self.last_flush = None
+        self._claimed = set()
+        self._flush_all = False
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Kuyruk --------------------------------------------------------------
+
+    def put(self, message, claimed=False):
+        """Mesajı diske yazar, idempotency anahtarını döndürür"""
+        key = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._db.execute('INSERT INTO outbox (key, message, created, next_attempt) VALUES (?, ?, ?, ?)',
+                             (key, message, now, now))
+            self._db.commit()
+            self.depth += 1
+            if claimed:
+                self._claimed.add(key)
+        self._changed()
+        if not claimed:
+            self._wake.set()
+        return key
+
+    def ack(self, key):
+        """Teslim edildi (ya da kalıcı olarak başarısız): kutudan çıkar"""
+        with self._lock:
+            deleted = self._db.execute('DELETE FROM outbox WHERE key = ?', (key,)).rowcount
+            self._db.commit()
+            self.depth -= deleted
+            self._claimed.discard(key)
+        self._changed()
+
+    def defer(self, key, error):
+        """Geçici hata: geri çekilme süresi sonra tekrar denenir"""
+        with self._lock:
+            row = self._db.execute('SELECT attempts FROM outbox WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                attempts = row[0] + 1
+                self._db.execute('UPDATE outbox SET attempts = ?, next_attempt = ?, last_error = ? WHERE key = ?',
+                                 (attempts, time.time() + self.backoff(attempts), error, key))
+                self._db.commit()
+            self._claimed.discard(key)
+        self.retries += 1
+        self._changed()
+        self._wake.set()
+
+    def release(self, key):
+        """Çağıranın denemesi yarıda kaldı (ör. kapanış); mesaj kutuda bekler"""
+        with self._lock:
+            self._claimed.discard(key)
+
+    def backoff(self, attempts):
+        """Üstel geri çekilme; [yarısı, tamamı] aralığında rastgele (aynı anda
+        kopan istemciler aynı anda geri gelmesin)"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def pending(self):
+        """Kutudaki mesajlar, eklenme sırasıyla: [(anahtar, mesaj, deneme)]"""
+        with self._lock:
+            return self._db.execute('SELECT key, message, attempts FROM outbox ORDER BY created').fetchall()
+
+    def _due(self, flush_all):
+        now = time.time()
+        with self._lock:
+            if flush_all:
+                rows = self._db.execute('SELECT key, message, attempts FROM outbox ORDER BY created').fetchall()
+            else:
+                rows = self._db.execute('SELECT key, message, attempts FROM outbox WHERE next_attempt <= ? '
+                                        'ORDER BY created', (now,)).fetchall()
+            rows = [row for row in rows if row[0] not in self._claimed][:self.batch_size]
+            self._claimed.update(row[0] for row in rows)
+        return rows
+
+    def _next_wakeup(self):
+        """Gönderimde olmayan (claim edilmemiş) ilk satırın zamanına kalan süre"""
+        with self._lock:
+            rows = self._db.execute('SELECT key, next_attempt FROM outbox ORDER BY next_attempt LIMIT ?',
+                                    (len(self._claimed) + 1,)).fetchall()
+            due = next((next_attempt for key, next_attempt in rows if key not in self._claimed), None)
+        if due is None:
+            return None
+        return max(self.MIN_WAIT, due - time.time())
+
+    # --- Teslim thread'i ---------------------------------------------------------
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True, name='outbox')
+            self._thread.start()
+        return self
+
+    def kick(self, flush_all=False):
+        """Beklemeden gönderim dener; flush_all ise geri çekilmedeki mesajlar da"""
+        if flush_all:
+            self._flush_all = True
+        self._wake.set()
+
+    def _run(self):
+        offline_wait = self.base_delay
+        while not self._stop.is_set():
+            timeout = self._next_wakeup()
+            # Kutu boşsa put()/kick() uyandırır; yine de ara sıra kontrol et
+            self._wake.wait(30.0 if timeout is None else min(timeout, 30.0))
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if not self.depth:
+                continue
+            if not self.is_available():
+                # Bağlantı gelince kick() uyandırır; gelmezse geri çekilerek bak
+                self._wake.wait(offline_wait)
+                offline_wait = min(self.max_delay, offline_wait * 2)
+                continue
+            offline_wait = self.base_delay
+            flush_all, self._flush_all = self._flush_all, False
+            try:
+                self.flush(flush_all)
+            except Exception as e:
+                logger.exception(f"Giden kutusu gönderimi başarısız: {e}")
+
+    def flush(self, flush_all=False):
+        """Zamanı gelen (flush_all ise tüm) mesajları parti parti gönderir"""
+        started = time.perf_counter()
+        delivered = 0
+        while not self._stop.is_set():
+            rows = self._due(flush_all)
+            if not rows:
+                break
+            items = [(key, message) for key, message, _ in rows]
+            try:
+                results = self.send_batch(items)
+            except Exception as e:
+                logger.info(f"Giden kutusu: {len(items)} mesaj gönderilemedi: {e}")
+                for key, message, attempts in rows:
+                    self._retry_or_fail(key, message, attempts, error_text(e), is_retryable(e))
+                break
+            delivered += self._apply(rows, results)
+            if any('reply' not in result for result in results) or len(results) < len(rows):
+                # Server partiyi yarıda bıraktı; kalanlar geri çekilmeyle beklesin
+                break
+
+        if delivered:
+            elapsed = time.perf_counter() - started
+            self.last_flush = {'messages': delivered, 'ms': round(elapsed * 1000, 1),
+                               'per_s': round(delivered / elapsed, 1) if elapsed else None}
+            logger.info(f"Giden kutusu boşaltıldı: {delivered} mesaj, {self.last_flush['ms']} ms")
+            self._changed()
+        return delivered
+
+    def _apply(self, rows, results):
+        by_key = {result.get('key'): result for result in results if isinstance(result, dict)}
+        delivered = 0
+        for key, message, attempts in rows:
+            result = by_key.get(key)
+            if result is not None and 'reply' in result:
+                self.ack(key)
+                self.delivered += 1
+                delivered += 1
+                self.on_delivered(key, message, result['reply'])
+            elif result is not None:
+                self._retry_or_fail(key, message, attempts, result.get('error', 'Gönderilemedi'),
+                                    result.get('retryable', True))
+            else:
+                self._retry_or_fail(key, message, attempts, 'Parti yarıda kaldı', True)
+        return delivered
+
+    def _retry_or_fail(self, key, message, attempts, error, retryable):
+        if retryable and attempts + 1 < self.max_attempts:
+            self.defer(key, error)
+        else:
+            self.ack(key)
+            self.on_failed(key, message, error)
+
+    def stats(self):
+        return {'depth': self.depth, 'delivered': self.delivered, 'retries': self.retries,
+                'last_flush': self.last_flush}
+
+    def _changed(self):
+        try:
+            self.on_change(self.stats())
+        except Exception as e:
+            logger.debug(f"Giden kutusu bildirimi başarısız: {e}")
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        with self._lock:
+            self._db.close()
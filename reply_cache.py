@@ -0,0 +1,134 @@
+"""/chat yanıtları için istemci tarafı önbellek.
+
+Anahtar: yanıtı veren server'ın URL'si + konuşma durumu (bkz.
+conversation; aynı soru farklı konuşmada farklı yanıt alır) + normalize
+edilmiş mesaj. Bellekte boyut ve TTL
+sınırlı bir LRU katmanı, isteğe bağlı olarak da yeniden başlatmalarda
+kalıcı bir SQLite katmanı vardır.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+REPLY_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.phantomai', 'replies.db')
+
+
+def normalize_message(message):
+    """Büyük/küçük harf ve boşluk farklarını yok sayar"""
+    return ' '.join(message.casefold().split())
+
+
+def cache_key(server_url, message, state=None):
+    raw = f"{server_url.rstrip('/')}\0{state or ''}\0{normalize_message(message)}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class ReplyCache:
+    """İki katmanlı (bellek LRU + disk) yanıt önbelleği; thread-safe.
+
+    stats(): hits, disk_hits, misses, evictions (LRU'dan taşan),
+    expirations (TTL'i dolan) sayaçları.
+    """
+
+    def __init__(self, max_entries=256, ttl=24 * 3600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+        self._db = None
+        if disk_path:
+            try:
+                if os.path.dirname(disk_path):
+                    os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                self._db = sqlite3.connect(disk_path, check_same_thread=False)
+                self._db.execute('CREATE TABLE IF NOT EXISTS replies '
+                                 '(key TEXT PRIMARY KEY, reply TEXT NOT NULL, stored REAL NOT NULL)')
+                self._db.execute('DELETE FROM replies WHERE stored < ?', (time.time() - ttl,))
+                self._db.commit()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"Disk yanıt önbelleği açılamadı: {e}")
+                self._db = None
+
+    def get(self, server_url, message, state=None):
+        """Geçerli önbellek kaydı varsa yanıt metni, yoksa None"""
+        key = cache_key(server_url, message, state)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                reply, stored = entry
+                if now - stored <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.counters['hits'] += 1
+                    return reply
+                del self._entries[key]
+                self.counters['expirations'] += 1
+
+            if self._db is not None:
+                row = self._db.execute('SELECT reply, stored FROM replies WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    reply, stored = row
+                    if now - stored <= self.ttl:
+                        self._remember(key, reply, stored)
+                        self.counters['disk_hits'] += 1
+                        return reply
+                    self._db.execute('DELETE FROM replies WHERE key = ?', (key,))
+                    self._db.commit()
+                    self.counters['expirations'] += 1
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, server_url, message, reply, state=None):
+        key = cache_key(server_url, message, state)
+        stored = time.time()
+        with self._lock:
+            self._remember(key, reply, stored)
+            if self._db is not None:
+                try:
+                    self._db.execute('INSERT OR REPLACE INTO replies (key, reply, stored) VALUES (?, ?, ?)',
+                                     (key, reply, stored))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"Yanıt önbelleğe yazılamadı: {e}")
+
+    def _remember(self, key, reply, stored):
+        self._entries[key] = (reply, stored)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def invalidate(self, server_url, message, state=None):
+        """Tek mesajın kaydını her iki katmandan siler"""
+        key = cache_key(server_url, message, state)
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute('DELETE FROM replies WHERE key = ?', (key,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM replies')
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counters, entries=len(self._entries))
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,304 @@
+"""Birden fazla PhantomAI server'ından oluşan havuz.
+
+/chat istekleri en düşük gecikmeli ve en az yüklü üyeye yönlendirilir.
+Her üyenin bir devre kesicisi vardır: art arda hata veren üye havuzdan
+çıkarılır, bir süre sonra tek bir deneme isteğiyle (yarı açık) geri alınır.
+Tekrarlanabilir istekler hata durumunda başka bir üyede yeniden denenir.
+Her üyenin sağlığı kendi HealthMonitor'ıyla izlenir.
+"""
+import logging
+import threading
+import time
+
+from chat_client import ChatError
+from health_monitor import DEGRADED, DOWN, HEALTHY, UNKNOWN, HealthMonitor
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """failure_threshold ardışık hatada açılır; reset_timeout sonra yarı açık.
+
+    Yarı açıkken yalnızca bir deneme isteğine izin verilir: başarılıysa
+    kapanır, başarısızsa bekleme süresi iki katına çıkarak (en fazla
+    max_reset_timeout) yeniden açılır. Thread-safe değildir; ServerPool
+    kendi kilidiyle korur.
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=5.0, max_reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def available(self):
+        """İstek gönderilebilir mi (durumu değiştirmez)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return not self._trial
+
+    def allow(self):
+        """İstek için izin alır; açık süresi dolmuşsa yarı açığa geçer"""
+        if not self.available():
+            return False
+        if self.state != CLOSED:
+            self.state = HALF_OPEN
+            self._trial = True
+        return True
+
+    def record_success(self):
+        self.state = CLOSED
+        self.failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self._trial = False
+
+
+class PoolMember:
+    __slots__ = ('url', 'seed_ms', 'in_flight', 'chat_ewma_ms', 'requests', 'errors', 'breaker', 'monitor')
+
+    def __init__(self, url, seed_ms, breaker, monitor):
+        self.url = url
+        self.seed_ms = seed_ms
+        self.in_flight = 0
+        self.chat_ewma_ms = None
+        self.requests = 0
+        self.errors = 0
+        self.breaker = breaker
+        self.monitor = monitor
+
+    def latency_ms(self):
+        """Sağlık yoklamalarının EWMA'sı; henüz yoksa keşifte ölçülen gecikme"""
+        ewma = self.monitor.ewma_ms
+        return ewma if ewma is not None else self.seed_ms
+
+    def usable(self):
+        return not self.monitor.is_down() and self.breaker.available()
+
+    def score(self):
+        # Gecikme, üzerindeki bekleyen istek sayısıyla ölçeklenir: yavaşlayan
+        # üyede istekler birikir ve trafik kendiliğinden diğerlerine kayar
+        return self.latency_ms() * (1 + self.in_flight)
+
+    def stats(self):
+        health = self.monitor.stats()
+        return {
+            'url': self.url,
+            'state': health['state'],
+            'breaker': self.breaker.state,
+            'latency_ms': round(self.latency_ms(), 1),
+            'p95_ms': health['p95_ms'],
+            'chat_ewma_ms': None if self.chat_ewma_ms is None else round(self.chat_ewma_ms, 1),
+            'in_flight': self.in_flight,
+            'requests': self.requests,
+            'errors': self.errors,
+        }
+
+
+class ServerPool:
+    """Sağlıklı server'ların havuzu; HealthMonitor ile aynı dış API'ye sahiptir.
+
+    probe(url, timeout) -> bool üyelerin sağlık yoklaması için kullanılır.
+    on_change(state, stats) havuzun genel durumu değişince monitor
+    thread'lerinden çağrılır; durum, en iyi üyenin durumudur (biri bile
+    sağlıklıysa HEALTHY, hepsi erişilemezse DOWN).
+    """
+
+    DEFAULT_LATENCY_MS = 100.0
+
+    def __init__(self, probe, on_change, max_attempts=2, breaker_threshold=3,
+                 breaker_reset=5.0, monitor_options=None):
+        self.probe = probe
+        self.on_change = on_change
+        self.max_attempts = max_attempts
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.monitor_options = monitor_options or {}
+        self.members = {}
+        self.state = UNKNOWN
+        self._lock = threading.Lock()
+
+    # --- Üyeler ------------------------------------------------------------
+
+    def set_members(self, servers):
+        """servers: [(url, gecikme_ms ya da None)]; listede olmayan üyeler çıkarılır"""
+        servers = [(url.rstrip('/'), latency) for url, latency in servers]
+        wanted = {url for url, _ in servers}
+        with self._lock:
+            removed = [member for url, member in self.members.items() if url not in wanted]
+            for member in removed:
+                del self.members[member.url]
+            added = []
+            for url, latency in servers:
+                member = self.members.get(url)
+                if member is None:
+                    member = self._new_member(url, latency)
+                    self.members[url] = member
+                    added.append(member)
+                elif latency is not None:
+                    member.seed_ms = latency
+        for member in removed:
+            member.monitor.stop()
+        for member in added:
+            member.monitor.set_target(member.url)
+        if removed or added:
+            logger.info(f"Server havuzu: {self.urls()}")
+            self._update_state()
+
+    def add(self, url, latency_ms=None):
+        self.set_members([(m.url, None) for m in self.members.values()] + [(url, latency_ms)])
+
+    def _new_member(self, url, latency_ms):
+        breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        monitor = HealthMonitor(self.probe, lambda state, stats: self._update_state(),
+                                **self.monitor_options)
+        seed = latency_ms if latency_ms is not None else self.DEFAULT_LATENCY_MS
+        return PoolMember(url, seed, breaker, monitor)
+
+    def urls(self):
+        with self._lock:
+            return [member.url for member in self._ranked()]
+
+    def _ranked(self):
+        return sorted(self.members.values(), key=lambda member: (not member.usable(), member.score()))
+
+    # --- Yönlendirme -------------------------------------------------------
+
+    def acquire(self, exclude=()):
+        """En iyi üyeyi seçip yükünü bir artırır; uygun üye yoksa None.
+
+        Sağlık izleyicisinin erişilemez gördüğü üyeler seçilmez: hepsi
+        erişilemezken istek zaman aşımını beklemeden hemen başarısız olur;
+        izleyici üyeyi yeniden ayakta görünce trafik geri döner.
+        """
+        with self._lock:
+            candidates = [m for m in self.members.values() if m.url not in exclude and not m.monitor.is_down()]
+            for member in sorted(candidates, key=PoolMember.score):
+                if member.breaker.allow():
+                    member.in_flight += 1
+                    member.requests += 1
+                    return member
+        return None
+
+    def release(self, member, ok, elapsed_ms=None):
+        with self._lock:
+            member.in_flight -= 1
+            if ok:
+                member.breaker.record_success()
+                if elapsed_ms is not None:
+                    member.chat_ewma_ms = (elapsed_ms if member.chat_ewma_ms is None
+                                           else 0.8 * member.chat_ewma_ms + 0.2 * elapsed_ms)
+            else:
+                member.errors += 1
+                member.breaker.record_failure()
+                if member.breaker.state == OPEN:
+                    logger.warning(f"Devre açıldı: {member.url} ({member.breaker.reset_timeout:.0f} sn)")
+        if not ok:
+            member.monitor.probe_now()
+
+    def call(self, fn, *args, idempotent=True):
+        """fn(url, *args)'ı en iyi üyede çalıştırır, sonucunu döndürür.
+
+        Hata olursa ve istek tekrarlanabilirse (idempotent True ya da True
+        döndüren bir callable) en fazla max_attempts'e kadar başka üyelerde
+        yeniden denenir.
+        """
+        tried = set()
+        last_error = None
+        for _ in range(self.max_attempts):
+            member = self.acquire(exclude=tried)
+            if member is None:
+                break
+            tried.add(member.url)
+            started = time.perf_counter()
+            try:
+                result = fn(member.url, *args)
+            except Exception as e:
+                self.release(member, False)
+                last_error = e
+                retry = idempotent() if callable(idempotent) else idempotent
+                if not retry:
+                    raise
+                logger.warning(f"{member.url} başarısız, başka server deneniyor: {e}")
+                continue
+            self.release(member, True, (time.perf_counter() - started) * 1000)
+            return result
+
+        if last_error is not None:
+            raise last_error
+        raise ChatError("Kullanılabilir server yok", retryable=True)
+
+    # --- Genel durum (HealthMonitor ile aynı API) ---------------------------
+
+    def _update_state(self):
+        # Birden fazla monitor thread'inden çağrılır: karşılaştırma ve atama
+        # aynı kilit altında, her değişiklik bir kez bildirilir
+        with self._lock:
+            states = {member.monitor.state for member in self.members.values()}
+            if HEALTHY in states:
+                state = HEALTHY
+            elif DEGRADED in states:
+                state = DEGRADED
+            elif states == {DOWN}:
+                state = DOWN
+            else:
+                state = UNKNOWN
+            if state == self.state:
+                return
+            self.state = state
+        try:
+            self.on_change(state, self.stats())
+        except Exception as e:
+            logger.error(f"Havuz durumu bildirilemedi: {e}")
+
+    def is_down(self):
+        with self._lock:
+            return bool(self.members) and not any(m.usable() for m in self.members.values())
+
+    def probe_now(self):
+        for member in list(self.members.values()):
+            member.monitor.probe_now()
+
+    def stop(self):
+        with self._lock:
+            members = list(self.members.values())
+        for member in members:
+            member.monitor.stop()
+
+    def stats(self):
+        """En iyi üyenin gecikmeleri ve üye başına ayrıntılar"""
+        with self._lock:
+            ranked = self._ranked()
+            members = [member.stats() for member in ranked]
+        best = members[0] if members else {}
+        return {
+            'state': self.state,
+            'url': best.get('url'),
+            'ewma_ms': best.get('latency_ms'),
+            'p95_ms': best.get('p95_ms'),
+            'available': sum(1 for m in members if m['state'] != DOWN and m['breaker'] != OPEN),
+            'size': len(members),
+            'members': members,
+        }
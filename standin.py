@@ -0,0 +1,438 @@
+"""Yerel PhantomAI stand-in server'ı.
+
+Gerçek server olmadan istemciyi denemek ve ölçmek için kullanılır.
+Yavaş (delay ± jitter), hata veren (error_rate), büyük yanıtlı
+(payload_size) ve kara delik (blackhole: bağlantıyı kabul eder ama hiç
+yanıt vermez) host'lar simüle edilebilir. stream_chunks > 1 ise
+"stream": true isteklerine yanıt NDJSON parçalarıyla akıtılır.
+compression açıkken /health desteklenen kodlamaları bildirir; istek
+gövdeleri gzip/zstd ve MessagePack olabilir, yanıtlar Accept ve
+Accept-Encoding'e göre kodlanır. conversation_id taşıyan mesajlar konuşma
+oturumu olarak işlenir (bkz. conversation); yanıt önceki turu anar.
+Idempotency-Key başlığı (ya da /chat/batch öğesindeki key) daha önce
+görüldüyse mesaj yeniden işlenmez, ilk yanıt döner.
+DiscoveryResponder, UDP keşif sorgularına server adına yanıt verir.
+
+    python standin.py serve --port 8001 --delay 0.2 --jitter 0.05 --error-rate 0.01 --announce
+    python standin.py discovery --udp
+"""
+import json
+import logging
+import random
+import socket
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import codec
+from conversation import ConversationStore, compact
+from discovery import ANNOUNCE_TYPE, DISCOVER_TYPE, DISCOVERY_PORT, PROTOCOL_VERSION
+
+STANDIN_VERSION = 'standin-1'
+
+logger = logging.getLogger(__name__)
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Başlık ve gövde ayrı yazılır; Nagle + gecikmeli ACK her yanıta ~40 ms ekler
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_payload(self, payload, status=200):
+        """Accept/Accept-Encoding'e göre MessagePack ve/veya sıkıştırılmış yanıt"""
+        fmt = 'msgpack' if codec.MSGPACK in self._accepted_formats() else 'json'
+        body, content_type = codec.dumps(payload, fmt)
+        encoding = self._response_encoding()
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if encoding is not None and len(body) >= self.server.compress_min:
+            body = codec.compress(body, encoding)
+            self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_json(self):
+        """İstek gövdesi; desteklenmeyen kodlama/format için ValueError"""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        encoding = self.headers.get('Content-Encoding', '').strip().lower()
+        content_type = self.headers.get('Content-Type', codec.JSON)
+        if not self.server.compression and (encoding or content_type.startswith(codec.MSGPACK)):
+            raise ValueError("Bu server sıkıştırma/MessagePack kabul etmiyor")
+        inflater = codec.decompressor(encoding)
+        if inflater is not None:
+            body = inflater.decompress(body)
+        return codec.loads(body or b'{}', content_type)
+
+    def _accepted_formats(self):
+        if not self.server.compression:
+            return []
+        return [f for f in codec.parse_accept(self.headers.get('Accept')) if f == codec.MSGPACK and codec.msgpack]
+
+    def _response_encoding(self):
+        if not self.server.compression:
+            return None
+        accepted = codec.parse_accept(self.headers.get('Accept-Encoding'))
+        return next((e for e in self.server.encodings if e in accepted), None)
+
+    def _stall(self):
+        """Kara delik ve yavaş host simülasyonu; yanıt verilecekse True"""
+        if self.server.blackhole:
+            time.sleep(self.server.blackhole_seconds)
+            self.close_connection = True
+            return False
+        delay = self.server.response_delay()
+        if delay:
+            time.sleep(delay)
+        return True
+
+    def do_GET(self):
+        if not self._stall():
+            return
+        if self.path == '/health':
+            self.send_json(self.server.health_payload())
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    def do_POST(self):
+        if not self._stall():
+            return
+        if self.path in ('/chat', '/chat/batch'):
+            with self.server.lock:
+                self.server.active += 1
+            try:
+                if self.path == '/chat':
+                    self.handle_chat()
+                else:
+                    self.handle_batch()
+            finally:
+                with self.server.lock:
+                    self.server.active -= 1
+        else:
+            self.send_json({'error': 'not found'}, status=404)
+
+    def handle_chat(self):
+        try:
+            request = self.read_json()
+        except ValueError as e:
+            self.send_json({'detail': str(e)}, status=415)
+            return
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self.send_json({'detail': 'simüle edilmiş hata'}, status=500)
+            return
+        message = request.get('message', '')
+        key = self.headers.get('Idempotency-Key')
+        reply = self.server.replayed(key)
+        if reply is not None:
+            self.send_payload({'reply': reply})
+            return
+        conversation_id = request.get('conversation_id')
+        context = None
+        if conversation_id is not None:
+            context, conflict = self.server.conversations.begin(request)
+            if conflict is not None:
+                self.send_json(conflict, status=409)
+                return
+        reply = self.server.reply_for(message, context)
+        self.server.remember(key, reply)
+        if conversation_id is not None:
+            self.server.conversations.finish(conversation_id, message, reply)
+        if request.get('stream') and self.server.stream_chunks > 1:
+            self.stream_ndjson(reply, self.server.stream_chunks)
+        else:
+            self.send_payload({'reply': reply})
+
+    def handle_batch(self):
+        """{"messages": [{"key", "message"}], ...} -> {"results": [...]}, sırayla.
+
+        Oturum alanları tüm parti için bir kez doğrulanır; her mesaj bir tur
+        olarak eklenir. Simüle edilen hata yalnızca o mesajı etkiler.
+        """
+        try:
+            request = self.read_json()
+        except ValueError as e:
+            self.send_json({'detail': str(e)}, status=415)
+            return
+        conversation_id = request.get('conversation_id')
+        context = None
+        if conversation_id is not None:
+            context, conflict = self.server.conversations.begin(request)
+            if conflict is not None:
+                self.send_json(conflict, status=409)
+                return
+        results = []
+        for item in request.get('messages', []):
+            key, message = item.get('key'), item.get('message', '')
+            reply = self.server.replayed(key)
+            if reply is None:
+                if self.server.error_rate and random.random() < self.server.error_rate:
+                    results.append({'key': key, 'error': 'simüle edilmiş hata', 'retryable': True})
+                    continue
+                reply = self.server.reply_for(message, context)
+                self.server.remember(key, reply)
+                if conversation_id is not None:
+                    self.server.conversations.finish(conversation_id, message, reply)
+                    context = (context + [(message, reply)])[-self.server.conversations.context_turns:]
+            results.append({'key': key, 'reply': reply})
+        self.send_payload({'results': results})
+
+    def stream_ndjson(self, reply, chunks):
+        """Yanıtı chunked transfer ile {"token": ...} satırları olarak gönderir"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        encoding = self._response_encoding()
+        if encoding is not None:
+            self.send_header('Content-Encoding', encoding)
+        self.end_headers()
+        compressor = _StreamCompressor(encoding)
+        size = max(1, -(-len(reply) // chunks))
+        for start in range(0, len(reply), size):
+            line = json.dumps({'token': reply[start:start + size]}).encode() + b'\n'
+            self._write_chunk(compressor.flush_line(line))
+        self._write_chunk(compressor.finish())
+        self.wfile.write(b'0\r\n\r\n')
+
+    def _write_chunk(self, data):
+        if data:
+            self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+            self.wfile.flush()
+
+
+class _StreamCompressor:
+    """Akıştaki her satırı ayrı flush'lar; istemci parçayı beklemeden açabilir"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'gzip':
+            self._obj = zlib.compressobj(6, zlib.DEFLATED, 31)
+        elif encoding == 'zstd':
+            self._obj = codec.zstandard.ZstdCompressor(level=3).compressobj()
+        else:
+            self._obj = None
+
+    def flush_line(self, data):
+        if self._obj is None:
+            return data
+        if self.encoding == 'gzip':
+            return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+        return self._obj.compress(data) + self._obj.flush(codec.zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._obj.flush() if self._obj is not None else b''
+
+
+class StandinServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, delay=0.0, blackhole=False, blackhole_seconds=30,
+                 jitter=0.0, payload_size=0, error_rate=0.0, stream_chunks=1, compression=True,
+                 compress_min=256):
+        self.compression = compression
+        self.compress_min = compress_min
+        self.conversations = ConversationStore()
+        # Idempotency anahtarı -> yanıt; en eskiler max_replays aşılınca atılır
+        self.replays = {}
+        self.max_replays = 10000
+        # İşlenmekte olan /chat istekleri; UDP yanıtında yük olarak bildirilir
+        self.active = 0
+        self.lock = threading.Lock()
+        self.responder = None
+        # deflate yalnızca istemci tarafında (eski server'lar için) açılır
+        self.encodings = [e for e in codec.supported_encodings() if e != 'deflate']
+        self.delay = delay
+        self.jitter = jitter
+        self.payload_size = payload_size
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.blackhole = blackhole
+        self.blackhole_seconds = blackhole_seconds
+        super().__init__((host, port), StandinHandler)
+
+    def response_delay(self):
+        if not self.jitter:
+            return self.delay
+        return max(0.0, self.delay + random.uniform(-self.jitter, self.jitter))
+
+    def health_payload(self):
+        payload = {'status': 'ok', 'features': ['batch', 'idempotency']}
+        if self.compression:
+            payload.update(encodings=self.encodings, formats=codec.supported_formats())
+        return payload
+
+    def replayed(self, key):
+        """Bu anahtarla daha önce verilmiş yanıt ya da None"""
+        if key is None:
+            return None
+        with self.lock:
+            return self.replays.get(key)
+
+    def remember(self, key, reply):
+        if key is None:
+            return
+        with self.lock:
+            self.replays[key] = reply
+            while len(self.replays) > self.max_replays:
+                self.replays.pop(next(iter(self.replays)))
+
+    def reply_for(self, message, context=None):
+        """payload_size verilmişse yanıt o kadar karaktere doldurulur.
+
+        context (önceki turlar) verilirse yanıt son soruyu anar; bağlamın
+        server'a ulaştığı buradan görülür.
+        """
+        reply = f"Stand-in yanıtı: {message}"
+        if context:
+            reply += f" (önceki soru: {compact(context[-1][0], 40)}, bağlam {len(context)} tur)"
+        if len(reply) < self.payload_size:
+            filler = "lorem ipsum dolor sit amet "
+            reply += ' ' + (filler * (self.payload_size // len(filler) + 1))[:self.payload_size - len(reply) - 1]
+        return reply
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def announce(self, port=DISCOVERY_PORT):
+        """UDP keşif sorgularına bu server adına yanıt vermeye başlar"""
+        if self.responder is None:
+            self.responder = DiscoveryResponder(self, port).start()
+        return self
+
+    def stop(self):
+        if self.responder is not None:
+            self.responder.stop()
+        self.shutdown()
+        self.server_close()
+
+
+class DiscoveryResponder:
+    """UDP keşif sorgularını dinler ve server'ın URL, yük ve sürümüyle yanıtlar.
+
+    Aynı makinedeki birden fazla responder aynı portu paylaşabilir
+    (SO_REUSEPORT); yayın paketleri hepsine ulaşır.
+    """
+
+    def __init__(self, server, port=DISCOVERY_PORT, version=STANDIN_VERSION):
+        self.server = server
+        self.port = port
+        self.version = version
+        self.queries = 0
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._sock.bind(('', port))
+        self._stopped = False
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True, name='discovery-responder').start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._sock.close()
+
+    def _run(self):
+        while not self._stopped:
+            try:
+                data, addr = self._sock.recvfrom(2048)
+            except OSError:
+                return
+            try:
+                query = json.loads(data)
+            except ValueError:
+                continue
+            if not isinstance(query, dict) or query.get('type') != DISCOVER_TYPE:
+                continue
+            self.queries += 1
+            answer = json.dumps({'type': ANNOUNCE_TYPE, 'v': PROTOCOL_VERSION, 'nonce': query.get('nonce'),
+                                 'url': self.server.url, 'load': self.server.active,
+                                 'version': self.version}).encode()
+            try:
+                self._sock.sendto(answer, addr)
+            except OSError as e:
+                logger.debug(f"Keşif yanıtı gönderilemedi: {e}")
+
+
+def start_discovery_lab(port=8001, healthy='127.0.0.200', slow=('127.0.0.10',),
+                        blackholes=('127.0.0.20', '127.0.0.21'), slow_delay=3.0, udp_port=None):
+    """127.0.0.0/24 içinde sağlıklı, yavaş ve kara delik host'lar başlatır.
+
+    udp_port verilirse sağlıklı host UDP keşif sorgularına da yanıt verir.
+    """
+    servers = [StandinServer(healthy, port).start()]
+    if udp_port:
+        servers[0].announce(udp_port)
+    servers += [StandinServer(host, port, delay=slow_delay).start() for host in slow]
+    servers += [StandinServer(host, port, blackhole=True).start() for host in blackholes]
+    return servers
+
+
+def run_discovery_lab(port=8001, udp_port=None):
+    from discovery import discover_sync
+
+    servers = start_discovery_lab(port, udp_port=udp_port)
+    try:
+        # localhost'u atla: lab'ın sağlıklı host'u UDP ya da /24 taramasıyla bulunmalı
+        return discover_sync(networks=['127.0.0.0/24'], ports=(port,), local_candidates=(),
+                             udp_port=udp_port)
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description='PhantomAI stand-in server')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help='Stand-in server çalıştır')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8001)
+    serve.add_argument('--delay', type=float, default=0.0, help='Yanıt gecikmesi (sn)')
+    serve.add_argument('--jitter', type=float, default=0.0, help='Gecikmeye eklenen ± rastgele sapma (sn)')
+    serve.add_argument('--payload-size', type=int, default=0, help='Yanıt uzunluğu (karakter)')
+    serve.add_argument('--error-rate', type=float, default=0.0, help='HTTP 500 dönen /chat oranı (0-1)')
+    serve.add_argument('--stream-chunks', type=int, default=1, help='Akışlı yanıttaki parça sayısı')
+    serve.add_argument('--no-compression', action='store_true',
+                       help='Sıkıştırma/MessagePack bildirme (eski server gibi düz JSON)')
+    serve.add_argument('--announce', action='store_true', help='UDP keşif sorgularına yanıt ver')
+    serve.add_argument('--udp-port', type=int, default=DISCOVERY_PORT)
+
+    lab = sub.add_parser('discovery', help='Yavaş/kara delik host\'larla keşif denemesi')
+    lab.add_argument('--port', type=int, default=18001)
+    lab.add_argument('--udp', action='store_true', help='Sağlıklı host UDP keşfine yanıt versin')
+    lab.add_argument('--udp-port', type=int, default=DISCOVERY_PORT + 1)
+
+    args = parser.parse_args()
+    if args.command == 'serve':
+        server = StandinServer(args.host, args.port, delay=args.delay, jitter=args.jitter,
+                               payload_size=args.payload_size, error_rate=args.error_rate,
+                               stream_chunks=args.stream_chunks, compression=not args.no_compression)
+        if args.announce:
+            server.announce(args.udp_port)
+        logger.info(f"Stand-in server: {server.url}")
+        server.serve_forever()
+    else:
+        print(run_discovery_lab(args.port, args.udp_port if args.udp else None))
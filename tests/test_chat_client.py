@@ -0,0 +1,247 @@
+import json
+import threading
+import time
+
+import pytest
+
+from chat_client import ChatClient, ChatError, WorkerPool, iter_sse, iter_text_lines, parse_token
+
+
+def split(body, size):
+    return [body[start:start + size] for start in range(0, len(body), size)]
+
+
+def every_split(body):
+    """body'nin 1 byte'tan tek parçaya kadar tüm eşit bölünüşleri"""
+    return [split(body, size) for size in range(1, len(body) + 1)]
+
+
+def sse(chunks, encoding='utf-8'):
+    return list(iter_sse(iter_text_lines(chunks, encoding)))
+
+
+class FakeRaw:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def stream(self, amount, decode_content=True):
+        yield from self.chunks
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, chunks, content_type):
+        self.headers = {'Content-Type': content_type}
+        self.encoding = 'utf-8'
+        self.raw = FakeRaw(chunks)
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def stream(chunks, content_type):
+    """_stream_chat'i sahte bir yanıtla çalıştırır; (dönen metin, on_chunk parçaları)"""
+    client = ChatClient()
+    response = FakeResponse(chunks, content_type)
+    client._request = lambda *args, **kwargs: (response, 0)
+    received = []
+    reply = client._stream_chat('http://server', 'merhaba', received.append)
+    assert response.closed
+    return reply, received
+
+
+# --- iter_text_lines ---------------------------------------------------------
+
+@pytest.mark.parametrize('chunks', every_split(b'bir\r\niki\n\nuc'))
+def test_lines_survive_any_chunking(chunks):
+    assert list(iter_text_lines(chunks)) == ['bir', 'iki', '', 'uc']
+
+
+@pytest.mark.parametrize('chunks', every_split('çığ → ş\n'.encode('utf-8')))
+def test_multibyte_character_split_across_chunks(chunks):
+    assert list(iter_text_lines(chunks)) == ['çığ → ş']
+
+
+def test_truncated_character_is_replaced_not_raised():
+    assert list(iter_text_lines([b'ok\n', 'ş'.encode('utf-8')[:1]])) == ['ok', '�']
+
+
+def test_declared_charset_is_used():
+    assert list(iter_text_lines(split('ağ\n'.encode('iso-8859-9'), 1), 'iso-8859-9')) == ['ağ']
+
+
+# --- iter_sse ------------------------------------------------------------------
+
+@pytest.mark.parametrize('chunks', every_split(b'data: bir\n\ndata:iki\r\n\r\ndata: [DONE]\n\n'))
+def test_sse_events_split_across_chunks(chunks):
+    assert sse(chunks) == ['bir', 'iki', '[DONE]']
+
+
+def test_sse_multiline_data_is_joined():
+    body = b'data: ilk satir\ndata:\ndata:  girintili\n\n'
+    assert sse([body]) == ['ilk satir\n\n girintili']
+
+
+def test_sse_ignores_comments_and_other_fields():
+    body = b': ping\nevent: token\nid: 7\nretry: 100\ndata: x\n\n\n\n'
+    assert sse([body]) == ['x']
+
+
+def test_sse_last_event_without_blank_line():
+    assert sse([b'data: a\n\ndata: b']) == ['a', 'b']
+
+
+# --- parse_token -----------------------------------------------------------------
+
+@pytest.mark.parametrize('data, expected', [
+    ('{"token": "a"}', 'a'),
+    ('{"delta": "b"}', 'b'),
+    ('{"reply": "c"}', 'c'),
+    ('{"token": "a", "reply": "c"}', 'a'),
+    ('{"done": true}', ''),
+    ('"json dizesi"', 'json dizesi'),
+    ('duz metin', 'duz metin'),
+    ('[1, 2]', '[1, 2]'),
+    ('42', '42'),
+    ('{"token": "\\u00e7"}', 'ç'),
+])
+def test_parse_token(data, expected):
+    assert parse_token(data) == expected
+
+
+def test_parse_token_server_error():
+    with pytest.raises(ChatError, match='bozuk'):
+        parse_token('{"error": "bozuk"}')
+
+
+# --- _stream_chat ------------------------------------------------------------------
+
+SSE_BODY = ''.join(f"data: {json.dumps({'token': token})}\n\n" for token in ('Mer', 'ha', 'ba ', 'çığ'))
+
+
+@pytest.mark.parametrize('size', [1, 2, 5, 64])
+def test_sse_stream_stops_at_done(size):
+    body = (SSE_BODY + 'data: [DONE]\n\ndata: {"token": "fazla"}\n\n').encode('utf-8')
+    reply, received = stream(split(body, size), 'text/event-stream')
+    assert reply == 'Merhaba çığ'
+    assert received == ['Mer', 'ha', 'ba ', 'çığ']
+
+
+@pytest.mark.parametrize('size', [1, 3, 64])
+def test_ndjson_stream(size):
+    lines = [{'token': 'bir '}, {'delta': 'iki'}, {'done': True}]
+    body = ''.join(json.dumps(line) + '\n' for line in lines).encode('utf-8')
+    reply, received = stream(split(body, size), 'application/x-ndjson; charset=utf-8')
+    assert reply == 'bir iki'
+    assert received == ['bir ', 'iki']
+
+
+def test_ndjson_error_line_raises():
+    with pytest.raises(ChatError, match='kota'):
+        stream([b'{"token": "a"}\n{"error": "kota"}\n'], 'application/x-ndjson')
+
+
+@pytest.mark.parametrize('size', [1, 2, 64])
+def test_plain_text_stream_keeps_split_characters(size):
+    reply, received = stream(split('şğü ok'.encode('utf-8'), size), 'text/plain')
+    assert reply == 'şğü ok'
+    assert '�' not in ''.join(received)
+
+
+def test_non_streaming_json_fallback():
+    reply, received = stream(split(b'{"reply": "tek parca"}', 4), 'application/json')
+    assert reply == 'tek parca'
+    assert received == ['tek parca']
+
+
+# --- WorkerPool ------------------------------------------------------------------
+
+@pytest.fixture
+def pool():
+    pool = WorkerPool(max_workers=3, name='test-pool')
+    yield pool
+    pool.shutdown()
+
+
+def wait_idle(pool, timeout=2.0):
+    """Tüm thread'ler iş beklemeye dönene kadar bekler"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with pool._lock:
+            if pool._idle == len(pool._threads) and pool._pending == 0:
+                return
+        time.sleep(0.001)
+    raise AssertionError(f"havuz boşa çıkmadı: idle={pool._idle} threads={len(pool._threads)}")
+
+
+def test_sequential_work_reuses_one_thread(pool):
+    for i in range(200):
+        assert pool.submit(lambda x: x * 2, i).result(timeout=2) == i * 2
+    assert len(pool._threads) == 1
+    wait_idle(pool)
+
+
+def test_threads_never_exceed_cap(pool):
+    release = threading.Event()
+    running = []
+    lock = threading.Lock()
+
+    def task(i):
+        with lock:
+            running.append(threading.current_thread().name)
+        release.wait(2)
+        return i
+
+    futures = [pool.submit(task, i) for i in range(10)]
+    deadline = time.monotonic() + 2
+    while len(running) < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    time.sleep(0.02)
+    assert len(running) == 3
+    assert len(pool._threads) == 3
+    release.set()
+    assert [f.result(timeout=2) for f in futures] == list(range(10))
+    assert len(pool._threads) == 3
+    assert set(running) == {t.name for t in pool._threads}
+    wait_idle(pool)
+
+
+def test_idle_threads_are_counted_after_bursts(pool):
+    # Sıralı kullanım ve hatalar sayaçları kaydırmamalı: ardından gelen
+    # paralel iş yine max_workers thread'de aynı anda çalışabilmeli
+    for _ in range(50):
+        pool.submit(lambda: None).result(timeout=2)
+    with pytest.raises(ValueError):
+        pool.submit(int, 'x').result(timeout=2)
+    wait_idle(pool)
+
+    for _ in range(3):
+        barrier = threading.Barrier(3, timeout=2)
+        futures = [pool.submit(barrier.wait) for _ in range(3)]
+        assert sorted(f.result(timeout=3) for f in futures) == [0, 1, 2]
+        wait_idle(pool)
+    assert len(pool._threads) == 3
+
+
+def test_shutdown_cancels_queued_work():
+    pool = WorkerPool(max_workers=1)
+    release = threading.Event()
+    started = threading.Event()
+
+    def block():
+        started.set()
+        release.wait(2)
+
+    running = pool.submit(block)
+    started.wait(2)
+    queued = pool.submit(lambda: 'hiç')
+    pool.shutdown()
+    release.set()
+    running.result(timeout=2)
+    assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: None)
+    pool._threads[0].join(2)
+    assert not pool._threads[0].is_alive()
@@ -0,0 +1,90 @@
+import gzip
+import json
+
+import pytest
+
+import codec
+from codec import COMPRESS_MIN_BYTES, JSON, PLAIN, BodyReader, Codec, parse_accept
+
+
+class FakeRaw:
+    def __init__(self, body, size=7):
+        self.body = body
+        self.size = size
+
+    def stream(self, amount, decode_content=True):
+        for start in range(0, len(self.body), self.size):
+            yield self.body[start:start + self.size]
+
+
+class FakeResponse:
+    def __init__(self, body, headers):
+        self.headers = headers
+        self.raw = FakeRaw(body)
+
+
+def test_negotiate_without_capabilities_is_plain():
+    assert Codec.negotiate(None) is PLAIN
+    assert Codec.negotiate("ok") is PLAIN
+    assert not Codec.negotiate({'status': 'ok'}).compact
+
+
+def test_negotiate_picks_best_common_options(monkeypatch):
+    monkeypatch.setattr(codec, 'zstandard', None)
+    monkeypatch.setattr(codec, 'msgpack', None)
+    chosen = Codec.negotiate({'encodings': ['zstd', 'gzip'], 'formats': ['msgpack', 'json']})
+    assert (chosen.format, chosen.encoding) == ('json', 'gzip')
+    # deflate açılabilir ama istek sıkıştırması için seçilmez
+    assert Codec.negotiate({'encodings': ['deflate']}).encoding is None
+
+
+def test_negotiate_prefers_zstd_and_msgpack_when_installed(monkeypatch):
+    monkeypatch.setattr(codec, 'zstandard', object())
+    monkeypatch.setattr(codec, 'msgpack', object())
+    chosen = Codec.negotiate({'encodings': ['gzip', 'zstd'], 'formats': ['json', 'msgpack']})
+    assert (chosen.format, chosen.encoding) == ('msgpack', 'zstd')
+    assert chosen.accept_headers()['Accept'].startswith(codec.MSGPACK)
+
+
+def test_parse_accept_drops_zero_quality():
+    assert parse_accept("gzip;q=0.5, ZSTD, br;q=0") == ['gzip', 'zstd']
+    assert parse_accept(None) == []
+
+
+def test_small_bodies_are_not_compressed():
+    body, headers = Codec('json', 'gzip').encode({'message': 'selam'})
+    assert 'Content-Encoding' not in headers
+    assert json.loads(body) == {'message': 'selam'}
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'deflate'])
+def test_compressed_round_trip(encoding):
+    payload = {'message': 'ğüşiöç ' * COMPRESS_MIN_BYTES}
+    body, headers = Codec('json', encoding).encode(payload)
+    assert headers['Content-Encoding'] == encoding
+    assert headers['Content-Type'] == JSON
+    assert len(body) < len(json.dumps(payload).encode())
+
+    reader = BodyReader(FakeResponse(body, headers))
+    assert reader.json() == payload
+    assert reader.wire_bytes == len(body)
+    assert reader.body_bytes == len(json.dumps(payload).encode())
+
+
+def test_gzip_is_deterministic():
+    data = b'x' * 4096
+    assert codec.compress(data, 'gzip') == codec.compress(data, 'gzip')
+    assert gzip.decompress(codec.compress(data, 'gzip')) == data
+
+
+def test_unknown_encoding_is_rejected():
+    with pytest.raises(ValueError):
+        BodyReader(FakeResponse(b'{}', {'Content-Encoding': 'br'})).read()
+
+
+def test_msgpack_round_trip():
+    pytest.importorskip('msgpack')
+    payload = {'message': 'selam', 'seq': 3}
+    body, headers = Codec('msgpack').encode(payload)
+    assert headers['Content-Type'] == codec.MSGPACK
+    assert BodyReader(FakeResponse(body, headers)).json() == payload
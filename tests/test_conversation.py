@@ -0,0 +1,137 @@
+import json
+
+from chat_client import ChatClient
+from conversation import INITIAL_STATE, Conversation, ConversationStore, chain_state, compact
+
+
+def play(conversation, store, message, reply):
+    """Bir turu istemci ve server tarafında birlikte işler"""
+    context, conflict = store.begin(dict(conversation.fields(), message=message))
+    assert conflict is None
+    store.finish(conversation.id, message, reply)
+    conversation.commit(message, reply)
+    return context
+
+
+def test_commit_chains_state():
+    conversation = Conversation()
+    conversation.commit("selam", "merhaba")
+    conversation.commit("nasılsın", "iyiyim")
+    expected = chain_state(chain_state(INITIAL_STATE, "selam", "merhaba"), "nasılsın", "iyiyim")
+    assert conversation.fields()['seq'] == 2
+    assert conversation.fields()['state'] == expected
+
+
+def test_chain_depends_on_order_and_boundaries():
+    assert chain_state(INITIAL_STATE, "ab", "c") != chain_state(INITIAL_STATE, "a", "bc")
+    one = chain_state(chain_state(INITIAL_STATE, "a", "1"), "b", "2")
+    other = chain_state(chain_state(INITIAL_STATE, "b", "2"), "a", "1")
+    assert one != other
+
+
+def test_server_keeps_context_in_step():
+    conversation, store = Conversation(context_turns=2), ConversationStore(context_turns=2)
+    play(conversation, store, "1", "a")
+    play(conversation, store, "2", "b")
+    assert play(conversation, store, "3", "c") == [("1", "a"), ("2", "b")]
+    assert store.context_size(conversation.id) == 2
+
+
+def test_unknown_conversation_resyncs_with_recent_turns():
+    conversation = Conversation(context_turns=2)
+    for i in range(3):
+        conversation.commit(f"m{i}", f"r{i}")
+    store = ConversationStore(context_turns=2)
+
+    _, conflict = store.begin(dict(conversation.fields(), message="yeni"))
+    assert conflict == {'detail': 'resync', 'seq': None, 'state': None}
+
+    fields = conversation.resync_fields(conflict['seq'], conflict['state'])
+    assert fields['resync'] == {'since': None, 'turns': [["m1", "r1"], ["m2", "r2"]]}
+    context, conflict = store.begin(dict(fields, message="yeni"))
+    assert conflict is None and context == [("m1", "r1"), ("m2", "r2")]
+    assert conversation.stats()['resyncs'] == 1
+
+
+def test_stale_server_gets_only_missing_turns():
+    conversation, store = Conversation(), ConversationStore()
+    play(conversation, store, "1", "a")
+    # Server'a ulaşmayan iki tur (ör. başka bir server yanıtladı)
+    conversation.commit("2", "b")
+    conversation.commit("3", "c")
+
+    _, conflict = store.begin(dict(conversation.fields(), message="4"))
+    assert conflict['seq'] == 1
+    fields = conversation.resync_fields(conflict['seq'], conflict['state'])
+    assert fields['resync'] == {'since': 1, 'turns': [["2", "b"], ["3", "c"]]}
+
+    context, conflict = store.begin(dict(fields, message="4"))
+    assert conflict is None
+    assert context == [("1", "a"), ("2", "b"), ("3", "c")]
+
+
+def test_diverged_server_state_resends_full_context():
+    conversation, store = Conversation(), ConversationStore()
+    play(conversation, store, "1", "a")
+    store.finish(conversation.id, "başka", "geçmiş")
+
+    _, conflict = store.begin(dict(conversation.fields(), message="2"))
+    fields = conversation.resync_fields(conflict['seq'], conflict['state'])
+    assert fields['resync']['since'] is None
+    assert fields['resync']['turns'] == [["1", "a"]]
+
+
+def test_resync_compacts_long_texts():
+    conversation = Conversation()
+    conversation.commit("x" * 5000, "kısa")
+    turn = conversation.resync_fields()['resync']['turns'][0]
+    assert turn[0] == compact("x" * 5000) and len(turn[0]) < 2100
+    assert turn[1] == "kısa"
+
+
+class FakeRaw:
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, amount, decode_content=True):
+        yield self.body
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.headers = {'Content-Type': 'application/json'}
+        self.raw = FakeRaw(json.dumps(data).encode())
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """Stand-in server'ın konuşma mantığını HTTP'siz çalıştırır"""
+
+    def __init__(self, store):
+        self.store = store
+        self.requests = []
+
+    def post(self, url, data=None, headers=None, **kwargs):
+        request = json.loads(data)
+        self.requests.append(request)
+        _, conflict = self.store.begin(request)
+        if conflict is not None:
+            return FakeResponse(409, conflict)
+        return FakeResponse(200, {'reply': 'ok'})
+
+
+def test_request_resyncs_once_after_409():
+    conversation = Conversation()
+    conversation.commit("önceki", "yanıt")
+    session = FakeSession(ConversationStore())
+    client = ChatClient(max_workers=1)
+    client._sessions['http://server'] = session
+    response, sent = client._request('http://server', {'message': 'yeni'}, conversation=conversation)
+    assert response.status_code == 200
+    assert len(session.requests) == 2
+    assert 'resync' not in session.requests[0]
+    assert session.requests[1]['resync'] == {'since': None, 'turns': [["önceki", "yanıt"]]}
+    assert sent == sum(len(json.dumps(request).encode()) for request in session.requests)
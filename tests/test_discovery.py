@@ -0,0 +1,253 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+import discovery
+from discovery import DiscoveryCache, _first_cached, _healthy_cached
+
+
+def test_cache_ranks_recent_then_fast_then_frequent(tmp_path):
+    cache = DiscoveryCache(path=str(tmp_path / 'servers.json'))
+    now = time.time()
+    cache.entries = {
+        'http://eski': {'last_seen': now - 7200, 'latency_ms': 1.0, 'successes': 50},
+        'http://yavas': {'last_seen': now, 'latency_ms': 90.0, 'successes': 1},
+        'http://hizli': {'last_seen': now, 'latency_ms': 5.0, 'successes': 1},
+        'http://sik': {'last_seen': now, 'latency_ms': 5.0, 'successes': 9},
+        'http://olcumsuz': {'last_seen': now, 'latency_ms': None, 'successes': 3},
+    }
+    assert cache.ranked() == ['http://sik', 'http://hizli', 'http://yavas', 'http://olcumsuz', 'http://eski']
+
+
+def test_record_success_evicts_lowest_ranked(tmp_path):
+    cache = DiscoveryCache(path=str(tmp_path / 'servers.json'), max_entries=2)
+    cache.record_success('http://a', 10.0)
+    cache.record_success('http://b', 30.0)
+    cache.record_success('http://c', 20.0)
+    assert set(cache.entries) == {'http://a', 'http://c'}
+
+
+def test_cache_round_trips_through_json(tmp_path):
+    path = str(tmp_path / 'alt' / 'servers.json')
+    cache = DiscoveryCache(path=path)
+    cache.record_success('http://a', 12.34)
+    cache.record_success('http://a')
+
+    with open(path, encoding='utf-8') as f:
+        stored = json.load(f)
+    assert stored['http://a']['successes'] == 2
+    reloaded = DiscoveryCache(path=path)
+    assert reloaded.entries == cache.entries
+    assert reloaded.entries['http://a']['latency_ms'] == 12.3
+
+
+def test_stale_entries_are_dropped_on_load(tmp_path):
+    path = tmp_path / 'servers.json'
+    path.write_text(json.dumps({
+        'http://yeni': {'last_seen': time.time(), 'successes': 1, 'latency_ms': None},
+        'http://eski': {'last_seen': time.time() - 100, 'successes': 1, 'latency_ms': None},
+    }))
+    assert list(DiscoveryCache(path=str(path), max_age=50).entries) == ['http://yeni']
+
+
+@pytest.mark.parametrize('content', ['{bozuk', '[1, 2]', '"metin"'])
+def test_corrupt_cache_file_starts_empty(tmp_path, content):
+    path = tmp_path / 'servers.json'
+    path.write_text(content)
+    cache = DiscoveryCache(path=str(path))
+    assert cache.entries == {}
+    cache.record_success('http://a', 1.0)
+    assert list(DiscoveryCache(path=str(path)).entries) == ['http://a']
+
+
+@pytest.fixture
+def fake_health(monkeypatch):
+    """url -> (süre_sn, gecikme ya da None); gecikme None ise sağlıksız"""
+    plan = {}
+
+    async def timed_health(url, timeout):
+        delay, latency = plan[url]
+        await asyncio.sleep(delay)
+        return latency
+
+    monkeypatch.setattr(discovery, '_timed_health', timed_health)
+    return plan
+
+
+def test_top_ranked_healthy_candidate_wins_within_grace(fake_health):
+    fake_health.update({'http://a': (0.05, 50.0), 'http://b': (0.0, 1.0)})
+    assert asyncio.run(_first_cached(['http://a', 'http://b'], 1.0, grace=0.5)) == ('http://a', 50.0)
+
+
+def test_slow_top_candidate_does_not_delay_startup(fake_health):
+    fake_health.update({'http://olu': (5.0, None), 'http://b': (0.0, 1.0), 'http://c': (0.0, None)})
+    started = time.perf_counter()
+    healthy = asyncio.run(_healthy_cached(['http://olu', 'http://b', 'http://c'], 1.0, 0.05, first_only=True))
+    assert healthy == {1: 1.0}
+    assert time.perf_counter() - started < 1.0
+
+
+def test_all_healthy_candidates_within_window(fake_health):
+    fake_health.update({'http://a': (0.0, 3.0), 'http://b': (0.02, 2.0), 'http://c': (2.0, 1.0)})
+    healthy = asyncio.run(_healthy_cached(['http://a', 'http://b', 'http://c'], 1.0, 0.2, first_only=False))
+    assert healthy == {0: 3.0, 1: 2.0}
+
+
+def test_no_healthy_candidates(fake_health):
+    fake_health.update({'http://a': (0.0, None)})
+    assert asyncio.run(_first_cached(['http://a'], 1.0)) == (None, None)
+
+
+class FakeNetwork:
+    """tcp_open/_timed_health yerine geçer; eşzamanlı bağlantıları sayar"""
+
+    def __init__(self, healthy=(), delay=0.01):
+        self.healthy = set(healthy)
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.opened = []
+        self.timeouts = set()
+
+    async def tcp_open(self, host, port, timeout):
+        self.timeouts.add(timeout)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        self.opened.append(host)
+        return host in self.healthy
+
+    async def timed_health(self, url, timeout):
+        return 1.0
+
+
+@pytest.fixture
+def network(monkeypatch):
+    def make(**kwargs):
+        fake = FakeNetwork(**kwargs)
+        monkeypatch.setattr(discovery, 'tcp_open', fake.tcp_open)
+        monkeypatch.setattr(discovery, '_timed_health', fake.timed_health)
+        return fake
+    return make
+
+
+def sweep(hosts, concurrency, collect_window=None):
+    result = discovery.DiscoveryResult()
+    found = asyncio.run(discovery._first_healthy(hosts, (8001,), concurrency, 0.3, 1.0, result, collect_window))
+    return found, result
+
+
+HOSTS = [f"10.0.0.{i}" for i in range(1, 255)]
+
+
+def test_sweep_respects_concurrency_bound(network):
+    fake = network(delay=0.005)
+    found, result = sweep(HOSTS, concurrency=16)
+    assert found == []
+    assert fake.max_active == 16
+    assert result.hosts_probed == len(HOSTS)
+    assert fake.timeouts == {0.3}
+
+
+def test_sweep_stops_at_first_healthy_host(network):
+    fake = network(healthy={'10.0.0.20'}, delay=0.02)
+    found, result = sweep(HOSTS, concurrency=8)
+    assert found == [('http://10.0.0.20:8001', 1.0)]
+    # Kalan host'lar iptal edildi; tüm ağ taranmadı
+    assert result.hosts_probed < 40
+    assert len(fake.opened) < 40
+    assert result.open_ports == 1 and 'first_open' in result.timings
+
+
+def test_sweep_finishes_within_time_budget(network):
+    network(delay=0.01)
+    started = time.perf_counter()
+    sweep(HOSTS, concurrency=64)
+    # 254 host / 64 eşzamanlı ≈ 4 tur * 10 ms; sıralı tarama 2.5 sn sürerdi
+    assert time.perf_counter() - started < 0.5
+
+
+def test_sweep_collects_servers_within_window(network):
+    network(healthy={'10.0.0.3', '10.0.0.200'}, delay=0.01)
+    found, _ = sweep(HOSTS, concurrency=254, collect_window=0.5)
+    assert {url for url, _ in found} == {'http://10.0.0.3:8001', 'http://10.0.0.200:8001'}
+
+
+def announcement(**overrides):
+    message = {'type': discovery.ANNOUNCE_TYPE, 'v': 1, 'nonce': 'n1', 'url': 'http://10.0.0.5:8001',
+               'load': 3, 'version': '1.2'}
+    message.update(overrides)
+    return json.dumps({k: v for k, v in message.items() if v is not None}).encode()
+
+
+@pytest.mark.parametrize('data, expected', [
+    (announcement(), ('http://10.0.0.5:8001', {'load': 3, 'version': '1.2'})),
+    (announcement(url='http://10.0.0.5:8001/'), ('http://10.0.0.5:8001', {'load': 3, 'version': '1.2'})),
+    # Tüm arayüzleri dinleyen server: adres paketin kaynağından, port varsayılandan
+    (announcement(url='http://0.0.0.0'), ('http://192.168.1.9:8001', {'load': 3, 'version': '1.2'})),
+    (announcement(url='http://0.0.0.0:9000'), ('http://192.168.1.9:9000', {'load': 3, 'version': '1.2'})),
+    (announcement(load=None, version=None), ('http://10.0.0.5:8001', {'load': None, 'version': None})),
+    (b'{bozuk json', None),
+    (b'\xff\xfe', None),
+    (b'[1, 2]', None),
+    (announcement(url=None), None),
+    (announcement(url=8001), None),
+    (announcement(type='phantomai.discover'), None),
+    (announcement(type='baska.protokol'), None),
+    (announcement(nonce='eski'), None),
+])
+def test_parse_announcement(data, expected):
+    assert discovery.parse_announcement(data, ('192.168.1.9', 48001), 'n1') == expected
+
+
+class Responder(asyncio.DatagramProtocol):
+    """Sorguya verilen (url, yük) listesiyle yanıt veren stand-in server"""
+
+    def __init__(self, servers):
+        self.servers = servers
+        self.queries = []
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query = json.loads(data)
+        self.queries.append(query)
+        self.transport.sendto(announcement(nonce='yanlis'), addr)
+        for url, load in self.servers:
+            self.transport.sendto(announcement(nonce=query['nonce'], url=url, load=load), addr)
+
+
+async def udp_round_trip(servers, **kwargs):
+    loop = asyncio.get_running_loop()
+    transport, responder = await loop.create_datagram_endpoint(lambda: Responder(servers),
+                                                               local_addr=('127.0.0.1', 0))
+    try:
+        port = transport.get_extra_info('sockname')[1]
+        answers = await discovery.udp_discover(port, targets=('127.0.0.1',), **kwargs)
+    finally:
+        transport.close()
+    return answers, responder
+
+
+def test_udp_discover_over_loopback():
+    answers, responder = asyncio.run(udp_round_trip(
+        [('http://10.0.0.1:8001', 50), ('http://10.0.0.2:8001', 0)], timeout=1.0, window=0.1))
+    assert len(responder.queries) == 1
+    assert responder.queries[0]['type'] == discovery.DISCOVER_TYPE
+    # Yükü düşük olan önce; yanlış nonce'lu yanıt atıldı
+    assert [url for url, _, _ in answers] == ['http://10.0.0.2:8001', 'http://10.0.0.1:8001']
+    assert answers[0][2] == {'load': 0, 'version': '1.2'}
+    assert all(latency >= 0 for _, latency, _ in answers)
+
+
+def test_udp_discover_times_out_without_answers():
+    started = time.perf_counter()
+    answers, _ = asyncio.run(udp_round_trip([], timeout=0.1, window=0.01))
+    assert answers == []
+    assert time.perf_counter() - started < 0.5
@@ -0,0 +1,98 @@
+import pytest
+
+import health_monitor
+from health_monitor import DEGRADED, DOWN, HEALTHY, UNKNOWN, HealthMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def perf_counter(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(health_monitor.time, 'perf_counter', clock.perf_counter)
+    return clock
+
+
+def make_monitor(clock, **kwargs):
+    """Yoklama sonucu ve süresi results'tan gelir: (sağlıklı mı, ms)"""
+    changes = []
+    results = []
+
+    def probe(url, timeout):
+        healthy, ms = results.pop(0)
+        clock.now += ms / 1000
+        if healthy is None:
+            raise OSError("bağlantı reddedildi")
+        return healthy
+
+    kwargs.setdefault('slow_ms', 500.0)
+    monitor = HealthMonitor(probe, lambda state, stats: changes.append(state), **kwargs)
+    monitor.url = 'http://server'
+    return monitor, results, changes
+
+
+def run(monitor, results, *probes):
+    results.extend(probes)
+    for _ in probes:
+        monitor._probe_once(monitor.url)
+
+
+def test_healthy_degraded_down_transitions(clock):
+    monitor, results, changes = make_monitor(clock, down_after=2)
+    run(monitor, results, (True, 20))
+    assert monitor.state == HEALTHY
+    run(monitor, results, (True, 800))
+    assert monitor.state == DEGRADED
+    # Tek hata henüz erişilemez sayılmaz
+    run(monitor, results, (False, 10))
+    assert monitor.state == DEGRADED and monitor.failures == 1
+    run(monitor, results, (None, 10))
+    assert monitor.state == DOWN and monitor.last_error == "bağlantı reddedildi"
+    assert changes == [HEALTHY, DEGRADED, DOWN]
+
+
+def test_first_failure_from_unknown_is_down(clock):
+    monitor, results, changes = make_monitor(clock)
+    assert monitor.state == UNKNOWN
+    run(monitor, results, (False, 10))
+    assert changes == [DOWN]
+
+
+def test_down_backoff_grows_and_is_capped(clock):
+    monitor, results, _ = make_monitor(clock, down_after=2, down_min_interval=1.0, down_max_interval=8.0)
+    intervals = []
+    for _ in range(7):
+        run(monitor, results, (False, 10))
+        intervals.append(monitor.interval())
+    assert intervals == [1.0, 1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+
+
+def test_recovery_resets_interval(clock):
+    monitor, results, changes = make_monitor(clock, healthy_interval=30.0, down_max_interval=60.0)
+    run(monitor, results, *[(False, 10)] * 6)
+    assert monitor.interval() > monitor.down_min_interval
+    run(monitor, results, (True, 40))
+    assert monitor.state == HEALTHY and monitor.failures == 0
+    assert monitor.interval() == 30.0
+    assert monitor.ewma_ms == pytest.approx(40.0)
+    assert changes == [DOWN, HEALTHY]
+
+
+def test_latency_stats(clock):
+    monitor, results, _ = make_monitor(clock, slow_ms=10_000)
+    run(monitor, results, *[(True, ms) for ms in (100, 200, 300)])
+    assert monitor.ewma_ms == pytest.approx(0.8 * (0.8 * 100 + 0.2 * 200) + 0.2 * 300)
+    assert monitor.p95_ms() == pytest.approx(300)
+
+
+def test_result_for_old_target_is_ignored(clock):
+    monitor, results, changes = make_monitor(clock)
+    results.append((False, 10))
+    monitor._probe_once('http://eski')
+    assert monitor.failures == 0 and changes == []
@@ -0,0 +1,99 @@
+import time
+
+import pytest
+
+from history_store import ID_BLOCK, HistoryStore
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        store = HistoryStore(path=str(tmp_path / 'history.db'), flush_interval=0.01, **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+
+
+def test_two_instances_reserve_disjoint_ids(make_store):
+    first, second = make_store(), make_store()
+    a = [first.append("Siz", f"a{i}") for i in range(5)]
+    b = [second.append("Siz", f"b{i}") for i in range(5)]
+    assert not set(a) & set(b)
+    first.close()
+    second.close()
+
+    reopened = make_store()
+    texts = [row[2] for row in reopened.after(0, 100)]
+    assert sorted(texts) == sorted([f"a{i}" for i in range(5)] + [f"b{i}" for i in range(5)])
+
+
+def test_new_block_is_reserved_when_exhausted(make_store):
+    store = make_store()
+    other = make_store()
+    ids = [store.append("Siz", str(i)) for i in range(ID_BLOCK + 1)]
+    assert ids == sorted(ids)
+    # İkinci blok diğer örneğin bloğunun ardından gelir
+    assert ids[-1] >= other.next_id + ID_BLOCK - 1
+
+
+def wait_for_spare(store, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while store._spare is None and time.monotonic() < deadline:
+        time.sleep(0.001)
+    return store._spare
+
+
+def test_next_block_is_reserved_ahead_by_writer(make_store):
+    store = make_store()
+    first_end = store._block_end
+    for i in range(ID_BLOCK // 2 - 1):
+        store.append("Siz", str(i))
+    assert store._spare is None
+    store.append("Siz", "yarı")
+    spare = wait_for_spare(store)
+    assert spare is not None and spare[0] >= first_end
+
+    # Okuma bağlantısı blok geçişinde de veritabanına yazmaz
+    statements = []
+    store._db.set_trace_callback(statements.append)
+    ids = [store.append("Siz", str(i)) for i in range(ID_BLOCK)]
+    assert ids[-1] >= spare[0]
+    assert not [sql for sql in statements if not sql.lstrip().upper().startswith('SELECT')]
+
+
+def test_exhausted_block_waits_for_writer(make_store):
+    # Tek tek yazılan binlerce işlem kuyruktayken de blok isteği öne geçer
+    store = make_store(batch_size=1)
+    ids = [store.append("Siz", str(i)) for i in range(3 * ID_BLOCK)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    store.close()
+    assert [row[0] for row in make_store().after(0, 3 * ID_BLOCK)] == ids
+
+
+def test_reopen_skips_past_used_ids(make_store):
+    store = make_store()
+    used = store.append("Siz", "eski")
+    store.close()
+    assert make_store().append("Siz", "yeni") > used
+
+
+def test_before_and_after_page_across_gaps(make_store):
+    store = make_store()
+    ids = [store.append("Siz", str(i)) for i in range(3)]
+    store.close()
+    store = make_store()
+    ids += [store.append("Siz", str(i)) for i in range(3, 6)]
+    store.close()
+    store = make_store()
+    # Kapanışta bırakılan blok sonu id boşluğu olarak kalır
+    assert ids[3] - ids[2] > 1
+
+    assert [row[0] for row in store.before(ids[4], 3)] == ids[1:4]
+    assert [row[0] for row in store.after(ids[1], 3)] == ids[2:5]
+    assert [row[0] for row in store.after(ids[0], 10, until=ids[4])] == ids[1:4]
@@ -0,0 +1,66 @@
+import time
+
+from markup import Formatter, code_ranges, signature
+
+
+def texts(body, ranges):
+    """Aralıkları başlangıç sırasıyla gövdeden kesilmiş metinlere çevirir"""
+    ranges = sorted(ranges, key=lambda r: r[1])
+    lines = body.split('\n')
+    offsets = [sum(len(line) + 1 for line in lines[:i]) for i in range(len(lines))]
+    return [(tag, body[offsets[l1] + c1:offsets[l2] + c2]) for tag, (l1, c1), (l2, c2) in ranges]
+
+
+def test_plain_text_has_no_ranges():
+    assert code_ranges("düz metin\nikinci satır") == []
+
+
+def test_inline_code():
+    body = "şunu çalıştır: `pip install x` ve `y`"
+    assert texts(body, code_ranges(body)) == [('code_inline', "`pip install x`"), ('code_inline', "`y`")]
+
+
+def test_fenced_block():
+    body = "önce\n```python\nprint(1)\nprint(2)\n```\nsonra `z`"
+    assert texts(body, code_ranges(body)) == [
+        ('code_fence', "```python"),
+        ('code_block', "print(1)\nprint(2)\n"),
+        ('code_fence', "```"),
+        ('code_inline', "`z`"),
+    ]
+
+
+def test_backticks_inside_block_are_not_inline():
+    body = "```\na `b` c\n```"
+    assert [tag for tag, _ in texts(body, code_ranges(body))] == ['code_fence', 'code_block', 'code_fence']
+
+
+def test_empty_block_has_only_fences():
+    body = "```\n```"
+    assert [tag for tag, _, _ in code_ranges(body)] == ['code_fence', 'code_fence']
+
+
+def test_unclosed_block_runs_to_end():
+    body = "akış:\n  ```sh\necho a\necho b"
+    assert texts(body, code_ranges(body)) == [
+        ('code_fence', "  ```sh"),
+        ('code_block', "echo a\necho b"),
+    ]
+
+
+def test_formatter_computes_in_background_and_caches():
+    posted = []
+    formatter = Formatter(lambda fn, *args: posted.append((fn, args)))
+    try:
+        body = "`x`"
+        assert formatter.ranges(1, body, 'callback') is None
+        deadline = time.monotonic() + 2
+        while not posted:
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        assert posted == [('callback', (1, signature(body), code_ranges(body)))]
+        assert formatter.ranges(1, body, 'callback') == code_ranges(body)
+        # Metin değişince önbellek geçersiz
+        assert formatter.ranges(1, body + " `y`", 'callback') is None
+    finally:
+        formatter.close()
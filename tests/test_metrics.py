@@ -0,0 +1,180 @@
+import json
+import threading
+
+import pytest
+
+from animation import Task
+from metrics import BUCKETS, Histogram, LoopLagMeter, Metrics, MetricsExporter
+
+
+def parse_prometheus(text):
+    """{örnek adı: değer} ve {metrik: tür}"""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split()
+            types[name] = kind
+        elif line:
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples, types
+
+
+# --- Histogram ---------------------------------------------------------------
+
+def test_empty_histogram_snapshot():
+    assert Histogram().snapshot() == {'count': 0, 'sum_ms': 0.0, 'p50_ms': None, 'p95_ms': None,
+                                      'p99_ms': None, 'max_ms': None}
+
+
+@pytest.mark.parametrize('value, bucket', [
+    (0, 0),
+    (1, 0),          # kova sınırı dahil (le)
+    (1.01, 1),
+    (10, 3),
+    (30000, len(BUCKETS) - 1),
+    (30000.5, len(BUCKETS)),
+])
+def test_histogram_bucket_bounds(value, bucket):
+    h = Histogram()
+    h.observe(value)
+    assert h.counts.index(1) == bucket
+
+
+def test_histogram_percentiles():
+    h = Histogram()
+    for value in range(1, 101):
+        h.observe(value)
+    snap = h.snapshot()
+    assert snap['count'] == 100
+    assert snap['sum_ms'] == 5050
+    assert (snap['p50_ms'], snap['p95_ms'], snap['p99_ms'], snap['max_ms']) == (51, 96, 100, 100)
+
+
+def test_histogram_percentiles_use_recent_window_only():
+    h = Histogram(recent=4)
+    for value in (1000, 1000, 1, 2, 3, 4):
+        h.observe(value)
+    snap = h.snapshot()
+    assert snap['count'] == 6
+    assert snap['sum_ms'] == 2010
+    assert snap['max_ms'] == 4
+    # Kovalar tüm gözlemleri tutar
+    assert sum(h.counts) == 6
+
+
+# --- to_prometheus -------------------------------------------------------------
+
+def test_prometheus_histogram_is_cumulative():
+    metrics = Metrics()
+    for value in (0.5, 3, 3, 40, 99999):
+        metrics.observe('network', value)
+    samples, types = parse_prometheus(metrics.to_prometheus())
+
+    assert types['phantomai_network_ms'] == 'histogram'
+    buckets = [samples[f'phantomai_network_ms_bucket{{le="{bound}"}}'] for bound in BUCKETS + ('+Inf',)]
+    assert buckets == sorted(buckets)
+    assert samples['phantomai_network_ms_bucket{le="1"}'] == 1
+    assert samples['phantomai_network_ms_bucket{le="5"}'] == 3
+    assert samples['phantomai_network_ms_bucket{le="50"}'] == 4
+    assert samples['phantomai_network_ms_bucket{le="30000"}'] == 4
+    assert samples['phantomai_network_ms_bucket{le="+Inf"}'] == 5
+    assert samples['phantomai_network_ms_count'] == 5
+    assert samples['phantomai_network_ms_sum'] == pytest.approx(100045.5)
+
+
+def test_prometheus_counters_and_gauges():
+    metrics = Metrics()
+    metrics.inc('messages_ok', 3)
+    metrics.gauge('depth', lambda: 7)
+    metrics.gauge('fps', lambda: 59.5, sampled=True)
+    metrics.gauge('label', lambda: 'metin')
+    metrics.gauge('broken', lambda: 1 / 0)
+    metrics.sample()
+    samples, types = parse_prometheus(metrics.to_prometheus(prefix='app'))
+
+    assert types == {'app_messages_ok_total': 'counter', 'app_depth': 'gauge', 'app_fps': 'gauge'}
+    assert samples == {'app_messages_ok_total': 3, 'app_depth': 7, 'app_fps': 59.5}
+
+
+def test_prometheus_empty():
+    assert Metrics().to_prometheus() == '\n'
+
+
+# --- Örneklenen gauge'lar --------------------------------------------------------
+
+def test_sampled_gauges_run_only_on_sampling_thread():
+    metrics = Metrics()
+    calls = []
+    metrics.gauge('widget', lambda: calls.append(threading.current_thread()) or len(calls), sampled=True)
+
+    snapshots = []
+    exporter = threading.Thread(target=lambda: snapshots.append(metrics.snapshot()))
+    exporter.start()
+    exporter.join()
+    assert calls == []
+    assert 'widget' not in snapshots[0]['gauges']
+
+    metrics.sample()
+    exporter = threading.Thread(target=lambda: snapshots.append(metrics.snapshot()))
+    exporter.start()
+    exporter.join()
+    assert calls == [threading.current_thread()]
+    assert snapshots[1]['gauges']['widget'] == 1
+
+
+def test_failed_sample_keeps_previous_value(caplog):
+    metrics = Metrics()
+    values = iter([5])
+    metrics.gauge('once', lambda: next(values), sampled=True)
+    metrics.sample()
+    metrics.sample()
+    assert metrics.snapshot()['gauges']['once'] == 5
+    assert 'once' in caplog.text
+
+
+def test_exporter_writes_sampled_values(tmp_path):
+    metrics = Metrics()
+    metrics.gauge('fps', lambda: 30, sampled=True)
+    metrics.sample()
+    path = tmp_path / 'metrics.json'
+    MetricsExporter(metrics, str(path)).flush()
+    assert json.loads(path.read_text())['gauges'] == {'fps': 30}
+
+    prom = tmp_path / 'metrics.prom'
+    MetricsExporter(metrics, str(prom)).flush()
+    assert 'phantomai_fps 30' in prom.read_text().splitlines()
+
+
+# --- LoopLagMeter ----------------------------------------------------------------
+
+class FakeClock:
+    def __init__(self):
+        self.tasks = {}
+
+    def every(self, key, interval_ms, fn, delay_ms=0):
+        task = self.tasks[key] = Task(key, fn, interval_ms, 10.0 + delay_ms / 1000)
+        return task
+
+    def cancel(self, key):
+        self.tasks.pop(key, None)
+
+
+def test_loop_lag_is_a_clock_task():
+    clock, metrics = FakeClock(), Metrics()
+    meter = LoopLagMeter(clock, metrics, interval_ms=250)
+    meter.start()
+    meter.start()
+    task = clock.tasks['loop_lag']
+    assert task.due == pytest.approx(10.25)
+    assert task.interval_ms == 250
+
+    task.fn(10.29)
+    assert meter.last_lag_ms == pytest.approx(40)
+    # Yarım kare erken çalışma gecikme sayılmaz
+    task.fn(10.245)
+    assert meter.last_lag_ms == 0.0
+    assert metrics.snapshot()['histograms']['loop_lag']['count'] == 2
+
+    meter.stop()
+    assert clock.tasks == {}
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import pytest
+
+from chat_client import ChatError
+from client_core import PhantomClient
+from health_monitor import DOWN
+from outbox import Outbox
+
+
+@pytest.fixture
+def make_outbox(tmp_path):
+    boxes = []
+
+    def make(send_batch=lambda items: [], **kwargs):
+        kwargs.setdefault('path', str(tmp_path / 'outbox.db'))
+        box = Outbox(send_batch, **kwargs)
+        boxes.append(box)
+        return box
+
+    yield make
+    for box in boxes:
+        box.close()
+
+
+def replies(items):
+    return [{'key': key, 'reply': f"yanıt: {message}"} for key, message in items]
+
+
+def test_claimed_messages_are_not_picked_up(make_outbox):
+    box = make_outbox()
+    claimed = box.put("ilk", claimed=True)
+    free = box.put("ikinci")
+    assert [row[0] for row in box._due(False)] == [free]
+    box.release(claimed)
+    assert [row[0] for row in box._due(False)] == [claimed]
+
+
+def test_defer_schedules_jittered_backoff(make_outbox):
+    box = make_outbox(base_delay=2.0, max_delay=5.0)
+    key = box.put("mesaj", claimed=True)
+    box.defer(key, "HTTP 503")
+    assert box._due(False) == []
+    assert len(box._due(True)) == 1
+    for attempts, upper in ((1, 2.0), (2, 4.0), (3, 5.0), (10, 5.0)):
+        delay = box.backoff(attempts)
+        assert upper / 2 <= delay <= upper
+
+
+def test_next_wakeup_ignores_in_flight_rows(make_outbox):
+    box = make_outbox()
+    box.put("gönderimde", claimed=True)
+    assert box._next_wakeup() is None
+    box.put("bekleyen")
+    assert box._next_wakeup() == Outbox.MIN_WAIT
+
+
+def _count_wakeups(box, seconds):
+    calls = []
+    original = box._next_wakeup
+    box._next_wakeup = lambda: calls.append(1) or original()
+    box.start()
+    time.sleep(seconds)
+    return len(calls)
+
+
+def test_worker_sleeps_while_unavailable(make_outbox):
+    box = make_outbox(is_available=lambda: False, base_delay=0.1)
+    box.put("kuyrukta")
+    assert _count_wakeups(box, 0.5) < 10
+
+
+def test_worker_sleeps_while_message_in_flight(make_outbox):
+    box = make_outbox()
+    box.put("gönderimde", claimed=True)
+    box.kick()
+    assert _count_wakeups(box, 0.3) < 5
+
+
+def test_flush_acks_defers_and_fails(make_outbox):
+    delivered, failed = [], []
+
+    def send_batch(items):
+        (ok, _), (later, _), (bad, _) = items
+        return [{'key': ok, 'reply': 'tamam'},
+                {'key': later, 'error': 'HTTP 503', 'retryable': True},
+                {'key': bad, 'error': 'HTTP 400', 'retryable': False}]
+
+    box = make_outbox(send_batch, on_delivered=lambda key, message, reply: delivered.append(message),
+                      on_failed=lambda key, message, error: failed.append(error))
+    for message in ("ok", "sonra", "bozuk"):
+        box.put(message)
+    assert box.flush() == 1
+    assert delivered == ["ok"] and failed == ["HTTP 400"]
+    assert [row[1] for row in box.pending()] == ["sonra"]
+    assert box.stats()['last_flush']['messages'] == 1
+
+
+def test_network_error_defers_whole_batch(make_outbox):
+    def send_batch(items):
+        raise ConnectionError("bağlantı yok")
+
+    box = make_outbox(send_batch)
+    box.put("a")
+    box.put("b")
+    assert box.flush() == 0
+    assert box.depth == 2 and box.retries == 2
+    assert box._due(False) == []
+
+
+def test_messages_survive_restart(make_outbox, tmp_path):
+    box = make_outbox(is_available=lambda: False)
+    box.put("kalıcı")
+    box.close()
+    reopened = make_outbox(replies)
+    assert reopened.depth == 1
+    assert reopened.flush() == 1
+    assert reopened.depth == 0
+
+
+def test_worker_flushes_when_kicked(make_outbox):
+    available = threading.Event()
+    delivered = threading.Event()
+    box = make_outbox(replies, is_available=available.is_set,
+                      on_delivered=lambda key, message, reply: delivered.set())
+    box.put("bekleyen")
+    box.start()
+    available.set()
+    box.kick(flush_all=True)
+    assert delivered.wait(2)
+
+
+def test_send_queues_without_network_when_pool_down(tmp_path):
+    client = PhantomClient('http://127.0.0.1:9', discovery_cache=None)
+    try:
+        box = client.enable_outbox(path=str(tmp_path / 'outbox.db'))
+        member = client.server_pool._new_member('http://127.0.0.1:9', None)
+        member.monitor.state = DOWN
+        client.server_pool.members[member.url] = member
+        queued = []
+        started = time.perf_counter()
+        future = client.send("çevrimdışı", on_queued=lambda key, error: queued.append(key))
+        assert time.perf_counter() - started < 0.1
+        assert queued and box.depth == 1
+        assert isinstance(future.exception(), ChatError)
+        assert member.requests == 0
+    finally:
+        client.close()
+
+
+def test_unwritable_outbox_leaves_direct_sends(tmp_path):
+    blocker = tmp_path / 'dosya'
+    blocker.write_text('')
+    client = PhantomClient('http://127.0.0.1:9', discovery_cache=None)
+    try:
+        with pytest.raises(OSError):
+            client.enable_outbox(path=str(blocker / 'alt' / 'outbox.db'))
+        assert client.outbox is None
+    finally:
+        client.close()
@@ -0,0 +1,58 @@
+from animation import Task
+from main import ParticleSystem
+
+
+class FakeCanvas:
+    def __init__(self):
+        self.items = 0
+
+    def create_oval(self, *args, **kwargs):
+        self.items += 1
+        return self.items
+
+    def itemconfig(self, *args, **kwargs):
+        pass
+
+    def coords(self, *args):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.tasks = {}
+
+    def every(self, key, interval_ms, fn, delay_ms=0):
+        self.tasks[key] = Task(key, fn, interval_ms, 0)
+        return self.tasks[key]
+
+
+def make_system():
+    return ParticleSystem(FakeCanvas(), FakeClock(), capacity=16, frame_budget_ms=8.0)
+
+
+def test_wake_does_not_step_quality_up():
+    particles = make_system()
+    particles.quality = 2
+    particles.spawn(10, 10)
+    assert particles.quality == 2
+
+
+def test_quality_steps_up_after_fast_frames():
+    particles = make_system()
+    particles.quality = 1
+    particles.frame_cost_ms = 0.0
+    for _ in range(ParticleSystem.UPGRADE_FRAMES - 1):
+        particles._adapt_quality()
+    assert particles.quality == 1
+    particles._adapt_quality()
+    assert particles.quality == 0
+
+
+def test_repeated_timestamp_keeps_fps():
+    particles = make_system()
+    particles.spawn(10, 10)
+    particles.animate(1.0)
+    particles.animate(1.016)
+    fps = particles.fps
+    particles.animate(1.016)
+    assert particles.fps == fps
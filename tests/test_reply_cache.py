@@ -0,0 +1,123 @@
+import reply_cache
+from client_core import PhantomClient
+from conversation import INITIAL_STATE
+from reply_cache import ReplyCache
+
+
+def make_client(*urls):
+    client = PhantomClient(urls[0], discovery_cache=None)
+    for url in urls:
+        member = client.server_pool._new_member(url, None)
+        client.server_pool.members[member.url] = member
+    client.enable_reply_cache(disk_path=None)
+    return client
+
+
+def test_cached_reply_is_keyed_by_conversation_state():
+    client = make_client('http://a')
+    try:
+        client.reply_cache.put('http://a', "neden?", "çünkü A", INITIAL_STATE)
+        assert client.cached_reply("neden?") == "çünkü A"
+        # İsabet konuşmaya tur olarak eklendi; aynı soru artık farklı bağlamda
+        assert client.conversation.seq == 1
+        assert client.cached_reply("neden?") is None
+    finally:
+        client.close()
+
+
+def test_cache_hit_without_sessions_does_not_need_conversation():
+    client = PhantomClient('http://a', discovery_cache=None, sessions=False)
+    try:
+        client.enable_reply_cache(disk_path=None).put('http://a', "selam", "merhaba")
+        assert client.cached_reply("selam") == "merhaba"
+    finally:
+        client.close()
+
+
+def test_reply_is_cached_under_the_member_that_answered():
+    client = make_client('http://a', 'http://b')
+    answered = []
+
+    def post_chat(server_url, message, trace, conversation, key):
+        answered.append(server_url)
+        conversation.commit(message, f"{server_url} yanıtı")
+        return f"{server_url} yanıtı"
+
+    client.chat_client._post_chat = post_chat
+    try:
+        reply = client.send("selam", use_cache=True).result(timeout=5)
+        url = answered[0]
+        assert reply == f"{url} yanıtı"
+        assert client.reply_cache.get(url, "selam", INITIAL_STATE) == reply
+        other = 'http://b' if url == 'http://a' else 'http://a'
+        assert client.reply_cache.get(other, "selam", INITIAL_STATE) is None
+        # Konuşma ilerledi; aynı mesaj için önbellek kaydı eşleşmez
+        assert client.reply_cache.get(url, "selam", client.conversation.fields()['state']) is None
+    finally:
+        client.close()
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ReplyCache(max_entries=2)
+    cache.put('http://a', "bir", "1")
+    cache.put('http://a', "iki", "2")
+    assert cache.get('http://a', "bir") == "1"
+    cache.put('http://a', "üç", "3")
+    assert cache.get('http://a', "iki") is None
+    assert cache.get('http://a', "bir") == "1"
+    assert cache.get('http://a', "üç") == "3"
+    assert cache.stats()['evictions'] == 1
+
+
+def test_messages_are_normalized():
+    cache = ReplyCache()
+    cache.put('http://a/', "Merhaba   Dünya", "selam")
+    assert cache.get('http://a', "merhaba dünya") == "selam"
+
+
+def test_entries_expire_after_ttl(monkeypatch, tmp_path):
+    now = [1000.0]
+    monkeypatch.setattr(reply_cache.time, 'time', lambda: now[0])
+    cache = ReplyCache(ttl=60, disk_path=str(tmp_path / 'replies.db'))
+    try:
+        cache.put('http://a', "soru", "yanıt")
+        now[0] += 59
+        assert cache.get('http://a', "soru") == "yanıt"
+        now[0] += 2
+        assert cache.get('http://a', "soru") is None
+        assert cache.stats()['expirations'] == 2
+    finally:
+        cache.close()
+
+
+def test_invalidate_removes_both_tiers(tmp_path):
+    path = str(tmp_path / 'replies.db')
+    cache = ReplyCache(disk_path=path)
+    cache.put('http://a', "soru", "yanıt")
+    cache.invalidate('http://a', "soru")
+    assert cache.get('http://a', "soru") is None
+    cache.close()
+    reopened = ReplyCache(disk_path=path)
+    try:
+        assert reopened.get('http://a', "soru") is None
+    finally:
+        reopened.close()
+
+
+def test_reload_from_disk_tier(tmp_path):
+    path = str(tmp_path / 'replies.db')
+    cache = ReplyCache(disk_path=path)
+    cache.put('http://a', "soru", "yanıt", "durum")
+    cache.close()
+
+    reopened = ReplyCache(disk_path=path)
+    try:
+        assert reopened.get('http://a', "soru", "durum") == "yanıt"
+        assert reopened.get('http://a', "soru") is None
+        stats = reopened.stats()
+        assert stats['disk_hits'] == 1 and stats['entries'] == 1
+        # Diskten gelen kayıt bellek katmanına alındı
+        assert reopened.get('http://a', "soru", "durum") == "yanıt"
+        assert reopened.stats()['hits'] == 1
+    finally:
+        reopened.close()
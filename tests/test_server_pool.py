@@ -0,0 +1,79 @@
+import pytest
+
+from chat_client import ChatError
+from health_monitor import DOWN, HEALTHY
+from server_pool import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, ServerPool
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('server_pool.time.monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_threshold(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=5.0)
+    for _ in range(2):
+        breaker.record_failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.available()
+
+
+def test_breaker_half_open_allows_single_trial(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0)
+    breaker.record_failure()
+    clock[0] += 5.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.reset_timeout == 5.0
+
+
+def test_breaker_failed_trial_doubles_timeout(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5.0, max_reset_timeout=8.0)
+    breaker.record_failure()
+    clock[0] += 5.0
+    breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == OPEN and breaker.reset_timeout == 8.0
+    clock[0] += 7.9
+    assert not breaker.available()
+
+
+def _pool(*states):
+    pool = ServerPool(lambda url, timeout: True, lambda state, stats: None)
+    for i, state in enumerate(states):
+        url = f"http://server{i}"
+        member = pool._new_member(url, 10.0 * (i + 1))
+        member.monitor.state = state
+        pool.members[url] = member
+    return pool
+
+
+def test_acquire_skips_down_members():
+    pool = _pool(DOWN, HEALTHY)
+    assert pool.acquire().url == "http://server1"
+
+
+def test_acquire_fails_fast_when_all_down():
+    pool = _pool(DOWN, DOWN)
+    assert pool.acquire() is None
+    assert pool.is_down()
+    calls = []
+    with pytest.raises(ChatError) as error:
+        pool.call(lambda url: calls.append(url))
+    assert error.value.retryable
+    assert calls == []
+
+
+def test_pool_state_notified_once_per_change():
+    changes = []
+    pool = _pool(HEALTHY, DOWN)
+    pool.on_change = lambda state, stats: changes.append(state)
+    pool._update_state()
+    pool._update_state()
+    assert changes == [HEALTHY]
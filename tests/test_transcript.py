@@ -0,0 +1,146 @@
+import time
+import tkinter as tk
+
+import pytest
+
+from history_store import HistoryStore
+from transcript import TranscriptModel, TranscriptView
+
+STYLES = {"Siz": (">", "white"), "PhantomAI": ("<", "green")}
+
+
+class FakeText:
+    """Text widget'ının transcript'in kullandığı kadarı: metin ve mark'lar"""
+
+    def __init__(self):
+        self.content = ''
+        self.marks = {}
+        self.tagged = []
+
+    def _offset(self, index):
+        if index in (tk.END, 'end-1c', '@0,0'):
+            return 0 if index == '@0,0' else len(self.content)
+        if index in self.marks:
+            return self.marks[index][0]
+        line, column = map(int, index.split('.'))
+        return sum(len(text) + 1 for text in self.content.split('\n')[:line - 1]) + column
+
+    def index(self, index):
+        before = self.content[:self._offset(index)]
+        return f"{before.count(chr(10)) + 1}.{len(before) - before.rfind(chr(10)) - 1}"
+
+    def insert(self, index, text, tag=None):
+        offset = self._offset(index)
+        self.content = self.content[:offset] + text + self.content[offset:]
+        for name, (position, gravity) in self.marks.items():
+            if position > offset or (position == offset and gravity == tk.RIGHT):
+                self.marks[name] = (position + len(text), gravity)
+
+    def delete(self, start, end):
+        start, end = self._offset(start), self._offset(end)
+        self.content = self.content[:start] + self.content[end:]
+        for name, (position, gravity) in self.marks.items():
+            if position >= end:
+                position -= end - start
+            elif position > start:
+                position = start
+            self.marks[name] = (position, gravity)
+
+    def mark_set(self, name, index):
+        self.marks[name] = (self._offset(index), self.marks.get(name, (0, tk.RIGHT))[1])
+
+    def mark_gravity(self, name, gravity):
+        self.marks[name] = (self.marks[name][0], gravity)
+
+    def mark_unset(self, *names):
+        for name in names:
+            self.marks.pop(name, None)
+
+    def tag_add(self, tag, start, end):
+        self.tagged.append((tag, self.content[self._offset(start):self._offset(end)]))
+
+    def ignore(self, *args, **kwargs):
+        pass
+
+    tag_configure = tag_raise = configure = config = see = yview = ignore
+
+
+def shown_texts(view):
+    return [line[2:] for line in view.text.content.split('\n\n') if line]
+
+
+def wait_written(store, message_id, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while store.get(message_id) is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = str(tmp_path / 'history.db')
+    # Önceki iki oturum: aralarında id boşluğu kalır
+    for session in range(2):
+        old = HistoryStore(path=path)
+        for i in range(5):
+            old.append("Siz", f"s{session}-{i}")
+        old.close()
+    store = HistoryStore(path=path, flush_interval=0.01)
+    yield store
+    store.close()
+
+
+def test_model_pages_across_id_gaps(store):
+    model = TranscriptModel(max_messages=3, store=store)
+    for i in range(4):
+        model.append("Siz", f"yeni-{i}")
+    wait_written(store, model.last_seq)
+
+    older = model.before(model.ring_first_seq, 4)
+    assert [m.text for m in older] == ["s1-2", "s1-3", "s1-4", "yeni-0"]
+    newer = model.after(older[0].seq, 4)
+    assert [m.text for m in newer] == ["s1-3", "s1-4", "yeni-0", "yeni-1"]
+    assert [m.text for m in model.before(None, 2)] == ["yeni-2", "yeni-3"]
+
+
+def test_view_pages_older_and_newer_with_gaps(store):
+    view = TranscriptView(FakeText(), STYLES, model=TranscriptModel(store=store), window_size=3, page_size=2)
+    for i in range(3):
+        view.append("Siz", f"yeni-{i}")
+    assert shown_texts(view) == ["yeni-0", "yeni-1", "yeni-2"]
+
+    view._page_older()
+    assert shown_texts(view) == ["s1-3", "s1-4", "yeni-0", "yeni-1", "yeni-2"]
+    assert list(view.shown) == [m.seq for m in view.model.before(None, 5)]
+
+    view._page_older()
+    # Pencere window_size + page_size'ı aşınca alttan silinir
+    assert shown_texts(view) == ["s1-1", "s1-2", "s1-3", "s1-4", "yeni-0"]
+    assert all(f"m{seq}" in view.text.marks for seq in view.shown)
+
+    view._page_newer()
+    assert shown_texts(view) == ["s1-3", "s1-4", "yeni-0", "yeni-1", "yeni-2"]
+    assert f"m{view.model.before(view.first, 1)[0].seq}" not in view.text.marks
+
+
+def test_view_skips_rows_not_yet_written(tmp_path):
+    store = HistoryStore(path=str(tmp_path / 'history.db'), flush_interval=60)
+    try:
+        view = TranscriptView(FakeText(), STYLES, model=TranscriptModel(max_messages=2, store=store),
+                              window_size=2, page_size=2)
+        messages = [view.append("Siz", str(i)) for i in range(3)]
+        # İlk mesaj halkadan düştü ama henüz diske yazılmadı
+        assert view.model.get(messages[0].seq) is None
+        view._page_older()
+        view.jump_to(messages[0].seq)
+        assert shown_texts(view) == ["1", "2"]
+    finally:
+        store.close()
+
+
+def test_badge_is_tagged_but_not_stored():
+    view = TranscriptView(FakeText(), STYLES)
+    message = view.append("PhantomAI", "yanıt", badge="[ÖNBELLEK]")
+    assert message.text == "yanıt"
+    assert view.text.content == "< [ÖNBELLEK] yanıt\n\n"
+    assert view.text.tagged == [('badge', "[ÖNBELLEK]")]
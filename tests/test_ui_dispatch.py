@@ -0,0 +1,160 @@
+import select
+import threading
+import time
+import tkinter
+
+import pytest
+
+from ui_dispatch import CALL, LATEST, TEXT, UIDispatcher
+
+
+class FakeTk:
+    def __init__(self, handlers):
+        self.handlers = handlers
+
+    def createfilehandler(self, fd, mask, fn):
+        self.handlers[fd] = fn
+
+    def deletefilehandler(self, fd):
+        self.handlers.pop(fd, None)
+
+
+class FakeRoot:
+    """after() çağrılarını ve çağıran thread'leri kaydeder; run() Tk döngüsü
+    gibi bekleyen after()'ları ve boruya gelen uyandırmaları çalıştırır"""
+
+    def __init__(self, file_handlers=True):
+        self.pending = {}
+        self.scheduled = 0
+        self.threads = set()
+        self.handlers = {}
+        self._next_id = 0
+        if file_handlers:
+            self.tk = FakeTk(self.handlers)
+
+    def after(self, ms, fn):
+        self.threads.add(threading.get_ident())
+        self._next_id += 1
+        self.pending[self._next_id] = fn
+        self.scheduled += 1
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.threads.add(threading.get_ident())
+        self.pending.pop(after_id, None)
+
+    def run(self, until=lambda: False, timeout=0.0):
+        deadline = time.monotonic() + timeout
+        while not until():
+            if self.pending:
+                after_id = next(iter(self.pending))
+                self.pending.pop(after_id)()
+                continue
+            remaining = max(0.0, deadline - time.monotonic())
+            readable = select.select(list(self.handlers), [], [], remaining)[0] if self.handlers else []
+            if not readable:
+                if not remaining:
+                    return
+                time.sleep(0.001)
+            for fd in readable:
+                self.handlers[fd](fd, tkinter.READABLE)
+
+
+@pytest.fixture
+def dispatchers():
+    made = []
+    yield made
+    for ui in made:
+        ui.stop()
+
+
+def test_coalesce_keeps_last_latest_and_joins_text():
+    ui = UIDispatcher(FakeRoot())
+    calls, dropped = ui._coalesce([
+        (LATEST, 'status', print, ("bağlanıyor",)),
+        (TEXT, 'reply', print, "mer"),
+        (TEXT, 'other', print, "x"),
+        (TEXT, 'reply', print, "haba"),
+        (LATEST, 'status', print, ("bağlı",)),
+    ])
+    assert [(kind, key, payload) for kind, key, _, payload in calls] == [
+        (TEXT, 'reply', ["mer", "haba"]),
+        (TEXT, 'other', ["x"]),
+        (LATEST, 'status', ("bağlı",)),
+    ]
+    assert dropped == 2
+
+
+def test_coalesce_call_splits_text_runs():
+    ui = UIDispatcher(FakeRoot())
+    calls, dropped = ui._coalesce([
+        (TEXT, 'reply', print, "a"),
+        (CALL, None, print, ("bitti",)),
+        (TEXT, 'reply', print, "b"),
+    ])
+    assert [payload for _, _, _, payload in calls] == [["a"], ("bitti",), ["b"]]
+    assert dropped == 0
+
+
+def test_polling_stops_when_queue_is_empty(dispatchers):
+    root = FakeRoot()
+    ui = UIDispatcher(root)
+    dispatchers.append(ui)
+    ui.start()
+    assert root.scheduled == 0
+
+    seen = []
+    ui.post(seen.append, 1)
+    ui.post(seen.append, 2)
+    # post() Tk'ya dokunmaz; uyandırma borudan gelir
+    assert root.scheduled == 0
+    root.run()
+    assert seen == [1, 2]
+    assert root.scheduled == 1 and not root.pending
+
+    ui.post(seen.append, 3)
+    root.run()
+    assert seen == [1, 2, 3] and root.scheduled == 2
+
+
+@pytest.mark.parametrize('file_handlers', [True, False])
+def test_after_is_only_called_on_the_tk_thread(dispatchers, file_handlers):
+    root = FakeRoot(file_handlers)
+    ui = UIDispatcher(root, idle_ms=1)
+    dispatchers.append(ui)
+    ui.start()
+    seen = []
+
+    def worker(n):
+        for i in range(50):
+            ui.post(seen.append, (n, i))
+            if i % 10 == 0:
+                time.sleep(0.002)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    root.run(until=lambda: len(seen) == 200, timeout=5.0)
+    for thread in threads:
+        thread.join()
+    assert len(seen) == 200
+    assert root.threads == {threading.get_ident()}
+
+
+def test_requeue_keeps_slot_key_and_kind(dispatchers):
+    root = FakeRoot()
+    ui = UIDispatcher(root, budget_ms=-1)
+    dispatchers.append(ui)
+    ui.start()
+    seen = []
+    ui.post(seen.append, "ilk")
+    ui.post_text('reply', "mer", seen.append)
+    ui.post_latest('status', seen.append, "eski")
+    # İlk çağrıdan sonra bütçe biter, kalanlar geri konur
+    ui._drain()
+    assert seen == ["ilk"]
+
+    ui.post_text('reply', "haba", seen.append)
+    ui.post_latest('status', seen.append, "yeni")
+    root.run()
+    assert seen == ["ilk", "merhaba", "yeni"]
@@ -0,0 +1,510 @@
+"""Sohbet geçmişi modeli ve sanallaştırılmış Text görünümü.
+
+Mesajlar bellekte sabit boyutlu bir halkada tutulur; Text widget'ında
+yalnızca görünen bölgenin çevresindeki bir pencere bulunur. Kullanıcı
+yukarı (ya da tekrar aşağı) kaydırdıkça mesajlar sayfa sayfa yüklenir,
+pencere dışına çıkanlar widget'tan silinir. Böylece uzun oturumlarda
+insert maliyeti ve bellek sabit kalır.
+
+Büyük mesajlar (log, kod dökümü) tek insert'te yazılmaz: ilk dilim hemen,
+kalanı animasyon saatinin her karesinde süre bütçesi içinde eklenir.
+Kod bloklarının tag aralıkları arka planda hesaplanır (bkz. markup); Tk
+thread'i yalnızca hazır aralıkları uygular.
+"""
+import time
+import tkinter as tk
+from collections import deque
+
+from markup import TAG_OPTIONS, signature
+
+# Mesaj etiketinin (Message.badge) görünümü
+BADGE_OPTIONS = {'foreground': '#ffd700', 'font': ('Consolas', 9, 'bold')}
+
+
+class Message:
+    __slots__ = ('seq', 'sender', 'text', 'timestamp', 'latency_ms', 'badge')
+
+    def __init__(self, seq, sender, text, timestamp=None, latency_ms=None, badge=None):
+        self.seq = seq
+        self.sender = sender
+        self.text = text
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.latency_ms = latency_ms
+        # Yalnızca gösterilen etiket (ör. önbellek); metne ve depoya girmez
+        self.badge = badge
+
+
+class TranscriptModel:
+    """Son max_messages mesajın halkası; seq numaraları artar.
+
+    store (HistoryStore) verilirse her mesaj diske de yazılır, seq olarak
+    deponun mesaj id'si kullanılır ve halkadan düşmüş (ya da önceki
+    oturumlara ait) mesajlar depodan sayfa sayfa okunur. Depo id'leri
+    boşluk içerebilir; seq aritmetiği yapılmaz, komşular before()/after()
+    ile bulunur.
+    """
+
+    def __init__(self, max_messages=2000, store=None):
+        self.max_messages = max_messages
+        self.messages = deque()
+        self._by_seq = {}
+        self.store = store
+        self.next_seq = 0
+
+    @property
+    def ring_first_seq(self):
+        if self.messages:
+            return self.messages[0].seq
+        return self.store.next_id if self.store is not None else self.next_seq
+
+    @property
+    def first_seq(self):
+        """Erişilebilen en eski mesaj"""
+        if self.store is not None:
+            return self.store.first_id
+        return self.ring_first_seq
+
+    @property
+    def last_seq(self):
+        """En yeni mesaj; hiç mesaj yoksa None"""
+        if self.messages:
+            return self.messages[-1].seq
+        if self.store is not None:
+            return self.store.last_id
+        return None
+
+    def append(self, sender, text, latency_ms=None, badge=None):
+        if self.store is not None:
+            seq = self.store.append(sender, text, latency_ms=latency_ms)
+        else:
+            seq = self.next_seq
+            self.next_seq += 1
+        message = Message(seq, sender, text, latency_ms=latency_ms, badge=badge)
+        self.messages.append(message)
+        self._by_seq[seq] = message
+        if len(self.messages) > self.max_messages:
+            del self._by_seq[self.messages.popleft().seq]
+        return message
+
+    def finish(self, seq, latency_ms=None):
+        """Akışla büyüyen mesaj tamamlandı: son hâlini depoya yazar"""
+        message = self.get(seq)
+        if message is None:
+            return
+        if latency_ms is not None:
+            message.latency_ms = latency_ms
+        if self.store is not None:
+            self.store.update(seq, message.text, latency_ms)
+
+    def get(self, seq):
+        """Erişilemeyen, henüz diske yazılmamış ya da olmayan seq için None"""
+        message = self._by_seq.get(seq)
+        if message is not None:
+            return message
+        if self.store is not None and seq < self.ring_first_seq:
+            row = self.store.get(seq)
+            if row is not None:
+                return Message(*row)
+        return None
+
+    def before(self, seq, limit):
+        """seq'ten (None ise sondan) önceki en fazla limit mesaj, eskiden yeniye"""
+        ring = [m for m in self.messages if seq is None or m.seq < seq][-limit:]
+        if len(ring) < limit and self.store is not None:
+            bound = self.ring_first_seq if seq is None else min(seq, self.ring_first_seq)
+            ring = [Message(*row) for row in self.store.before(bound, limit - len(ring))] + ring
+        return ring
+
+    def after(self, seq, limit):
+        """seq'ten sonraki en fazla limit mesaj, eskiden yeniye"""
+        older = []
+        if self.store is not None and seq < self.ring_first_seq:
+            older = [Message(*row) for row in self.store.after(seq, limit, until=self.ring_first_seq)]
+        return (older + [m for m in self.messages if m.seq > seq])[:limit]
+
+    def __len__(self):
+        return len(self.messages)
+
+
+class TranscriptView:
+    """TranscriptModel'in bir penceresini ScrolledText'te gösterir.
+
+    styles: {sender: (prefix, renk)}; tanımsız gönderenler default_sender
+    stiliyle gösterilir. Tag'ler her gönderen tipi için bir kez ayarlanır.
+
+    clock (AnimationClock) verilirse slice_chars'tan uzun metinler karelere
+    bölünerek yazılır; kare başına en fazla budget_ms harcanır. formatter
+    (markup.Formatter) verilirse kod blokları tag'lenir.
+    """
+
+    def __init__(self, text, styles, model=None, window_size=200, page_size=50,
+                 default_sender="PhantomAI", font=('Consolas', 11, 'bold'), clock=None, formatter=None,
+                 slice_chars=8192, budget_ms=6.0, code_styles=TAG_OPTIONS,
+                 badge_style=BADGE_OPTIONS):
+        self.text = text
+        self.model = model if model is not None else TranscriptModel()
+        self.styles = styles
+        self.default_sender = default_sender
+        self.window_size = window_size
+        self.page_size = page_size
+        self.clock = clock
+        self.formatter = formatter
+        self.slice_chars = slice_chars
+        self.budget_ms = budget_ms
+        # Yazılmayı bekleyen işler, sırayla: [seq, 'text', (metin, tag), konum]
+        # ya da [seq, 'tags', aralıklar, konum]; hepsi e<seq> mark'ına göre
+        self._jobs = deque()
+        self.slices = 0
+
+        # Widget'ta bulunan mesajların seq'leri, sırayla (aralarında boşluk olabilir)
+        self.shown = deque()
+        self.following = True
+        self._paging = False
+
+        for sender, (_, color) in styles.items():
+            text.tag_configure(sender, foreground=color, font=font)
+        # Kod tag'leri gönderen renginin önüne geçer
+        for tag, options in code_styles.items():
+            text.tag_configure(tag, **options)
+            text.tag_raise(tag)
+        text.tag_configure('badge', **badge_style)
+        text.tag_raise('badge')
+
+        # Kaydırma çubuğunu sar: pencerenin kenarına gelince sayfa yükle
+        self._scrollbar_set = text.vbar.set if hasattr(text, 'vbar') else None
+        text.configure(yscrollcommand=self._on_scroll)
+
+    def _tag(self, sender):
+        return sender if sender in self.styles else self.default_sender
+
+    def _body(self, message):
+        prefix = self.styles[self._tag(message.sender)][0]
+        if message.badge:
+            return f"{prefix} {message.badge} {message.text}"
+        return f"{prefix} {message.text}"
+
+    @property
+    def first(self):
+        return self.shown[0] if self.shown else None
+
+    @property
+    def last(self):
+        return self.shown[-1] if self.shown else None
+
+    @property
+    def materialized(self):
+        return len(self.shown)
+
+    def _is_shown(self, seq):
+        # Önce ucuz aralık kontrolü; pencere küçük, üyelik testi de ucuz
+        return bool(self.shown) and self.shown[0] <= seq <= self.shown[-1] and seq in self.shown
+
+    # --- Widget işlemleri -------------------------------------------------
+
+    # Her mesaj için iki mark tutulur: m<seq> mesaj başı, e<seq> metin sonu
+    # (sondaki iki satır sonunun önü; akışlı parçalar buraya eklenir).
+    # İkisi de sağa yapışkandır, böylece öncesine eklenen metinle kayarlar.
+
+    def _insert_at_end(self, message):
+        text = self.text
+        tag = self._tag(message.sender)
+        start_mark, end_mark = f"m{message.seq}", f"e{message.seq}"
+        body = self._body(message)
+        head = self._head(body)
+        text.mark_set(start_mark, 'end-1c')
+        text.mark_gravity(start_mark, tk.LEFT)
+        text.insert(tk.END, head, tag)
+        text.mark_set(end_mark, 'end-1c')
+        text.mark_gravity(end_mark, tk.LEFT)
+        text.insert(tk.END, "\n\n", tag)
+        text.mark_gravity(start_mark, tk.RIGHT)
+        text.mark_gravity(end_mark, tk.RIGHT)
+        self._rest(message, body, head, tag)
+
+    def _insert_at_top(self, message):
+        text = self.text
+        tag = self._tag(message.sender)
+        end_mark = f"e{message.seq}"
+        text.insert('1.0', "\n\n", tag)
+        text.mark_set(end_mark, '1.0')
+        text.mark_gravity(end_mark, tk.RIGHT)
+        body = self._body(message)
+        head = self._head(body)
+        text.insert('1.0', head, tag)
+        text.mark_set(f"m{message.seq}", '1.0')
+        text.mark_gravity(f"m{message.seq}", tk.RIGHT)
+        self._rest(message, body, head, tag)
+
+    def _head(self, body):
+        """Hemen yazılan ilk dilim (saat yoksa tüm metin)"""
+        if self.clock is None or len(body) <= self.slice_chars:
+            return body
+        return body[:self._cut(body, 0)]
+
+    def _cut(self, body, start):
+        """start'tan sonraki dilimin sonu; mümkünse satır sonunda"""
+        end = start + self.slice_chars
+        if end >= len(body):
+            return len(body)
+        newline = body.rfind('\n', start, end)
+        return newline + 1 if newline > start else end
+
+    def _rest(self, message, body, head, tag):
+        """İlk dilimden sonrası karelere yayılır; ardından kod tag'leri"""
+        if len(head) < len(body):
+            self._queue(message.seq, 'text', (body, tag), len(head))
+        if message.badge:
+            start = len(self.styles[tag][0]) + 1
+            self._queue(message.seq, 'tags', [('badge', (0, start), (0, start + len(message.badge)))])
+        self._format(message, body)
+
+    # --- Dilimli yazım ------------------------------------------------------
+
+    def _queue(self, seq, kind, payload, position=0):
+        self._jobs.append([seq, kind, payload, position])
+        if self.clock is None:
+            while self._jobs:
+                self._run_job(self._jobs[0], None)
+        elif not self.clock.active('transcript_render'):
+            self.clock.every('transcript_render', self.clock.frame_ms, self._render_step)
+
+    def _pending(self, seq):
+        return any(job[0] == seq for job in self._jobs)
+
+    def _cancel(self, seqs=None):
+        """seqs (ya da tüm) mesajların bekleyen işlerini atar"""
+        if seqs is None:
+            self._jobs.clear()
+        else:
+            self._jobs = deque(job for job in self._jobs if job[0] not in seqs)
+
+    def pending_chars(self):
+        return sum(len(job[2][0]) - job[3] for job in self._jobs if job[1] == 'text')
+
+    def _render_step(self, now):
+        """Bir karede budget_ms dolana kadar bekleyen dilimleri yazar"""
+        if not self._jobs:
+            return False
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        text = self.text
+        if not self.following:
+            # Görünen bölge, üstüne eklenen metinle kaymasın
+            text.mark_set('view_anchor', '@0,0')
+            text.mark_gravity('view_anchor', tk.RIGHT)
+        try:
+            while self._jobs and time.perf_counter() < deadline:
+                self._run_job(self._jobs[0], deadline)
+        finally:
+            if self.following:
+                text.see(tk.END)
+            else:
+                text.yview('view_anchor')
+                text.mark_unset('view_anchor')
+        return bool(self._jobs)
+
+    def _run_job(self, job, deadline):
+        """İşin bir parçasını yapar; bitince kuyruktan çıkarır"""
+        seq, kind, payload, position = job
+        if kind == 'text':
+            body, tag = payload
+            end = self._cut(body, position) if deadline is not None else len(body)
+            self._edit(self.text.insert, f"e{seq}", body[position:end], tag)
+            self.slices += 1
+            done = end >= len(body)
+        else:
+            base_line, base_column = map(int, self.text.index(f"m{seq}").split('.'))
+
+            def index(line, column):
+                return f"{base_line + line}.{base_column + column if line == 0 else column}"
+
+            end = len(payload) if deadline is None else min(len(payload), position + 200)
+            for tag, (line1, column1), (line2, column2) in payload[position:end]:
+                self.text.tag_add(tag, index(line1, column1), index(line2, column2))
+            done = end >= len(payload)
+        if done:
+            self._jobs.popleft()
+        else:
+            job[3] = end
+
+    def _format(self, message, body):
+        if self.formatter is None or '`' not in message.text:
+            return
+        ranges = self.formatter.ranges(message.seq, body, self._formatted)
+        if ranges:
+            self._queue(message.seq, 'tags', ranges)
+
+    def _formatted(self, seq, sig, ranges):
+        """Arka plandan gelen aralıklar; mesaj bu arada değiştiyse atılır"""
+        message = self.model.get(seq)
+        if not ranges or message is None or not self._is_shown(seq):
+            return
+        if signature(self._body(message)) == sig:
+            self._queue(seq, 'tags', ranges)
+
+    def _remove_top(self):
+        seq = self.shown.popleft()
+        self._cancel({seq})
+        self.text.delete('1.0', f"m{self.shown[0]}" if self.shown else tk.END)
+        self.text.mark_unset(f"m{seq}", f"e{seq}")
+
+    def _remove_bottom(self):
+        seq = self.shown.pop()
+        self._cancel({seq})
+        self.text.delete(f"m{seq}", tk.END)
+        self.text.mark_unset(f"m{seq}", f"e{seq}")
+
+    def _edit(self, fn, *args):
+        text = self.text
+        text.config(state=tk.NORMAL)
+        try:
+            return fn(*args)
+        finally:
+            text.config(state=tk.DISABLED)
+
+    # --- Dış API ----------------------------------------------------------
+
+    def append(self, sender, text, latency_ms=None, badge=None):
+        """Yeni mesaj ekler; sona bağlıysak widget'a da yazar. Message döndürür.
+        badge metnin önünde ayrı tag'le gösterilir, metne eklenmez"""
+        previous = self.model.last_seq
+        message = self.model.append(sender, text, latency_ms, badge)
+
+        # Halkadan düşen mesajlar widget'ta da kalmasın
+        while self.shown and self.first < self.model.first_seq:
+            self._edit(self._remove_top)
+
+        at_tail = not self.shown or self.last == previous
+        if at_tail and (self.following or self.materialized < self.window_size + self.page_size):
+            self._edit(self._append_materialized, message)
+        return message
+
+    def _append_materialized(self, message):
+        self.shown.append(message.seq)
+        self._insert_at_end(message)
+        if self.following:
+            while self.materialized > self.window_size:
+                self._remove_top()
+            self.text.see(tk.END)
+
+    def extend(self, seq, text):
+        """Var olan mesajın sonuna metin ekler (akışlı yanıtlar için)"""
+        message = self.model.get(seq)
+        if message is None:
+            return
+        message.text += text
+        if self._is_shown(seq):
+            tag = self._tag(message.sender)
+            if self._pending(seq) or (self.clock is not None and len(text) > self.slice_chars):
+                # Önceki dilimlerden sonra yazılsın
+                self._queue(seq, 'text', (text, tag))
+                return
+            self._edit(self.text.insert, f"e{seq}", text, tag)
+            if self.following:
+                self.text.see(tk.END)
+
+    def finish(self, seq, latency_ms=None):
+        """Akışla büyüyen mesaj tamamlandı: depoya yazar, kod bloklarını tag'ler"""
+        self.model.finish(seq, latency_ms)
+        message = self.model.get(seq)
+        if message is not None and self._is_shown(seq):
+            self._format(message, self._body(message))
+
+    def replace(self, seq, text):
+        """Mesajın metnini tamamen değiştirir (bekleme/hata durumları için)"""
+        message = self.model.get(seq)
+        if message is None:
+            return
+        message.text = text
+        if self._is_shown(seq):
+            self._edit(self._rewrite, message)
+            if self.following:
+                self.text.see(tk.END)
+
+    def _rewrite(self, message):
+        text = self.text
+        start_mark = f"m{message.seq}"
+        tag = self._tag(message.sender)
+        body = self._body(message)
+        head = self._head(body)
+        self._cancel({message.seq})
+        # Başlangıç mark'ı yerinde kalsın, metin sonu mark'ı yeni metinle kaysın
+        text.mark_gravity(start_mark, tk.LEFT)
+        text.delete(start_mark, f"e{message.seq}")
+        text.insert(start_mark, head, tag)
+        text.mark_gravity(start_mark, tk.RIGHT)
+        self._rest(message, body, head, tag)
+
+    def scroll_to_end(self):
+        if self.shown and self.last != self.model.last_seq:
+            self._edit(self._reload, self.model.before(None, self.window_size))
+        self.following = True
+        self.text.see(tk.END)
+
+    def jump_to(self, seq):
+        """seq'in çevresindeki pencereyi yükleyip mesajı en üstte gösterir"""
+        message = self.model.get(seq)
+        if message is None:
+            return
+        half = self.window_size // 2
+        messages = self.model.before(seq, half) + [message] + self.model.after(seq, half)
+        self._edit(self._reload, messages)
+        self.following = self.last == self.model.last_seq
+        self.text.yview(f"m{seq}")
+
+    def _reload(self, messages):
+        self._cancel()
+        self.text.delete('1.0', tk.END)
+        for seq in self.shown:
+            self.text.mark_unset(f"m{seq}", f"e{seq}")
+        self.shown.clear()
+        for message in messages:
+            self.shown.append(message.seq)
+            self._insert_at_end(message)
+
+    # --- Sayfalama ----------------------------------------------------------
+
+    def _on_scroll(self, first, last):
+        if self._scrollbar_set is not None:
+            self._scrollbar_set(first, last)
+        first, last = float(first), float(last)
+        self.following = last >= 0.999
+        if self._paging or self.first is None:
+            return
+        if first <= 0.0 and self.model.first_seq is not None and self.first > self.model.first_seq:
+            self._paging = True
+            self.text.after_idle(self._page_older)
+        elif last >= 1.0 and self.last != self.model.last_seq:
+            self._paging = True
+            self.text.after_idle(self._page_newer)
+
+    def _keep_view(self, fn):
+        """Görünen ilk satırı sabitleyerek fn'i çalıştırır"""
+        text = self.text
+        text.mark_set('view_anchor', '@0,0')
+        text.mark_gravity('view_anchor', tk.RIGHT)
+        try:
+            self._edit(fn)
+        finally:
+            text.yview('view_anchor')
+            text.mark_unset('view_anchor')
+            self._paging = False
+
+    def _page_older(self):
+        def load():
+            # Depodan tek sorguyla bir sayfa; id boşlukları ve henüz yazılmamış
+            # satırlar atlanır
+            for message in reversed(self.model.before(self.first, self.page_size)):
+                self.shown.appendleft(message.seq)
+                self._insert_at_top(message)
+            while self.materialized > self.window_size + self.page_size:
+                self._remove_bottom()
+        self._keep_view(load)
+
+    def _page_newer(self):
+        def load():
+            for message in self.model.after(self.last, self.page_size):
+                self.shown.append(message.seq)
+                self._insert_at_end(message)
+            while self.materialized > self.window_size + self.page_size:
+                self._remove_top()
+        self._keep_view(load)
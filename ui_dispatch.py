@@ -0,0 +1,211 @@
+"""Arka plan thread'lerinden Tk thread'ine tek geçiş noktası.
+
+Worker, keşif ve sağlık thread'leri Tk'ya hiç dokunmaz; olayları kilitli
+bir kuyruğa koyar. Tk thread'i kuyruğu kare başına bir kez boşaltır ve
+aynı karede biriken gereksiz güncellemeleri birleştirir:
+
+- post(fn, *args): sırayla çalıştırılan sıradan çağrı
+- post_latest(key, fn, *args): aynı anahtarın yalnızca son çağrısı çalışır
+  (durum etiketi gibi yalnızca son değerin önemli olduğu güncellemeler)
+- post_text(key, text, fn): aynı anahtarın ardışık metin parçaları tek
+  fn(birleşik_metin) çağrısına dönüşür (akışlı yanıtlar)
+"""
+import logging
+import os
+import threading
+import tkinter
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+CALL = 'call'
+LATEST = 'latest'
+TEXT = 'text'
+
+
+class UIDispatcher:
+    """after() yalnızca Tk thread'inde (start()'ı çağıran thread) kurulur;
+    diğer thread'ler Tk'ya hiç dokunmaz.
+
+    Boş kuyruğa ilk olay gelince worker bir uyandırma borusuna (os.pipe)
+    tek byte yazar; Tk'nın dosya işleyicisi (createfilehandler) bunu Tk
+    thread'inde görür ve tek bir after(frame_ms) kurar. Kuyruk boşalınca
+    yoklama durur, boştayken Tk thread'i hiç uyanmaz. Dosya işleyicisi
+    olmayan platformlarda (Windows) Tk thread'i boştayken idle_ms'de bir
+    yoklar. Bir boşaltma en fazla budget_ms sürer; kalan olaylar sonraki
+    kareye kalır.
+    """
+
+    def __init__(self, root, frame_ms=16, idle_ms=100, budget_ms=8.0, metrics=None):
+        self.root = root
+        self.frame_ms = frame_ms
+        self.idle_ms = idle_ms
+        self.budget_ms = budget_ms
+        self.metrics = metrics
+        self._queue = deque()
+        self._lock = threading.Lock()
+        # Boş kuyruğa gelen olay Tk thread'ine bildirildi; yalnızca _lock altında
+        # değişir, kuyruk boşalınca Tk thread'i sıfırlar
+        self._signalled = False
+        self._running = False
+        # Yalnızca Tk thread'i kurar/kaldırır
+        self._after_id = None
+        # Uyandırma borusu (okuma, yazma); worker'lar yalnızca _lock altında yazar
+        self._wake_fds = None
+
+    # --- Herhangi bir thread'den -------------------------------------------
+
+    def post(self, fn, *args):
+        self._put((CALL, None, fn, args))
+
+    def post_latest(self, key, fn, *args):
+        self._put((LATEST, key, fn, args))
+
+    def post_text(self, key, text, fn):
+        self._put((TEXT, key, fn, text))
+
+    def _put(self, item):
+        with self._lock:
+            self._queue.append(item)
+            if not self._running or self._signalled:
+                return
+            self._signalled = True
+            # Kilit altında: stop() boruyu bu arada kapatamaz
+            if self._wake_fds is not None:
+                try:
+                    os.write(self._wake_fds[1], b'\0')
+                except BlockingIOError:
+                    # Boru dolu; bekleyen byte'lar Tk thread'ini zaten uyandırır
+                    pass
+
+    def depth(self):
+        return len(self._queue)
+
+    # --- Tk thread'i ----------------------------------------------------------
+
+    def start(self):
+        if self._running:
+            return
+        wake_fds = self._open_wake_pipe()
+        with self._lock:
+            self._wake_fds = wake_fds
+            self._running = True
+            self._signalled = bool(self._queue)
+        self._arm()
+
+    def stop(self):
+        with self._lock:
+            self._running = False
+            self._signalled = False
+            wake_fds, self._wake_fds = self._wake_fds, None
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        if wake_fds is not None:
+            self.root.tk.deletefilehandler(wake_fds[0])
+            for fd in wake_fds:
+                os.close(fd)
+
+    def _open_wake_pipe(self):
+        """(okuma, yazma) uçları; dosya işleyicisi yoksa None"""
+        createfilehandler = getattr(getattr(self.root, 'tk', None), 'createfilehandler', None)
+        if createfilehandler is None:
+            return None
+        read_fd, write_fd = os.pipe()
+        os.set_blocking(read_fd, False)
+        os.set_blocking(write_fd, False)
+        createfilehandler(read_fd, tkinter.READABLE, self._on_wake)
+        return read_fd, write_fd
+
+    def _on_wake(self, fd, mask):
+        try:
+            while os.read(fd, 512):
+                pass
+        except OSError:
+            pass
+        self._arm()
+
+    def _arm(self):
+        """Boşaltmayı kurar (kurulu değilse); boru varsa boştayken kurulmaz"""
+        if self._after_id is not None or not self._running:
+            return
+        if self._queue:
+            self._after_id = self.root.after(self.frame_ms, self._drain)
+        elif self._wake_fds is None:
+            self._after_id = self.root.after(self.idle_ms, self._drain)
+
+    def _take(self):
+        with self._lock:
+            items = list(self._queue)
+            self._queue.clear()
+        return items
+
+    def _coalesce(self, items):
+        """Birleştirilmiş [tür, anahtar, fn, argümanlar] listesi ve atılan olay
+        sayısı; TEXT girdilerinin argümanı parça listesidir"""
+        last_latest = {}
+        for index, (kind, key, _, _) in enumerate(items):
+            if kind == LATEST:
+                last_latest[key] = index
+
+        merged = []
+        text_slots = {}
+        for index, (kind, key, fn, payload) in enumerate(items):
+            if kind == LATEST:
+                if last_latest[key] == index:
+                    merged.append([kind, key, fn, payload])
+            elif kind == TEXT:
+                slot = text_slots.get(key)
+                if slot is not None:
+                    # Parça, aynı anahtarın ilk parçasının yerinde birleşir
+                    slot[3].append(payload)
+                else:
+                    slot = [kind, key, fn, [payload]]
+                    text_slots[key] = slot
+                    merged.append(slot)
+            else:
+                merged.append([kind, key, fn, payload])
+                # Sıradan bir çağrı metin parçalarının arasına girdiyse
+                # (ör. yanıt bitti) sonraki parçalar yeni bir çağrı açar
+                text_slots.clear()
+        return merged, len(items) - len(merged)
+
+    def _drain(self):
+        self._after_id = None
+        if not self._running:
+            return
+        items = self._take()
+        if items:
+            calls, dropped = self._coalesce(items)
+            if dropped and self.metrics is not None:
+                self.metrics.inc('ui_coalesced', dropped)
+            deadline = time.perf_counter() + self.budget_ms / 1000
+            for index, (kind, _, fn, payload) in enumerate(calls):
+                # En az bir çağrı çalışır; kuyruk hiç ilerlemeden dönmesin
+                if index and time.perf_counter() > deadline:
+                    self._requeue(calls[index:])
+                    break
+                try:
+                    if kind == TEXT:
+                        fn(''.join(payload))
+                    else:
+                        fn(*payload)
+                except Exception as e:
+                    logger.exception(f"UI olayı işlenemedi: {e}")
+
+        with self._lock:
+            # Bu arada gelen (ya da geri konan) olay yoksa yoklama durur;
+            # sonraki post() boru üzerinden yeniden uyandırır
+            self._signalled = bool(self._queue)
+        self._arm()
+
+    def _requeue(self, calls):
+        """Bütçeye sığmayan çağrılar, yeni gelenlerden önce sıraya geri döner.
+        Tür ve anahtar korunur: yeni gelen parçalar ve son değerler bir
+        sonraki karede bunlarla birleşir"""
+        items = []
+        for kind, key, fn, payload in calls:
+            items.append((kind, key, fn, ''.join(payload) if kind == TEXT else payload))
+        with self._lock:
+            self._queue.extendleft(reversed(items))